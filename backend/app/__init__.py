@@ -1,7 +1,72 @@
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from app.core.admission import (
+    AdmissionMiddleware,
+    QueryBudgetExceeded,
+    create_admission_controller,
+)
 from app.core.config import settings
+from app.core.cache.prewarm import create_prewarmer
+from app.core.cache.proxy import create_proxy_cache
+from app.core.database import ClickHouseUnavailable, create_clickhouse_pool
+from app.core.database.writer import BufferFull, create_news_writer
+from app.core.disconnect import DisconnectMiddleware
+from app.core.metrics import (
+    MetricsMiddleware,
+    register_state_collector,
+    unregister_state_collector,
+)
+from app.core.profiler import REQUEST_ID_HEADER, ProfilerMiddleware
 from v1.api import v1_api_router
+from v1.dependencies import create_http_client
+from v1.endpoints.news import NEXT_CURSOR_HEADER
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await app.state.clickhouse.start()
+    await app.state.proxy_cache.start()
+    app.state.http_client = create_http_client()
+    app.state.prewarmer = None
+    if settings.IMAGE_PREWARM_ENABLED:
+        app.state.prewarmer = create_prewarmer(
+            app.state.clickhouse, app.state.proxy_cache, app.state.http_client
+        )
+        app.state.prewarmer.start()
+    app.state.news_writer = create_news_writer(app.state.clickhouse)
+    app.state.news_writer.start()
+    collector = register_state_collector(app.state)
+    try:
+        yield
+    finally:
+        unregister_state_collector(collector)
+        # Buffered news are inserted before the pool closes
+        await app.state.news_writer.close()
+        if app.state.prewarmer:
+            await app.state.prewarmer.close()
+        await app.state.http_client.aclose()
+        app.state.proxy_cache.close()
+        await app.state.clickhouse.close()
+
+
+async def clickhouse_unavailable_handler(request: Request, exc: ClickHouseUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+async def query_budget_exceeded_handler(request: Request, exc: QueryBudgetExceeded):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+async def buffer_full_handler(request: Request, exc: BufferFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(settings.INGEST_FLUSH_INTERVAL))},
+    )
 
 
 def get_application():
@@ -12,9 +77,23 @@ def get_application():
             "syntaxHighlight": {"theme": "obsidian"},
             "deepLinking": True,
         },
+        lifespan=lifespan,
+    )
+    # One pool per worker, connected once instead of on every request
+    _app.state.clickhouse = create_clickhouse_pool()
+    _app.state.proxy_cache = create_proxy_cache()
+    _app.state.admission = (
+        create_admission_controller() if settings.ADMISSION_ENABLED else None
     )
 
     _app.include_router(v1_api_router)
+    _app.add_exception_handler(ClickHouseUnavailable, clickhouse_unavailable_handler)
+    _app.add_exception_handler(BufferFull, buffer_full_handler)
+    _app.add_exception_handler(QueryBudgetExceeded, query_budget_exceeded_handler)
+
+    if _app.state.admission:
+        # Inside CORS so browsers can read why a request was turned away
+        _app.add_middleware(AdmissionMiddleware, controller=_app.state.admission)
 
     _app.add_middleware(
         CORSMiddleware,
@@ -22,7 +101,13 @@ def get_application():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, REQUEST_ID_HEADER, "Server-Timing"],
     )
+    if settings.CANCEL_ON_DISCONNECT:
+        _app.add_middleware(DisconnectMiddleware)
+    _app.add_middleware(ProfilerMiddleware)
+    # Outermost, so the latency includes every other middleware
+    _app.add_middleware(MetricsMiddleware)
 
     return _app
 
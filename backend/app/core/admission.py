@@ -0,0 +1,255 @@
+import asyncio
+import contextlib
+import re
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Optional
+from urllib.parse import parse_qs
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from app.core.config import settings
+
+# Class of each admission controlled route, by path template. The others,
+# like the image proxy, bulk ingestion, admin and metrics, are let through.
+ROUTE_CLASSES = {
+    "/news": "read",
+    "/news/count": "read",
+    "/news/{id}": "read",
+    "/news/facets": "aggregate",
+    "/news/dashboard": "aggregate",
+    "/news/aggregate/sentiment": "aggregate",
+    "/news/aggregate/sentiment/date": "aggregate",
+    "/news/aggregate/sentiment/series": "aggregate",
+    "/news/aggregate/sentiment/country": "aggregate",
+    "/news/distinct": "heavy",
+    "/news/export": "export",
+}
+# Requests of these classes with a search query are in the search class,
+# matching text costs more than the rest of their queries
+SEARCH_CLASS = "search"
+SEARCHABLE_CLASSES = {"read", "aggregate"}
+# ClickHouse errors of queries stopped by a limit of their budget
+BUDGET_ERRORS = {
+    158: "too many rows read or grouped",
+    159: "execution time exceeded",
+    160: "estimated execution time too long",
+    241: "memory limit exceeded",
+    307: "too many bytes read",
+}
+ERROR_CODE = re.compile(r"error code (\d+)")
+
+
+class Budget(BaseModel):
+    max_concurrency: int
+    max_queue: int
+    # Settings of every ClickHouse query sent while handling the request
+    settings: dict[str, Any] = {}
+
+
+class Overloaded(Exception):
+    """Raised when a request can't get a slot, carries its HTTP status"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when ClickHouse stopped a query at a limit of its budget"""
+
+
+current_budget: ContextVar[Optional[Budget]] = ContextVar(
+    "current_budget", default=None
+)
+
+
+def query_settings() -> dict[str, Any]:
+    """ClickHouse settings of the budget of the request being handled"""
+    budget = current_budget.get()
+    return budget.settings if budget else {}
+
+
+def budget_error(error: Exception) -> Optional[QueryBudgetExceeded]:
+    """The QueryBudgetExceeded a ClickHouse error stands for, if any"""
+    match = ERROR_CODE.search(str(error))
+    reason = BUDGET_ERRORS.get(int(match.group(1))) if match else None
+    if reason is None:
+        return None
+    return QueryBudgetExceeded(f"Query stopped, {reason}: narrow the filters")
+
+
+class LimiterStats(BaseModel):
+    max_concurrency: int
+    max_queue: int
+    in_flight: int
+    waiting: int
+    admitted: int
+    rejected: int
+    timeouts: int
+
+
+class Limiter:
+    """
+    Lets `max_concurrency` callers in at a time, up to `max_queue` more wait
+    for a slot for at most `timeout` seconds. Callers finding the queue full
+    are turned away at once with `status_code`, those timing out with a 503.
+    """
+
+    def __init__(
+        self, max_concurrency: int, max_queue: int, timeout: float, status_code: int
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.status_code = status_code
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.status_code, "Too many requests queued")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise Overloaded(503, f"No slot freed up within {self.timeout:g}s")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> LimiterStats:
+        return LimiterStats(
+            max_concurrency=self.max_concurrency,
+            max_queue=self.max_queue,
+            in_flight=self.in_flight,
+            waiting=self.waiting,
+            admitted=self.admitted,
+            rejected=self.rejected,
+            timeouts=self.timeouts,
+        )
+
+
+class AdmissionStats(LimiterStats):
+    classes: dict[str, LimiterStats]
+
+
+class AdmissionController:
+    """
+    Admits requests of the routes in ROUTE_CLASSES through the limiter of
+    their class, then through the one shared by every class. A full class
+    queue answers 429 so other classes are still served, a full shared
+    queue answers 503. The queries of an admitted request get the ClickHouse
+    settings of its class budget, so an expensive request is stopped by
+    ClickHouse instead of starving the others.
+    """
+
+    def __init__(
+        self,
+        budgets: dict[str, Budget],
+        max_concurrency: int,
+        max_queue: int,
+        timeout: float,
+        retry_after: int,
+    ):
+        self.budgets = budgets
+        self.retry_after = retry_after
+        self.limiter = Limiter(max_concurrency, max_queue, timeout, 503)
+        self.limiters = {
+            name: Limiter(budget.max_concurrency, budget.max_queue, timeout, 429)
+            for name, budget in budgets.items()
+        }
+
+    def classify(self, path: str, query_string: bytes) -> Optional[str]:
+        """Class of a request to the route with the path template, if any"""
+        name = ROUTE_CLASSES.get(path)
+        if name in SEARCHABLE_CLASSES:
+            search = parse_qs(query_string.decode(errors="replace")).get("search")
+            if search and any(value.strip() for value in search):
+                name = SEARCH_CLASS
+        return name if name in self.budgets else None
+
+    @contextlib.asynccontextmanager
+    async def admit(self, name: str) -> AsyncIterator[None]:
+        async with self.limiters[name].acquire(), self.limiter.acquire():
+            token = current_budget.set(self.budgets[name])
+            try:
+                yield
+            finally:
+                current_budget.reset(token)
+
+    def stats(self) -> AdmissionStats:
+        return AdmissionStats(
+            **self.limiter.stats().model_dump(),
+            classes={name: limiter.stats() for name, limiter in self.limiters.items()},
+        )
+
+
+def _route(scope) -> Optional[Any]:
+    """The route of the application that will handle the request"""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    Runs requests through the admission controller before any of their
+    dependencies or body is handled, turning them away with Retry-After
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = _route(scope)
+        name = route and self.controller.classify(route.path, scope["query_string"])
+        if not name:
+            return await self.app(scope, receive, send)
+        try:
+            async with self.controller.admit(name):
+                return await self.app(scope, receive, send)
+        except Overloaded as e:
+            # Labels the metrics of the request, the router never sees it
+            scope["route"] = route
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": str(e)},
+                headers={"Retry-After": str(self.controller.retry_after)},
+            )
+            await response(scope, receive, send)
+
+
+def create_admission_controller() -> AdmissionController:
+    return AdmissionController(
+        budgets={
+            name: Budget.model_validate(budget)
+            for name, budget in settings.ADMISSION_BUDGETS.items()
+        },
+        max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+        retry_after=settings.ADMISSION_RETRY_AFTER,
+    )
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+
+class CacheStats(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+class QueryCache:
+    """
+    In-process LRU cache of query results. Entries expire after `ttl` seconds
+    and the whole cache is dropped when the data version changes, checked at
+    most once every `version_check_interval` seconds.
+    """
+
+    def __init__(self, ttl: float, max_size: int, version_check_interval: float):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.version_check_interval = version_check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._version: Any = None
+        self._version_checked_at = float("-inf")
+        self._version_lock = asyncio.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    async def validate(self, data_version: Callable[[], Awaitable[Any]]):
+        """Clear the cache if the data version moved since the last check"""
+        if time.monotonic() - self._version_checked_at < self.version_check_interval:
+            return
+        async with self._version_lock:
+            if (
+                time.monotonic() - self._version_checked_at
+                < self.version_check_interval
+            ):
+                return
+            version = await data_version()
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self.clear()
+                self._version = version
+            self._version_checked_at = time.monotonic()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self._entries),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations,
+        )
+
+
+query_cache = QueryCache(
+    ttl=settings.QUERY_CACHE_TTL,
+    max_size=settings.QUERY_CACHE_MAX_SIZE,
+    version_check_interval=settings.QUERY_CACHE_VERSION_CHECK_INTERVAL,
+)
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    return query_cache if settings.QUERY_CACHE_ENABLED else None
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class DiskCache:
+    """
+    Size-bounded LRU store of bodies and their metadata on local disk. Each
+    entry is a `<key>.body` file next to a `<key>.json` metadata file, the
+    metadata file's mtime records the last access so the LRU order survives
+    restarts. Entries written by other processes sharing the directory are
+    picked up on first access. Methods block on file I/O, run them in a thread.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.size = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def load(self):
+        """Index the entries already on disk, least recently used first"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            key, suffix = os.path.splitext(name)
+            if suffix != ".json":
+                continue
+            try:
+                accessed = os.stat(self._path(key, "json")).st_mtime
+                size = os.stat(self._path(key, "body")).st_size
+            except FileNotFoundError:
+                self._remove(key)
+                continue
+            entries.append((accessed, key, size))
+        with self._lock:
+            self._entries.clear()
+            for _, key, size in sorted(entries):
+                self._entries[key] = size
+            self.size = sum(self._entries.values())
+            self._evict()
+
+    def get(self, key: str) -> Optional[Tuple[dict[str, Any], bytes]]:
+        try:
+            with open(self._path(key, "json")) as f:
+                meta = json.load(f)
+            with open(self._path(key, "body"), "rb") as f:
+                body = f.read()
+            os.utime(self._path(key, "json"))
+        except (FileNotFoundError, ValueError):
+            self.delete(key)
+            return None
+        with self._lock:
+            self.size += len(body) - self._entries.pop(key, 0)
+            self._entries[key] = len(body)
+            self._evict()
+        return meta, body
+
+    def set(self, key: str, meta: dict[str, Any], body: bytes):
+        if len(body) > self.max_size:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self._path(key, "body"), body)
+        self._write(self._path(key, "json"), json.dumps(meta).encode())
+        with self._lock:
+            self.size += len(body) - self._entries.pop(key, 0)
+            self._entries[key] = len(body)
+            self._evict()
+
+    def update(self, key: str, meta: dict[str, Any]):
+        """Replace the metadata of an entry, keeping its body"""
+        with self._lock:
+            if key not in self._entries:
+                return
+            self._entries.move_to_end(key)
+        self._write(self._path(key, "json"), json.dumps(meta).encode())
+
+    def delete(self, key: str):
+        with self._lock:
+            self.size -= self._entries.pop(key, 0)
+        self._remove(key)
+
+    @staticmethod
+    def _write(path: str, content: bytes):
+        # Readers never see a partially written file
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+    def _remove(self, key: str):
+        for suffix in ("json", "body"):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self.size > self.max_size and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,162 @@
+import asyncio
+import contextlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+from pydantic import BaseModel
+
+from app.core.cache.proxy import ProxyCache
+from app.core.config import settings
+from app.core.database import ClickHousePool
+from app.core.database.repositories.news import NewsRepository
+from app.core.logger import get_logger
+from app.core.worker_lock import WorkerLock
+
+
+class PrewarmStats(BaseModel):
+    running: bool
+    # Whether this worker holds the lock and prewarms for the host
+    leader: bool
+    cycles: int
+    last_cycle: Optional[datetime]
+    pending: int
+    fetched: int
+    cached: int
+    failed: int
+
+
+class ImagePrewarmer:
+    """
+    Background task storing the images of newly published news in the proxy
+    cache before anyone asks for them. Every `interval` seconds the image URLs
+    of the `batch` newest news of the last `lookback` seconds are fetched, at
+    most `concurrency` at a time and `host_rate` per second to a single host.
+    Workers sharing a `lock` take turns: only its holder prewarms, so the
+    host rate holds however many workers there are, and the others try to
+    take over every interval.
+    """
+
+    def __init__(
+        self,
+        repository: NewsRepository,
+        cache: ProxyCache,
+        client: httpx.AsyncClient,
+        interval: float,
+        lookback: float,
+        batch: int,
+        concurrency: int,
+        host_rate: float,
+        lock: Optional[WorkerLock] = None,
+    ):
+        self.repository = repository
+        self.cache = cache
+        self.client = client
+        self.interval = interval
+        self.lookback = timedelta(seconds=lookback)
+        self.batch = batch
+        self.host_rate = host_rate
+        self.lock = lock
+        self.cycles = 0
+        self.last_cycle: Optional[datetime] = None
+        self.pending = 0
+        self.fetched = 0
+        self.cached = 0
+        self.failed = 0
+        self.logger = get_logger(self.__class__.__name__)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._next_slot: dict[str, float] = {}
+        # URLs already handled, later cycles see them again within the lookback
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self.lock:
+            self.lock.release()
+
+    async def _run(self):
+        while True:
+            try:
+                if self.lock is None or self.lock.acquire():
+                    await self.prewarm()
+            except Exception as e:
+                self.logger.warning(f"Image prewarm failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def prewarm(self):
+        """Fetch the images of the newest news not handled yet"""
+        since = datetime.now(timezone.utc) - self.lookback
+        urls = await self.repository.image_urls(since.replace(tzinfo=None), self.batch)
+        urls = [url for url in urls if url not in self._seen]
+        self.pending += len(urls)
+        await asyncio.gather(*(self._warm(url) for url in urls))
+        self.cycles += 1
+        self.last_cycle = datetime.now(timezone.utc)
+
+    async def _throttle(self, host: str):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + 1 / self.host_rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _warm(self, url: str):
+        try:
+            # Waiting for a busy host must not hold a slot other hosts could use
+            await self._throttle(urlsplit(url).netloc)
+            async with self._semaphore:
+                response = await self.cache.get(self.client, url)
+        except Exception as e:
+            self.logger.debug(f"Image prewarm of {url} failed: {e}")
+            self.failed += 1
+        else:
+            if response.status_code != 200:
+                self.failed += 1
+            elif response.cache == "HIT":
+                self.cached += 1
+            else:
+                self.fetched += 1
+        finally:
+            self.pending -= 1
+        self._seen[url] = None
+        while len(self._seen) > 4 * self.batch:
+            self._seen.popitem(last=False)
+
+    def stats(self) -> PrewarmStats:
+        return PrewarmStats(
+            running=self._task is not None and not self._task.done(),
+            leader=self.lock is None or self.lock.held,
+            cycles=self.cycles,
+            last_cycle=self.last_cycle,
+            pending=self.pending,
+            fetched=self.fetched,
+            cached=self.cached,
+            failed=self.failed,
+        )
+
+
+def create_prewarmer(
+    pool: ClickHousePool, cache: ProxyCache, client: httpx.AsyncClient
+) -> ImagePrewarmer:
+    return ImagePrewarmer(
+        repository=NewsRepository(client=pool, cache=None),
+        cache=cache,
+        client=client,
+        interval=settings.IMAGE_PREWARM_INTERVAL,
+        lookback=settings.IMAGE_PREWARM_LOOKBACK,
+        batch=settings.IMAGE_PREWARM_BATCH,
+        concurrency=settings.IMAGE_PREWARM_CONCURRENCY,
+        host_rate=settings.IMAGE_PREWARM_HOST_RATE,
+        lock=WorkerLock(settings.IMAGE_PREWARM_LOCK_PATH),
+    )
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Literal, Mapping, NamedTuple, Optional
+
+import httpx
+from PIL import Image
+from pydantic import BaseModel
+
+from app.core.cache.disk import DiskCache
+from app.core.config import settings
+from app.core.images import ImageFormat, transform
+
+# Upstream headers kept with a cached body and sent back to the browser
+STORED_HEADERS = ("content-type", "cache-control", "etag", "last-modified", "expires")
+
+
+class BodyTooLarge(Exception):
+    """Raised when an upstream body is larger than the proxy accepts"""
+
+
+class ProxyResponse(NamedTuple):
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+    cache: Literal["HIT", "MISS", "REVALIDATED", "STALE"]
+
+
+class ProxyCacheStats(BaseModel):
+    entries: int
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    coalesced: int
+    revalidations: int
+    stale: int
+    evictions: int
+
+
+def freshness(headers: Mapping[str, str], default_ttl: float) -> Optional[float]:
+    """
+    Seconds a response may be served without revalidation following its
+    Cache-Control and Expires headers, None when it must not be stored
+    """
+    directives = {}
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return max(int(directives[name]), 0)
+            except ValueError:
+                return 0
+    if "expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["expires"])
+        except (TypeError, ValueError):
+            return 0
+        if expires.tzinfo is None:
+            expires = expires.replace(tzinfo=timezone.utc)
+        return max((expires - datetime.now(timezone.utc)).total_seconds(), 0)
+    return default_ttl
+
+
+class ProxyCache:
+    """
+    Caches proxied responses on disk. Fresh entries are served without any
+    upstream request, stale ones are revalidated with their ETag or
+    Last-Modified and served as is when the origin is unreachable.
+    Concurrent misses for the same URL share a single upstream request.
+    Resized or transcoded variants are derived from the cached original in
+    an executor of `image_workers` threads and cached alongside it.
+    Upstream bodies are streamed and refused past `max_body_size` bytes.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_size: int,
+        default_ttl: float,
+        image_workers: Optional[int] = None,
+        max_body_size: int = 20 << 20,
+    ):
+        self.disk = DiskCache(directory, max_size)
+        self.default_ttl = default_ttl
+        self.max_body_size = max_body_size
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidations = 0
+        self.stale = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=image_workers, thread_name_prefix="image"
+        )
+
+    async def start(self):
+        await asyncio.to_thread(self.disk.load)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def get(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        format: Optional[ImageFormat] = None,
+    ) -> ProxyResponse:
+        """
+        Get the response of url, with width, height or format the image
+        fitted in that size and encoded in that format
+        """
+        variant = (width, height, format) != (None, None, None)
+        source = f"{url}|{width}|{height}|{format}" if variant else url
+        key = hashlib.sha256(source.encode()).hexdigest()
+        entry = None
+        task = self._inflight.get(key)
+        if task is None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry and entry[0]["expires_at"] > time.time():
+                self.hits += 1
+                return ProxyResponse(200, entry[0]["headers"], entry[1], "HIT")
+            task = self._inflight.get(key)
+        self.misses += 1
+        if task is None:
+            task = asyncio.create_task(
+                self._derive(client, url, key, width, height, format)
+                if variant
+                else self._fetch(client, url, key, entry)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A client going away must not cancel the fetch other requests wait on
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        key: str,
+        entry: Optional[tuple[dict, bytes]],
+    ) -> ProxyResponse:
+        headers = {}
+        if entry:
+            cached = entry[0]["headers"]
+            if "etag" in cached:
+                headers["If-None-Match"] = cached["etag"]
+            if "last-modified" in cached:
+                headers["If-Modified-Since"] = cached["last-modified"]
+        try:
+            response, body = await self._download(client, url, headers)
+        except httpx.HTTPError:
+            if entry is None:
+                raise
+            response = body = None
+        if entry and (response is None or response.status_code >= 500):
+            self.stale += 1
+            return ProxyResponse(200, entry[0]["headers"], entry[1], "STALE")
+
+        stored = {
+            name: response.headers[name]
+            for name in STORED_HEADERS
+            if name in response.headers
+        }
+        ttl = freshness(response.headers, self.default_ttl)
+        if entry and response.status_code == 304:
+            self.revalidations += 1
+            meta = {**entry[0], "headers": {**entry[0]["headers"], **stored}}
+            if ttl is None:
+                await asyncio.to_thread(self.disk.delete, key)
+            else:
+                meta["expires_at"] = time.time() + ttl
+                await asyncio.to_thread(self.disk.update, key, meta)
+            return ProxyResponse(200, meta["headers"], entry[1], "REVALIDATED")
+
+        if response.status_code == 200 and ttl is not None:
+            meta = {"url": url, "headers": stored, "expires_at": time.time() + ttl}
+            await asyncio.to_thread(self.disk.set, key, meta, body)
+        return ProxyResponse(response.status_code, stored, body, "MISS")
+
+    async def _download(
+        self, client: httpx.AsyncClient, url: str, headers: dict[str, str]
+    ) -> tuple[httpx.Response, bytes]:
+        """
+        Response of url with its body, read as it arrives so a body past
+        max_body_size is refused without being held in memory
+        """
+        async with client.stream("GET", url, headers=headers) as response:
+            length = response.headers.get("content-length", "")
+            if length.isdigit() and int(length) > self.max_body_size:
+                raise BodyTooLarge(f"{url} is larger than {self.max_body_size} bytes")
+            chunks, size = [], 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > self.max_body_size:
+                    raise BodyTooLarge(
+                        f"{url} is larger than {self.max_body_size} bytes"
+                    )
+                chunks.append(chunk)
+        return response, b"".join(chunks)
+
+    async def _derive(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        key: str,
+        width: Optional[int],
+        height: Optional[int],
+        format: Optional[ImageFormat],
+    ) -> ProxyResponse:
+        original = await self.get(client, url)
+        if original.status_code != 200:
+            return original
+        loop = asyncio.get_running_loop()
+        try:
+            body, content_type = await loop.run_in_executor(
+                self._executor, transform, original.body, width, height, format
+            )
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Not an image Pillow can handle, serve it untouched
+            return original
+        # The origin's ETag describes the original, not this variant
+        headers = {
+            **{k: v for k, v in original.headers.items() if k != "etag"},
+            "content-type": content_type,
+        }
+        ttl = freshness(original.headers, self.default_ttl)
+        if ttl is not None:
+            meta = {"url": url, "headers": headers, "expires_at": time.time() + ttl}
+            await asyncio.to_thread(self.disk.set, key, meta, body)
+        return ProxyResponse(200, headers, body, "MISS")
+
+    def stats(self) -> ProxyCacheStats:
+        return ProxyCacheStats(
+            entries=len(self.disk),
+            size=self.disk.size,
+            max_size=self.disk.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            coalesced=self.coalesced,
+            revalidations=self.revalidations,
+            stale=self.stale,
+            evictions=self.disk.evictions,
+        )
+
+
+def create_proxy_cache() -> ProxyCache:
+    return ProxyCache(
+        directory=settings.PROXY_CACHE_DIR,
+        max_size=settings.PROXY_CACHE_MAX_SIZE,
+        default_ttl=settings.PROXY_CACHE_DEFAULT_TTL,
+        image_workers=settings.IMAGE_WORKERS,
+        max_body_size=settings.PROXY_MAX_BODY_SIZE,
+    )
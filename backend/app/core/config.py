@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Any, List, Optional, Union
 
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -9,6 +9,128 @@ class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
     CLICKHOUSE_DSN: str
     DEBUG: bool
+    # Queries a worker runs at once against ClickHouse, the rest wait their turn
+    CLICKHOUSE_MAX_CONCURRENCY: int = 16
+    CLICKHOUSE_HEALTH_CHECK_INTERVAL: float = 10
+    CLICKHOUSE_RECONNECT_MAX_BACKOFF: float = 30
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_TTL: float = 300
+    QUERY_CACHE_MAX_SIZE: int = 1024
+    QUERY_CACHE_VERSION_CHECK_INTERVAL: float = 5
+    # Share of news rows read to estimate approximate filtered counts
+    COUNT_SAMPLE_FRACTION: float = 0.1
+    # Seconds ClickHouse keeps aggregate results in its query cache, 0 disables it
+    CLICKHOUSE_QUERY_CACHE_TTL: int = 0
+    PROXY_CACHE_DIR: str = ".cache/proxy"
+    # Bytes of proxied bodies kept on disk
+    PROXY_CACHE_MAX_SIZE: int = 1 << 30
+    # Seconds a proxied response without Cache-Control or Expires stays fresh
+    PROXY_CACHE_DEFAULT_TTL: float = 86400
+    PROXY_TIMEOUT: float = 10
+    # Bytes of an upstream body the proxy reads, larger ones get a 502
+    PROXY_MAX_BODY_SIZE: int = 20 << 20
+    PROXY_MAX_CONNECTIONS: int = 100
+    # Threads resizing and transcoding proxied images, None sizes it to the CPUs
+    IMAGE_WORKERS: Optional[int] = None
+    # Fetch images of newly published news into the proxy cache in the background
+    IMAGE_PREWARM_ENABLED: bool = True
+    IMAGE_PREWARM_INTERVAL: float = 60
+    # Seconds back from now news are looked at, covering late ingestion
+    IMAGE_PREWARM_LOOKBACK: float = 3600
+    IMAGE_PREWARM_BATCH: int = 500
+    IMAGE_PREWARM_CONCURRENCY: int = 8
+    # Requests per second sent to any single image host
+    IMAGE_PREWARM_HOST_RATE: float = 2
+    # Lock file electing the one worker of the host that prewarms
+    IMAGE_PREWARM_LOCK_PATH: str = ".cache/prewarm.lock"
+    # Queries slower than this are written to the SlowQueryLog logger
+    SLOW_QUERY_THRESHOLD_MS: float = 1000
+    # Slowest queries kept in memory for GET /admin/queries/slow, served in DEBUG
+    SLOW_QUERY_TOP_N: int = 50
+    # POST /news/bulk buffers rows and inserts them in batches of this many
+    # rows or bytes, or once the oldest buffered row is this many seconds old
+    INGEST_BATCH_ROWS: int = 20_000
+    INGEST_BATCH_BYTES: int = 64 << 20
+    INGEST_FLUSH_INTERVAL: float = 2
+    # Past these, requests wait for a flush and get a 503 after the timeout
+    INGEST_BUFFER_ROWS: int = 200_000
+    INGEST_BUFFER_BYTES: int = 512 << 20
+    INGEST_WAIT_TIMEOUT: float = 10
+    # Rows whose insert is given up after retries are written to NDJSON files
+    # here, to be sent again to POST /news/bulk. Empty drops them.
+    INGEST_DEAD_LETTER_DIR: str = ".cache/dead-letter"
+    # Cluster near-duplicate news at ingestion, see app/core/dedup.py
+    DEDUP_ENABLED: bool = True
+    DEDUP_INDEX_PATH: str = ".cache/dedup/index.npz"
+    # Newest news the index compares with, about 140 bytes each
+    DEDUP_INDEX_SIZE: int = 1_000_000
+    # Characters of text compared after the title
+    DEDUP_SHINGLE_CHARS: int = 1000
+    # Seconds between writes of the index to disk, it is also written on shutdown
+    DEDUP_SNAPSHOT_INTERVAL: float = 300
+    # Older snapshots are ignored and the index is rebuilt from the newest news
+    DEDUP_SNAPSHOT_MAX_AGE: float = 3600
+    # Lock file electing the one worker of the host that saves the index
+    DEDUP_LOCK_PATH: str = ".cache/dedup/index.lock"
+    # Stop handling a request and kill its ClickHouse queries once its client
+    # disconnects, see app/core/disconnect.py
+    CANCEL_ON_DISCONNECT: bool = True
+    # Requests to the news routes a worker handles at once and queues, past
+    # which they get a 503, see app/core/admission.py
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENCY: int = 32
+    ADMISSION_MAX_QUEUE: int = 128
+    # Seconds a queued request waits for a slot before a 503
+    ADMISSION_QUEUE_TIMEOUT: float = 5
+    # Seconds turned away requests are told to wait in Retry-After
+    ADMISSION_RETRY_AFTER: int = 1
+    # Per class of routes: requests handled at once, requests queued past
+    # which they get a 429, and the settings of their ClickHouse queries
+    ADMISSION_BUDGETS: dict[str, dict[str, Any]] = {
+        "read": {
+            "max_concurrency": 24,
+            "max_queue": 96,
+            "settings": {"max_execution_time": 10, "max_memory_usage": 2 << 30},
+        },
+        "search": {
+            "max_concurrency": 8,
+            "max_queue": 16,
+            "settings": {
+                "max_execution_time": 10,
+                "max_rows_to_read": 200_000_000,
+                "max_memory_usage": 2 << 30,
+            },
+        },
+        "aggregate": {
+            "max_concurrency": 8,
+            "max_queue": 32,
+            "settings": {
+                "max_execution_time": 20,
+                "max_memory_usage": 4 << 30,
+                # Counting more distinct values than this stops the query
+                # with a 503 rather than answer a wrong top N
+                "max_rows_to_group_by": 1_000_000,
+                "group_by_overflow_mode": "throw",
+            },
+        },
+        "heavy": {
+            "max_concurrency": 2,
+            "max_queue": 4,
+            "settings": {
+                "max_execution_time": 20,
+                "max_rows_to_read": 1_000_000_000,
+                "max_memory_usage": 4 << 30,
+                "max_rows_to_group_by": 1_000_000,
+                "group_by_overflow_mode": "throw",
+            },
+        },
+        # Exports stream for as long as the client reads, they have no time limit
+        "export": {
+            "max_concurrency": 2,
+            "max_queue": 4,
+            "settings": {"max_memory_usage": 4 << 30},
+        },
+    }
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
     @field_validator("BACKEND_CORS_ORIGINS")
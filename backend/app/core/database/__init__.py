@@ -1,10 +1,26 @@
-from clickhouse_connect import get_async_client
-from urllib3 import PoolManager
+from fastapi import Request
 from app.core.config import settings
-from clickhouse_connect.driver import AsyncClient
+from app.core.database.pool import ClickHousePool, ClickHouseUnavailable, PoolStats
 
-pool_manager = PoolManager(num_pools=10, maxsize=10)
 
+def create_clickhouse_pool() -> ClickHousePool:
+    return ClickHousePool(
+        dsn=settings.CLICKHOUSE_DSN,
+        max_concurrency=settings.CLICKHOUSE_MAX_CONCURRENCY,
+        health_check_interval=settings.CLICKHOUSE_HEALTH_CHECK_INTERVAL,
+        max_backoff=settings.CLICKHOUSE_RECONNECT_MAX_BACKOFF,
+    )
 
-async def get_clickhouse_client() -> AsyncClient:
-    return await get_async_client(dsn=settings.CLICKHOUSE_DSN, pool_mgr=pool_manager)
+
+def get_clickhouse_client(request: Request) -> ClickHousePool:
+    """The worker's pool, created and started by the application lifespan"""
+    return request.app.state.clickhouse
+
+
+__all__ = [
+    "ClickHousePool",
+    "ClickHouseUnavailable",
+    "PoolStats",
+    "create_clickhouse_pool",
+    "get_clickhouse_client",
+]
@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Optional
+
+from clickhouse_connect import get_async_client
+from clickhouse_connect.driver import AsyncClient
+from clickhouse_connect.driver.exceptions import OperationalError
+from pydantic import BaseModel
+from urllib3 import PoolManager
+
+from app.core.logger import get_logger
+
+INITIAL_BACKOFF = 0.5
+# Connections of the control client, which kills queries. It is separate
+# so a kill is not queued behind the queries holding every slot.
+CONTROL_CONNECTIONS = 2
+KILL_QUERY = "KILL QUERY WHERE query_id = {query_id:String} ASYNC"
+
+
+class ClickHouseUnavailable(Exception):
+    """Raised when no ClickHouse connection could be established"""
+
+
+class PoolStats(BaseModel):
+    healthy: bool
+    max_concurrency: int
+    in_flight: int
+    waiting: int
+    queries: int
+    errors: int
+    reconnects: int
+    killed: int
+    last_health_check: Optional[datetime]
+
+
+class ClickHousePool:
+    """
+    ClickHouse client shared by every request of a worker. The connection
+    handshake happens once in `start`, at most `max_concurrency` queries run
+    at a time and the rest wait for a slot. A background task pings the
+    server every `health_check_interval` seconds and, when it is down,
+    reconnects with exponential backoff capped at `max_backoff` seconds.
+    Queries nobody waits for anymore are killed through a control client.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        max_concurrency: int,
+        health_check_interval: float,
+        max_backoff: float,
+    ):
+        self.dsn = dsn
+        self.max_concurrency = max_concurrency
+        self.health_check_interval = health_check_interval
+        self.max_backoff = max_backoff
+        self.healthy = False
+        self.in_flight = 0
+        self.waiting = 0
+        self.queries = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.killed = 0
+        self.last_health_check: Optional[datetime] = None
+        self.logger = get_logger(self.__class__.__name__)
+        self._pool_manager = PoolManager(num_pools=1, maxsize=max_concurrency)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[AsyncClient] = None
+        self._control: Optional[AsyncClient] = None
+        self._kills: set[asyncio.Task] = set()
+        self._control_lock = asyncio.Lock()
+        self._connect_lock = asyncio.Lock()
+        self._unhealthy = asyncio.Event()
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Connect and start the health checks, a failed connect is retried"""
+        await self._connect()
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def close(self):
+        if self._watcher:
+            self._watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._watcher
+            self._watcher = None
+        for task in list(self._kills):
+            task.cancel()
+        if self._control:
+            await self._control.close()
+            self._control = None
+        if self._client:
+            await self._client.close()
+            self._client = None
+        self.healthy = False
+        self._pool_manager.clear()
+
+    async def _connect(self) -> bool:
+        async with self._connect_lock:
+            try:
+                # Without a session, queries can share the client concurrently
+                client = await get_async_client(
+                    dsn=self.dsn,
+                    pool_mgr=self._pool_manager,
+                    autogenerate_session_id=False,
+                    executor_threads=self.max_concurrency,
+                )
+            except Exception as e:
+                self.logger.warning(f"ClickHouse connection failed: {e}")
+                self.healthy = False
+                return False
+            previous, self._client = self._client, client
+            if previous:
+                self.reconnects += 1
+                await previous.close()
+            self.healthy = True
+            self._unhealthy.clear()
+            return True
+
+    async def _check(self) -> bool:
+        self.last_health_check = datetime.now(timezone.utc)
+        if self._client and await self._client.ping():
+            self.healthy = True
+            return True
+        self.healthy = False
+        return await self._connect()
+
+    async def _watch(self):
+        backoff = INITIAL_BACKOFF
+        while True:
+            if await self._check():
+                backoff, delay = INITIAL_BACKOFF, self.health_check_interval
+            else:
+                delay, backoff = backoff, min(backoff * 2, self.max_backoff)
+            # A failed query wakes the watcher before the interval is over
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._unhealthy.wait(), delay)
+            self._unhealthy.clear()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AsyncClient]:
+        """Hold one of the concurrency slots while using the client"""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            if self._client is None:
+                raise ClickHouseUnavailable("ClickHouse is not connected")
+            yield self._client
+        except OperationalError:
+            self.errors += 1
+            self.healthy = False
+            self._unhealthy.set()
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.queries += 1
+            self._semaphore.release()
+
+    def kill(self, query_id: str):
+        """Ask ClickHouse to stop a query, without waiting for it to stop"""
+        task = asyncio.create_task(self._kill(query_id))
+        self._kills.add(task)
+        task.add_done_callback(self._kills.discard)
+
+    async def _control_client(self) -> AsyncClient:
+        """The control client, connected on the first kill"""
+        async with self._control_lock:
+            if self._control is None:
+                self._control = await get_async_client(
+                    dsn=self.dsn,
+                    pool_mgr=PoolManager(num_pools=1, maxsize=CONTROL_CONNECTIONS),
+                    autogenerate_session_id=False,
+                    executor_threads=CONTROL_CONNECTIONS,
+                )
+            return self._control
+
+    async def _kill(self, query_id: str):
+        try:
+            control = await self._control_client()
+            await control.command(KILL_QUERY, parameters={"query_id": query_id})
+            self.killed += 1
+        except Exception as e:
+            self.logger.warning(f"Killing query {query_id} failed: {e}")
+            if isinstance(e, OperationalError) and self._control:
+                # Reconnected on the next kill
+                control, self._control = self._control, None
+                await control.close()
+
+    async def query(self, *args, **kwargs) -> Any:
+        async with self.acquire() as client:
+            return await client.query(*args, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def raw_stream(self, *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Stream of a query result, ClickHouse keeps running the query while it
+        is read so the slot is held until the stream is closed on exit
+        """
+        async with self.acquire() as client:
+            stream = await client.raw_stream(*args, **kwargs)
+            try:
+                yield stream
+            finally:
+                stream.close()
+
+    async def command(self, *args, **kwargs) -> Any:
+        async with self.acquire() as client:
+            return await client.command(*args, **kwargs)
+
+    async def insert(self, *args, **kwargs) -> Any:
+        async with self.acquire() as client:
+            return await client.insert(*args, **kwargs)
+
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            healthy=self.healthy,
+            max_concurrency=self.max_concurrency,
+            in_flight=self.in_flight,
+            waiting=self.waiting,
+            queries=self.queries,
+            errors=self.errors,
+            reconnects=self.reconnects,
+            killed=self.killed,
+            last_health_check=self.last_health_check,
+        )
@@ -1,115 +1,838 @@
-from datetime import datetime
-from typing import Any, Optional
+import asyncio
+import contextlib
+import functools
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Optional, get_args, get_origin
+from clickhouse_connect.driver.exceptions import DatabaseError
 from fastapi import Depends
-from app.core.database import get_clickhouse_client, AsyncClient
+from app.core.admission import budget_error, query_settings
+from app.core.cache import QueryCache, get_query_cache
+from app.core.database import ClickHousePool, get_clickhouse_client
+from app.core.config import settings
+from app.core.schemas.filters import BaseFilters, Parameters
 
 from app.core.schemas.filters.news import NewsFilters
 from app.core.models.news import News
 from app.core.schemas import CountResponse
 from app.core.schemas.news import (
+    FacetValue,
+    NewsCursor,
+    SentimentBucket,
     SentimentByDay,
     SentimentByCountry,
     SentimentCount,
+    SeriesInterval,
 )
 from pydantic import TypeAdapter
 from app.core.logger import get_logger
+from app.core.metrics import (
+    observe_query,
+    observe_query_cancelled,
+    observe_query_error,
+)
+from app.core.profiler import profiler
+
+
+EXPORT_CHUNK_SIZE = 1 << 16
+# Dashboard aggregates repeat with the same filters, let ClickHouse reuse results
+AGGREGATE_SETTINGS = (
+    {"use_query_cache": 1, "query_cache_ttl": settings.CLICKHOUSE_QUERY_CACHE_TTL}
+    if settings.CLICKHOUSE_QUERY_CACHE_TTL
+    else None
+)
+# news is a ReplacingMergeTree, rows read with FINAL hide re-sent articles not
+# merged yet and the tombstones replacing them. A tombstone shares the sorting
+# key, so the partition, of the row it replaces, each partition can be merged
+# on its own, see 007_news_tombstones.sql
+FINAL_SETTINGS = {"do_not_merge_across_partitions_select_final": 1}
+# Aggregates read from news rather than from a rollup
+FINAL_AGGREGATE_SETTINGS = {**(AGGREGATE_SETTINGS or {}), **FINAL_SETTINGS}
+# Columns of the sorting key of news, a tombstone carries the values of the row
+# it replaces
+KEY_COLUMNS = ("country", "language", "sentiment", "publish_date")
+# Filter columns news_sentiment_daily is keyed by, see 002_create_sentiment_rollups.sql
+ROLLUP_COLUMNS = {"country", "language", "sentiment"}
+SENTIMENT_COLUMNS = """
+    COUNT(CASE WHEN sentiment = 'positive' THEN 1 END) AS positive,
+    COUNT(CASE WHEN sentiment = 'negative' THEN 1 END) AS negative,
+    COUNT(CASE WHEN sentiment = 'neutral' THEN 1 END) AS neutral,
+    COUNT(CASE WHEN sentiment = 'very negative' THEN 1 END) AS very_negative,
+    COUNT(CASE WHEN sentiment = 'very positive' THEN 1 END) AS very_positive,
+    COUNT(*) AS all
+"""
+ROLLUP_SENTIMENT_COLUMNS = """
+    sumIf(count, sentiment = 'positive') AS positive,
+    sumIf(count, sentiment = 'negative') AS negative,
+    sumIf(count, sentiment = 'neutral') AS neutral,
+    sumIf(count, sentiment = 'very negative') AS very_negative,
+    sumIf(count, sentiment = 'very positive') AS very_positive,
+    sum(count) AS all
+"""
+# Near-duplicates share a cluster_id, see app/core/dedup.py. Collapsed
+# aggregates count stories: a story counts once per sentiment its copies have.
+COLLAPSED_SENTIMENT_COLUMNS = """
+    uniqExactIf(cluster_id, sentiment = 'positive') AS positive,
+    uniqExactIf(cluster_id, sentiment = 'negative') AS negative,
+    uniqExactIf(cluster_id, sentiment = 'neutral') AS neutral,
+    uniqExactIf(cluster_id, sentiment = 'very negative') AS very_negative,
+    uniqExactIf(cluster_id, sentiment = 'very positive') AS very_positive,
+    uniqExact(cluster_id) AS all
+"""
+
+
+ARRAY_FIELDS = {
+    name
+    for name, field in News.model_fields.items()
+    if get_origin(field.annotation) is list
+}
+NULLABLE_FIELDS = {
+    name
+    for name, field in News.model_fields.items()
+    if type(None) in get_args(field.annotation)
+}
+NEWS_COLUMNS = ", ".join(News.model_fields)
+# Building a TypeAdapter compiles a validator, do it once per type
+NEWS_ADAPTER = TypeAdapter(list[News])
+SENTIMENT_COUNT_ADAPTER = TypeAdapter(list[SentimentCount])
+SENTIMENT_BY_DAY_ADAPTER = TypeAdapter(list[SentimentByDay])
+SENTIMENT_BUCKET_ADAPTER = TypeAdapter(list[SentimentBucket])
+SENTIMENT_BY_COUNTRY_ADAPTER = TypeAdapter(list[SentimentByCountry])
+
+
+@dataclass
+class QueryRun:
+    """A query being sent, see NewsRepository._run"""
+
+    query_id: str
+    settings: dict[str, Any]
+    summary: dict[str, Any] = field(default_factory=dict)
+
+
+def _truncate(value: datetime, interval: SeriesInterval) -> datetime:
+    """
+    Start of the hour or day of value. Ranges are truncated to what their
+    query tells apart before they are cached, `to` defaults to now and would
+    otherwise make a new key on every request.
+    """
+    if interval == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    # Weeks and months are made of whole days
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _key(value: Any) -> Any:
+    if isinstance(value, BaseFilters):
+        return value.cache_key()
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def cached(method):
+    """Serve the method's result from the repository cache when one is set"""
+
+    @functools.wraps(method)
+    async def wrapper(self: "NewsRepository", *args, **kwargs):
+        if self.cache is None:
+            return await method(self, *args, **kwargs)
+        await self.cache.validate(self.data_version)
+        key = (
+            method.__name__,
+            *map(_key, args),
+            *((name, _key(value)) for name, value in sorted(kwargs.items())),
+        )
+        found, value = self.cache.get(key)
+        if not found:
+            value = await method(self, *args, **kwargs)
+            self.cache.set(key, value)
+        return value
+
+    return wrapper
 
 
 class NewsRepository:
-    def __init__(self, client: AsyncClient = Depends(get_clickhouse_client)):
+    EXPORT_FORMATS = {
+        "ndjson": "JSONEachRow",
+        "csv": "CSVWithNames",
+        "parquet": "Parquet",
+    }
+
+    def __init__(
+        self,
+        client: ClickHousePool = Depends(get_clickhouse_client),
+        cache: Optional[QueryCache] = Depends(get_query_cache),
+    ):
         self.client = client
+        self.cache = cache
         self.logger = get_logger(self.__class__.__name__)
 
+    @contextlib.asynccontextmanager
+    async def _run(
+        self,
+        query: str,
+        parameters: Optional[Parameters],
+        settings: Optional[dict[str, Any]],
+        name: str,
+    ) -> AsyncIterator[QueryRun]:
+        """
+        Instrument one query sent in the block: its metrics and profile are
+        labelled with name, the repository method sending it, and it is
+        killed when the block is cancelled. The block sends it with the
+        settings of the run and sets the summary of its result.
+        """
+        self.logger.debug(f"Query: {query}")
+        query_id = profiler.query_id()
+        # Settings of the method win over the budget of the request
+        run = QueryRun(
+            query_id, {**query_settings(), **(settings or {}), "query_id": query_id}
+        )
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            yield run
+        except (asyncio.CancelledError, GeneratorExit):
+            # Nobody waits for the result, e.g. the client disconnected
+            observe_query_cancelled(name, time.perf_counter() - start)
+            self.client.kill(query_id)
+            raise
+        except Exception as e:
+            observe_query_error(name, time.perf_counter() - start)
+            exceeded = budget_error(e) if isinstance(e, DatabaseError) else None
+            if exceeded:
+                raise exceeded from e
+            raise
+        elapsed = time.perf_counter() - start
+        observe_query(name, elapsed, run.summary)
+        profiler.record(
+            query_id, name, query, parameters, started_at, elapsed, run.summary
+        )
+
+    async def _query(
+        self,
+        query: str,
+        parameters: Optional[Parameters] = None,
+        settings: Optional[dict[str, Any]] = None,
+        *,
+        name: str,
+    ):
+        """Send a query with the budget settings of the request, see `_run`"""
+        async with self._run(query, parameters, settings, name) as run:
+            result = await self.client.query(
+                query, parameters=parameters, settings=run.settings
+            )
+            run.summary = result.summary
+        return result
+
+    async def data_version(self) -> tuple:
+        """Changes whenever rows are inserted into or removed from news"""
+        query = """
+            SELECT
+                max(max_block_number) AS block,
+                sum(rows) AS rows
+            FROM
+                system.parts
+            WHERE
+                database = currentDatabase()
+                AND table = 'news'
+                AND active
+        """
+        version = await self._query(query, name="data_version")
+        return tuple(version.result_rows[0])
+
     async def fetch(
-        self, limit, offset, filters: Optional[NewsFilters] = None
-    ) -> list[News]:
-        base_query = "Select * from news"
-        if filters:
-            base_query = filters.apply_filters(base_query)
-        news = await self.client.query(f"{base_query} limit {limit} offset {offset};")
-        self.logger.debug(f"Query: {base_query}")
-        return TypeAdapter(list[News]).validate_python(list(news.named_results()))
-
-    async def fetch_count(self, filters: Optional[NewsFilters] = None) -> CountResponse:
-        base_query = "Select count(id) as count from news"
-        if filters:
-            base_query = filters.apply_filters(base_query)
-        news = await self.client.query(f"{base_query};")
+        self,
+        limit,
+        offset,
+        filters: Optional[NewsFilters] = None,
+        cursor: Optional[NewsCursor] = None,
+        fields: Optional[list[str]] = None,
+        relevance: bool = False,
+        validate: bool = True,
+        collapse: bool = False,
+    ) -> list[News] | list[dict[str, Any]]:
+        """
+        Fetch a page of news ordered by (publish_date, id), newest first.
+        With a cursor the page starts right after it and offset is ignored,
+        so deep pages cost the same as the first one.
+        With fields only those columns (plus id and publish_date, which the
+        cursor needs) are read and rows are returned as dicts.
+        With relevance the best search matches come first.
+        Without validate rows are returned as dicts as ClickHouse typed them,
+        skipping the per-row model validation, for callers that serialize
+        them straight away.
+        With collapse only the first news of every cluster of near-duplicates
+        in the page order is returned. Clusters are collapsed within a page,
+        a story whose copies span pages of a cursor shows up on each of them.
+        """
+        columns = NEWS_COLUMNS
+        if fields:
+            fields = list(dict.fromkeys(["id", "publish_date", *fields]))
+            columns = ", ".join(fields)
+        base_query, parameters = (filters or NewsFilters()).apply_filters(
+            f"Select {columns} from news FINAL",
+            [cursor.seek_condition()] if cursor else [],
+            {
+                **(cursor.parameters() if cursor else {}),
+                "limit": limit,
+                "offset": 0 if cursor else offset,
+            },
+        )
+        order_by = "publish_date desc, id desc"
+        score = filters.build_relevance() if relevance and filters else None
+        if score:
+            order_by = f"{score} desc, {order_by}"
+        limit_by = " limit 1 by cluster_id" if collapse else ""
+        news = await self._query(
+            f"{base_query} order by {order_by}{limit_by}"
+            " limit {limit:UInt32} offset {offset:UInt64}",
+            parameters,
+            FINAL_SETTINGS,
+            name="fetch",
+        )
+        rows = list(news.named_results())
+        if fields or not validate:
+            return rows
+        return NEWS_ADAPTER.validate_python(rows)
+
+    async def get(self, id: str) -> Optional[News]:
+        base_query, parameters = NewsFilters(id=[id]).apply_filters(
+            f"Select {NEWS_COLUMNS} from news FINAL"
+        )
+        news = await self._query(
+            f"{base_query} limit 1", parameters, FINAL_SETTINGS, name="get"
+        )
+        rows = list(news.named_results())
+        return News.model_validate(rows[0]) if rows else None
+
+    async def export(
+        self,
+        format: str,
+        filters: Optional[NewsFilters] = None,
+        fields: Optional[list[str]] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream every filtered row, encoded by ClickHouse in one of
+        EXPORT_FORMATS, in chunks of EXPORT_CHUNK_SIZE bytes
+        """
+        columns = ", ".join(fields) if fields else NEWS_COLUMNS
+        base_query, parameters = (filters or NewsFilters()).apply_filters(
+            f"Select {columns} from news FINAL"
+        )
+        chunks = self._stream(base_query, parameters, self.EXPORT_FORMATS[format])
+        # The query starts with the first chunk, so a failing one fails here
+        # rather than once the response has started
+        await anext(chunks)
+        return chunks
+
+    async def _stream(
+        self, query: str, parameters: Parameters, fmt: str
+    ) -> AsyncIterator[bytes]:
+        """
+        Chunks of the result of query encoded by ClickHouse in fmt, after an
+        empty one sent once the query has started. The pool slot is held and
+        the query instrumented until the last chunk is read or the reader
+        gives up, then the query is killed.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._run(query, parameters, FINAL_SETTINGS, "export") as run:
+            async with self.client.raw_stream(
+                query, parameters=parameters, settings=run.settings, fmt=fmt
+            ) as stream:
+                yield b""
+                while chunk := await loop.run_in_executor(
+                    None, stream.read, EXPORT_CHUNK_SIZE
+                ):
+                    yield chunk
+
+    @cached
+    async def fetch_count(
+        self,
+        filters: Optional[NewsFilters] = None,
+        approximate: bool = False,
+        collapse: bool = False,
+    ) -> CountResponse:
+        """
+        Count the filtered news. Approximate counts skip the scan: without
+        filters the row totals of the table parts are summed, rows of re-sent
+        news not merged yet included, filters the rollup holds are counted
+        there and any other filter is estimated from a sample of
+        COUNT_SAMPLE_FRACTION of the rows. Exact counts read with FINAL, so a
+        re-sent news not merged yet is counted once.
+        Collapsed counts count clusters of near-duplicates, estimated with
+        uniq when approximate.
+        """
+        if collapse:
+            base_query, parameters = (filters or NewsFilters()).apply_filters(
+                f"Select {'uniq' if approximate else 'uniqExact'}(cluster_id) as count"
+                " from news FINAL"
+            )
+            news = await self._query(
+                base_query, parameters, FINAL_SETTINGS, name="fetch_count"
+            )
+            count = list(news.named_results())[0]["count"]
+            return CountResponse(count=count, exact=not approximate)
+        if approximate:
+            if filters is None or not any(filters.shape()):
+                return await self._parts_count()
+            if self._from_rollup(filters):
+                query, parameters = filters.apply_filters(
+                    "Select sum(count) as count from news_sentiment_daily"
+                )
+                news = await self._query(query, parameters, name="fetch_count")
+                return CountResponse.model_validate(list(news.named_results())[0])
+            return await self._sample_count(filters)
+        base_query, parameters = (filters or NewsFilters()).apply_filters(
+            "Select count(id) as count from news FINAL"
+        )
+        news = await self._query(
+            base_query, parameters, FINAL_SETTINGS, name="fetch_count"
+        )
         return CountResponse.model_validate(list(news.named_results())[0])
 
+    async def _parts_count(self) -> CountResponse:
+        query = """
+            SELECT
+                sum(rows) AS count
+            FROM
+                system.parts
+            WHERE
+                database = currentDatabase()
+                AND table = 'news'
+                AND active
+        """
+        news = await self._query(query, name="fetch_count")
+        # Rows not merged yet, replaced news and their tombstones, are counted
+        return CountResponse(**list(news.named_results())[0], exact=False)
+
+    async def _sample_count(self, filters: NewsFilters) -> CountResponse:
+        fraction = settings.COUNT_SAMPLE_FRACTION
+        # Tombstones are left out and the versions of a re-sent news not
+        # merged yet counted once, they share the sampling hash of their id
+        base_query, parameters = filters.apply_filters(
+            f"""
+                Select
+                    uniqExact(id) as sampled,
+                    uniqExact(id) * any(_sample_factor) as count
+                from
+                    news SAMPLE {fraction}
+            """,
+            ["is_deleted = 0"],
+        )
+        news = await self._query(base_query, parameters, name="fetch_count")
+        row = list(news.named_results())[0]
+        # Each row is sampled independently with probability fraction
+        error = 1.96 * math.sqrt(row["sampled"] * (1 - fraction)) / fraction
+        return CountResponse(
+            count=round(row["count"]), exact=False, error=math.ceil(error)
+        )
+
+    @cached
     async def distinct(
-        self, field: str, filters: Optional[NewsFilters] = None
+        self, field: str, filters: Optional[NewsFilters] = None, top_n: int = 1000
     ) -> list[Any]:
-        base_query = f"Select distinct({field}) as {field} from news"
-        if filters:
-            base_query = filters.apply_filters(base_query)
-        news = await self.client.query(f"{base_query};")
-        self.logger.debug(f"Query: {base_query}")
-        return list(map(lambda x: x[field], news.named_results()))
-
-    async def sentiments_count(self) -> list[SentimentCount]:
-        query = """
-            SELECT 
-                sentiment as name,
-                COUNT(sentiment) as count
+        """The top_n most common values of field"""
+        facets = await self.facets([field], filters, top_n)
+        return [facet.value for facet in facets[field]]
+
+    @staticmethod
+    def _facet_values(field: str) -> str:
+        """Array of (field, value) tuples of a row, one per value of field"""
+        if field in ARRAY_FIELDS:
+            return f"arrayMap(value -> ('{field}', value), {field})"
+        if field in NULLABLE_FIELDS:
+            return (
+                f"if(isNull({field}), [],"
+                f" [('{field}', toString(assumeNotNull({field})))])"
+            )
+        return f"[('{field}', toString({field}))]"
+
+    @cached
+    async def facets(
+        self,
+        fields: list[str],
+        filters: Optional[NewsFilters] = None,
+        top_n: int = 20,
+        prefix: Optional[str] = None,
+        collapse: bool = False,
+    ) -> dict[str, list[FacetValue]]:
+        """
+        The top_n most common values of each field with their count, in one
+        scan. Every element of an array field is counted on its own and values
+        can be narrowed to those starting with prefix, ignoring case.
+        With collapse a value counts the clusters of near-duplicates having it.
+        """
+        if not fields:
+            # arrayConcat needs at least one array
+            return {}
+        unknown = [field for field in fields if field not in News.model_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        values = ", ".join(map(self._facet_values, fields))
+        base_query, parameters = (filters or NewsFilters()).apply_filters(
+            f"""
+                SELECT
+                    arrayJoin(arrayConcat({values})) AS facet_value,
+                    facet_value.1 AS facet,
+                    facet_value.2 AS value,
+                    cluster_id
+                FROM
+                    news FINAL
+            """
+        )
+        count = "uniqExact(cluster_id)" if collapse else "count()"
+        query = f"""
+            SELECT
+                facet,
+                value,
+                {count} AS count
             FROM
-                news n
+                ({base_query})
+        """
+        if prefix:
+            query += " WHERE startsWith(lowerUTF8(value), {prefix:String})"
+            parameters["prefix"] = prefix.lower()
+        query += """
             GROUP BY
-                sentiment
+                facet,
+                value
+            ORDER BY
+                facet,
+                count DESC,
+                value
+            LIMIT {top_n:UInt32} BY facet
         """
-        news = await self.client.query(query)
-        self.logger.debug(f"Query: {query}")
-        return TypeAdapter(list[SentimentCount]).validate_python(
+        news = await self._query(
+            query, {**parameters, "top_n": top_n}, FINAL_SETTINGS, name="facets"
+        )
+        facets: dict[str, list[FacetValue]] = {field: [] for field in fields}
+        for row in news.named_results():
+            facets[row["facet"]].append(FacetValue(value=row["value"], count=row["count"]))
+        return facets
+
+    @staticmethod
+    def _from_rollup(filters: Optional[NewsFilters]) -> bool:
+        """Whether news_sentiment_daily holds every column the filters use"""
+        if filters is None:
+            return True
+        if filters.search and filters.search_fields:
+            return False
+        used = {
+            key
+            for key, values in filters.model_dump(
+                exclude={"not_in_fields", "search_fields", "search"}
+            ).items()
+            if values
+        }
+        return used <= ROLLUP_COLUMNS
+
+    @cached
+    async def sentiments_count(
+        self, filters: Optional[NewsFilters] = None, collapse: bool = False
+    ) -> list[SentimentCount]:
+        if collapse:
+            # The rollup counts every copy
+            query = """
+                SELECT
+                    sentiment as name,
+                    uniqExact(cluster_id) as count
+                FROM
+                    news n FINAL
+            """
+        elif self._from_rollup(filters):
+            query = """
+                SELECT
+                    sentiment as name,
+                    sum(count) as count
+                FROM
+                    news_sentiment_daily
+            """
+        else:
+            query = """
+                SELECT
+                    sentiment as name,
+                    COUNT(sentiment) as count
+                FROM
+                    news n FINAL
+            """
+        query, parameters = (filters or NewsFilters()).apply_filters(query)
+        news = await self._query(
+            f"{query} GROUP BY sentiment",
+            parameters,
+            FINAL_AGGREGATE_SETTINGS,
+            name="sentiments_count",
+        )
+        return SENTIMENT_COUNT_ADAPTER.validate_python(
             list(news.named_results())
         )
 
     async def sentiments_count_by_date(
-        self, from_: datetime, to: datetime
+        self,
+        from_: datetime,
+        to: datetime,
+        filters: Optional[NewsFilters] = None,
+        collapse: bool = False,
     ) -> list[SentimentByDay]:
-        query = f"""
-            SELECT 
-                DATE(publish_date) AS date,
-                COUNT(CASE WHEN sentiment = 'positive' THEN 1 END) AS positive,
-                COUNT(CASE WHEN sentiment = 'negative' THEN 1 END) AS negative,
-                COUNT(CASE WHEN sentiment = 'neutral' THEN 1 END) AS neutral,
-                COUNT(CASE WHEN sentiment = 'very negative' THEN 1 END) AS very_negative,
-                COUNT(CASE WHEN sentiment = 'very positive' THEN 1 END) AS very_positive,
-                COUNT(*) AS all
+        """Count news by sentiment for every day from from_ to to, newest first"""
+        return await self._sentiments_count_by_date(
+            _truncate(from_, "day"), _truncate(to, "day"), filters, collapse
+        )
+
+    @cached
+    async def _sentiments_count_by_date(
+        self,
+        from_: datetime,
+        to: datetime,
+        filters: Optional[NewsFilters] = None,
+        collapse: bool = False,
+    ) -> list[SentimentByDay]:
+        if not collapse and self._from_rollup(filters):
+            query = f"""
+                SELECT
+                    day AS date,
+                    {ROLLUP_SENTIMENT_COLUMNS}
+                FROM
+                    news_sentiment_daily
+            """
+            date = "day"
+        else:
+            query = f"""
+                SELECT
+                    DATE(publish_date) AS date,
+                    {COLLAPSED_SENTIMENT_COLUMNS if collapse else SENTIMENT_COLUMNS}
+                FROM
+                    news n FINAL
+            """
+            date = "DATE(publish_date)"
+        query, parameters = (filters or NewsFilters()).apply_filters(
+            query,
+            [f"{date} >= {{from_date:Date}}", f"{date} <= {{to_date:Date}}"],
+            {
+                "from_date": from_.strftime("%Y-%m-%d"),
+                "to_date": to.strftime("%Y-%m-%d"),
+            },
+        )
+        news = await self._query(
+            f"{query} GROUP BY date ORDER BY date DESC",
+            parameters,
+            FINAL_AGGREGATE_SETTINGS,
+            name="sentiments_count_by_date",
+        )
+        return SENTIMENT_BY_DAY_ADAPTER.validate_python(
+            list(news.named_results())
+        )
+
+    async def sentiments_series(
+        self,
+        interval: SeriesInterval,
+        from_: datetime,
+        to: datetime,
+        filters: Optional[NewsFilters] = None,
+        collapse: bool = False,
+    ) -> list[SentimentBucket]:
+        """
+        Count news by sentiment in buckets of one interval, oldest first,
+        from the bucket holding from_ to the one holding to. Buckets without
+        news are filled with zeros. Day and longer intervals are summed from
+        the daily rollup when the filters allow it and news are not collapsed.
+        """
+        return await self._sentiments_series(
+            interval,
+            _truncate(from_, interval),
+            _truncate(to, interval),
+            filters,
+            collapse,
+        )
+
+    @cached
+    async def _sentiments_series(
+        self,
+        interval: SeriesInterval,
+        from_: datetime,
+        to: datetime,
+        filters: Optional[NewsFilters] = None,
+        collapse: bool = False,
+    ) -> list[SentimentBucket]:
+        step = f"INTERVAL 1 {interval.upper()}"
+        # Week and month starts are Dates, keep every bucket a DateTime
+        first = f"toDateTime(toStartOfInterval({{from_time:DateTime}}, {step}))"
+        last = f"toDateTime(toStartOfInterval({{to_time:DateTime}}, {step}))"
+        if interval != "hour" and not collapse and self._from_rollup(filters):
+            query = f"""
+                SELECT
+                    toDateTime(toStartOfInterval(day, {step})) AS bucket,
+                    {ROLLUP_SENTIMENT_COLUMNS}
+                FROM
+                    news_sentiment_daily
+            """
+            conditions = [f"day >= toDate({first})", f"day < toDate({last} + {step})"]
+        else:
+            query = f"""
+                SELECT
+                    toDateTime(toStartOfInterval(publish_date, {step})) AS bucket,
+                    {COLLAPSED_SENTIMENT_COLUMNS if collapse else SENTIMENT_COLUMNS}
+                FROM
+                    news n FINAL
+            """
+            conditions = [
+                f"publish_date >= {first}",
+                f"publish_date < {last} + {step}",
+            ]
+        query, parameters = (filters or NewsFilters()).apply_filters(
+            query,
+            conditions,
+            {
+                "from_time": from_.strftime("%Y-%m-%d %H:%M:%S"),
+                "to_time": to.strftime("%Y-%m-%d %H:%M:%S"),
+            },
+        )
+        news = await self._query(
+            f"{query} GROUP BY bucket"
+            f" ORDER BY bucket WITH FILL FROM {first} TO {last} + {step} STEP {step}",
+            parameters,
+            FINAL_AGGREGATE_SETTINGS,
+            name="sentiments_series",
+        )
+        return SENTIMENT_BUCKET_ADAPTER.validate_python(list(news.named_results()))
+
+    @cached
+    async def sentiments_count_by_country(
+        self, filters: Optional[NewsFilters] = None, collapse: bool = False
+    ) -> list[SentimentByCountry]:
+        if not collapse and self._from_rollup(filters):
+            query = f"""
+                SELECT
+                    country,
+                    {ROLLUP_SENTIMENT_COLUMNS}
+                FROM
+                    news_sentiment_daily
+            """
+        else:
+            query = f"""
+                SELECT
+                    country,
+                    {COLLAPSED_SENTIMENT_COLUMNS if collapse else SENTIMENT_COLUMNS}
+                FROM
+                    news n FINAL
+            """
+        query, parameters = (filters or NewsFilters()).apply_filters(query)
+        news = await self._query(
+            f"{query} GROUP BY country ORDER BY country",
+            parameters,
+            FINAL_AGGREGATE_SETTINGS,
+            name="sentiments_count_by_country",
+        )
+        return SENTIMENT_BY_COUNTRY_ADAPTER.validate_python(
+            list(news.named_results())
+        )
+
+    async def image_urls(self, since: datetime, limit: int) -> list[str]:
+        """
+        Distinct image URLs of the `limit` newest news published after since,
+        newest first
+        """
+        query = """
+            SELECT
+                top_image,
+                meta_img,
+                meta_favicon
             FROM
-                news n
+                news
             WHERE
-                publish_date >= '{from_.strftime("%Y-%m-%d")}' 
-                AND publish_date <= '{to.strftime("%Y-%m-%d")}'
-            GROUP BY
-                DATE(publish_date)
+                publish_date > {since:DateTime}
             ORDER BY
-                date DESC
+                publish_date DESC
+            LIMIT {limit:UInt32}
         """
-        news = await self.client.query(query)
-        self.logger.debug(f"Query: {query}")
-        return TypeAdapter(list[SentimentByDay]).validate_python(
-            list(news.named_results())
+        news = await self._query(
+            query, {"since": since, "limit": limit}, name="image_urls"
         )
+        return list(dict.fromkeys(url for row in news.result_rows for url in row if url))
 
-    async def sentiments_count_by_country(self) -> list[SentimentByCountry]:
+    async def recent_documents(
+        self, limit: int, chars: int, page_rows: int
+    ) -> AsyncIterator[list[tuple]]:
+        """
+        id, title, first chars of text and cluster_id of the `limit` newest
+        news, oldest first, in pages of page_rows
+        """
         query = """
-            SELECT 
-                country,
-                COUNT(CASE WHEN sentiment = 'positive' THEN 1 END) AS positive,
-                COUNT(CASE WHEN sentiment = 'negative' THEN 1 END) AS negative,
-                COUNT(CASE WHEN sentiment = 'neutral' THEN 1 END) AS neutral,
-                COUNT(CASE WHEN sentiment = 'very negative' THEN 1 END) AS very_negative,
-                COUNT(CASE WHEN sentiment = 'very positive' THEN 1 END) AS very_positive,
-                COUNT(*) AS all
+            SELECT
+                min(publish_date)
             FROM
-                news n
-            GROUP BY
-                country
-            ORDER BY
-                country
+                (
+                    SELECT
+                        publish_date
+                    FROM
+                        news FINAL
+                    WHERE
+                        publish_date IS NOT NULL
+                    ORDER BY
+                        publish_date DESC
+                    LIMIT {limit:UInt32}
+                )
         """
-        news = await self.client.query(query)
-        self.logger.debug(f"Query: {query}")
-        return TypeAdapter(list[SentimentByCountry]).validate_python(
-            list(news.named_results())
+        first = await self._query(
+            query, {"limit": limit}, FINAL_SETTINGS, name="recent_documents"
         )
+        since = first.result_rows[0][0]
+        if since is None:
+            return
+        query = """
+            SELECT
+                id,
+                title,
+                substringUTF8(text, 1, {chars:UInt32}) AS text,
+                cluster_id,
+                publish_date
+            FROM
+                news FINAL
+            WHERE
+                publish_date >= {since:DateTime}
+                AND (publish_date, id) > ({after:DateTime}, {after_id:String})
+            ORDER BY
+                publish_date,
+                id
+            LIMIT {page_rows:UInt32}
+        """
+        parameters = {"chars": chars, "since": since, "page_rows": page_rows}
+        after, after_id = since, ""
+        while True:
+            page = await self._query(
+                query,
+                {**parameters, "after": after, "after_id": after_id},
+                FINAL_SETTINGS,
+                name="recent_documents",
+            )
+            rows = page.result_rows
+            if rows:
+                yield [row[:4] for row in rows]
+            if len(rows) < page_rows:
+                return
+            after_id, after = rows[-1][0], rows[-1][4]
+
+    async def versions(self, ids: list[str]) -> dict[str, tuple]:
+        """
+        Latest stored row of each of ids that is already in news, as its
+        revision, is_deleted and its values of KEY_COLUMNS. Read from
+        news_versions, sorted by id, see 009_news_versions.sql.
+        """
+        query = f"""
+            SELECT
+                id,
+                revision,
+                is_deleted,
+                {", ".join(KEY_COLUMNS)}
+            FROM
+                news_versions
+            WHERE
+                id IN {{ids:Array(String)}}
+            ORDER BY
+                revision DESC
+            LIMIT
+                1 BY id
+        """
+        news = await self._query(query, {"ids": ids}, name="versions")
+        return {id: tuple(version) for id, *version in news.result_rows}
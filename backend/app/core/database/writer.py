@@ -0,0 +1,439 @@
+import asyncio
+import contextlib
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional, get_args, get_origin
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.database.pool import ClickHousePool
+from app.core.database.repositories.news import KEY_COLUMNS, NewsRepository
+from app.core.dedup import (
+    NearDuplicateIndex,
+    create_near_duplicate_index,
+    own_cluster,
+)
+from app.core.logger import get_logger
+from app.core.models.news import News
+from app.core.worker_lock import WorkerLock
+
+COLUMNS = tuple(News.model_fields)
+INSERT_COLUMNS = (*COLUMNS, "revision", "cluster_id", "is_deleted")
+# A failed insert is retried with the same deduplication token, so a retry of
+# an insert that reached ClickHouse before failing is not stored twice
+INSERT_ATTEMPTS = 5
+INITIAL_BACKOFF = 0.5
+# Ids per revision lookup, query parameters are sent in the URL which
+# ClickHouse limits to http_max_uri_size, 1MiB by default
+REVISION_LOOKUP_IDS = 1000
+# News per query while rebuilding the near-duplicate index
+REBUILD_PAGE_ROWS = 50_000
+
+
+def _empty(annotation) -> Any:
+    if get_origin(annotation) is list:
+        return []
+    return None if type(None) in get_args(annotation) else ""
+
+
+# Values of a tombstone but its id and KEY_COLUMNS
+TOMBSTONE = {
+    name: _empty(field.annotation) for name, field in News.model_fields.items()
+}
+
+
+def _write_ndjson(path: str, rows: list[tuple]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        for row in rows:
+            news = News.model_construct(**dict(zip(COLUMNS, row)))
+            file.write(news.model_dump_json().encode() + b"\n")
+
+
+class BufferFull(Exception):
+    """Raised when the buffer had no room for rows within the wait timeout"""
+
+
+class IngestStats(BaseModel):
+    running: bool
+    buffered: int
+    buffered_bytes: int
+    in_flight: int
+    waiting: int
+    accepted: int
+    duplicates: int
+    flushed: int
+    flushes: int
+    errors: int
+    # News written to the dead letter directory after their insert was given up
+    dead_lettered: int
+    # News that joined the cluster of an earlier one, and news the index holds
+    clustered: int
+    indexed: int
+    last_flush: Optional[datetime]
+
+
+class NewsWriter:
+    """
+    Write-behind buffer of news rows in COLUMNS order. Rows are kept by id,
+    a row sent again before it is flushed replaces the buffered one. A
+    background task inserts the buffer in column oriented batches of at most
+    `batch_rows` once it holds `batch_rows` rows or `batch_bytes` bytes, or
+    once its oldest row is `flush_interval` seconds old. While buffered and
+    in flight rows are over `max_rows` or `max_bytes`, `put` waits for a
+    flush and raises BufferFull after `wait_timeout` seconds. With an
+    `index`, news are clustered with their near-duplicates before they are
+    inserted and the index is saved every `snapshot_interval` seconds. The
+    index is rebuilt from the newest stored news before the first flush when
+    its snapshot is missing or older than `snapshot_max_age` seconds. Workers
+    sharing a `lock` share the snapshot, only its holder saves it. Rows whose
+    insert is given up are written to an NDJSON file in `dead_letter_dir`,
+    which can be sent again to POST /news/bulk.
+    """
+
+    def __init__(
+        self,
+        pool: ClickHousePool,
+        repository: NewsRepository,
+        batch_rows: int,
+        batch_bytes: int,
+        flush_interval: float,
+        max_rows: int,
+        max_bytes: int,
+        wait_timeout: float,
+        index: Optional[NearDuplicateIndex] = None,
+        snapshot_interval: float = 300,
+        snapshot_max_age: Optional[float] = None,
+        lock: Optional[WorkerLock] = None,
+        dead_letter_dir: Optional[str] = None,
+    ):
+        self.pool = pool
+        self.repository = repository
+        self.batch_rows = batch_rows
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self.index = index
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_max_age = snapshot_max_age
+        self.lock = lock
+        self.dead_letter_dir = dead_letter_dir
+        self.waiting = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.errors = 0
+        self.dead_lettered = 0
+        self.last_flush: Optional[datetime] = None
+        self.logger = get_logger(self.__class__.__name__)
+        self._rows: dict[str, tuple] = {}
+        self._sizes: dict[str, int] = {}
+        self._bytes = 0
+        self._in_flight = 0
+        self._in_flight_bytes = 0
+        self._oldest: Optional[float] = None
+        # Resolved once the rows buffered now are inserted
+        self._flushed: Optional[asyncio.Future] = None
+        self._room = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_snapshot = 0.0
+        # Pages of the rebuild are indexed in a thread
+        self._indexing: Optional[asyncio.Future] = None
+
+    def start(self):
+        self._last_snapshot = asyncio.get_running_loop().time()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and insert what is still buffered"""
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._indexing:
+            # Left running by the cancelled rebuild, the index is not thread safe
+            with contextlib.suppress(Exception):
+                await self._indexing
+            self._indexing = None
+        while self._rows:
+            await self.flush()
+        if self.index is not None and self._saves_index():
+            await asyncio.to_thread(self.index.save)
+        if self.lock:
+            self.lock.release()
+
+    def _saves_index(self) -> bool:
+        return self.lock is None or self.lock.acquire()
+
+    async def _restore(self):
+        """Load the index snapshot, or rebuild the index from stored news"""
+        if await asyncio.to_thread(self.index.load, self.snapshot_max_age):
+            return
+        documents = self.repository.recent_documents(
+            self.index.capacity, self.index.chars, REBUILD_PAGE_ROWS
+        )
+        try:
+            async for page in documents:
+                ids, titles, texts, clusters = map(list, zip(*page))
+                self._indexing = asyncio.ensure_future(
+                    asyncio.to_thread(self.index.cluster, ids, titles, texts, clusters)
+                )
+                await asyncio.shield(self._indexing)
+        except Exception as e:
+            self.logger.warning(f"Rebuilding the near-duplicate index failed: {e}")
+        self.logger.info(
+            f"Rebuilt the near-duplicate index with {len(self.index)} news"
+        )
+
+    def _has_room(self, rows: int, size: int) -> bool:
+        buffered = len(self._rows) + self._in_flight
+        if buffered == 0:
+            # A request larger than the whole buffer still gets through alone
+            return True
+        return (
+            buffered + rows <= self.max_rows
+            and self._bytes + self._in_flight_bytes + size <= self.max_bytes
+        )
+
+    def _full(self) -> bool:
+        return len(self._rows) >= self.batch_rows or self._bytes >= self.batch_bytes
+
+    async def put(self, rows: list[tuple], sizes: list[int]) -> asyncio.Future:
+        """
+        Buffer rows with their size in bytes and return a future resolved
+        once they are inserted, or failed when their insert is given up
+        """
+        size = sum(sizes)
+        async with self._room:
+            if not self._has_room(len(rows), size):
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(
+                        self._room.wait_for(lambda: self._has_room(len(rows), size)),
+                        self.wait_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise BufferFull(
+                        f"Ingest buffer is full, retry in {self.flush_interval:g}s"
+                    )
+                finally:
+                    self.waiting -= 1
+            if not self._rows:
+                self._oldest = asyncio.get_running_loop().time()
+                self._wakeup.set()
+            if self._flushed is None:
+                self._flushed = asyncio.get_running_loop().create_future()
+            for row, row_size in zip(rows, sizes):
+                id = row[0]
+                if id in self._rows:
+                    self.duplicates += 1
+                    self._bytes -= self._sizes[id]
+                self._rows[id] = row
+                self._sizes[id] = row_size
+                self._bytes += row_size
+            self.accepted += len(rows)
+            if self._full():
+                self._wakeup.set()
+            return self._flushed
+
+    def _delay(self) -> Optional[float]:
+        """Seconds until the buffer is due for a flush, None when it is empty"""
+        if self._oldest is None:
+            return None
+        elapsed = asyncio.get_running_loop().time() - self._oldest
+        return max(self.flush_interval - elapsed, 0)
+
+    async def _run(self):
+        if self.index is not None:
+            await self._restore()
+        while True:
+            delay = self._delay()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    # Woken up by the first row or by a full buffer
+                    self._wakeup.clear()
+                    if not self._full():
+                        continue
+            await self.flush()
+
+    async def flush(self):
+        """Insert everything buffered now, in batches of at most batch_rows"""
+        if not self._rows:
+            return
+        rows = list(self._rows.values())
+        size = self._bytes
+        done, self._flushed = self._flushed, None
+        self._rows, self._sizes, self._bytes = {}, {}, 0
+        self._oldest = None
+        self._in_flight += len(rows)
+        self._in_flight_bytes += size
+        start = 0
+        try:
+            for start in range(0, len(rows), self.batch_rows):
+                await self._insert(rows[start : start + self.batch_rows])
+        except Exception as e:
+            self.errors += 1
+            # Earlier batches are inserted
+            await self._dead_letter(rows[start:], e)
+            if done and not done.done():
+                done.set_exception(e)
+                # Nobody may be waiting for it
+                done.exception()
+        else:
+            self.flushes += 1
+            self.flushed += len(rows)
+            self.last_flush = datetime.now(timezone.utc)
+            if done and not done.done():
+                done.set_result(len(rows))
+            await self._snapshot()
+        finally:
+            self._in_flight -= len(rows)
+            self._in_flight_bytes -= size
+            async with self._room:
+                self._room.notify_all()
+
+    async def _dead_letter(self, rows: list[tuple], error: Exception):
+        if not self.dead_letter_dir:
+            self.logger.error(f"Giving up inserting {len(rows)} news: {error}")
+            return
+        path = os.path.join(
+            self.dead_letter_dir,
+            f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex}.ndjson",
+        )
+        try:
+            await asyncio.to_thread(_write_ndjson, path, rows)
+        except Exception as e:
+            self.logger.error(
+                f"Giving up inserting {len(rows)} news: {error}, and writing them"
+                f" to {path} failed: {e}"
+            )
+            return
+        self.dead_lettered += len(rows)
+        self.logger.error(
+            f"Giving up inserting {len(rows)} news: {error}, written to {path}"
+            " to be sent again to POST /news/bulk"
+        )
+
+    async def _snapshot(self):
+        loop = asyncio.get_running_loop()
+        if self.index and loop.time() - self._last_snapshot >= self.snapshot_interval:
+            self._last_snapshot = loop.time()
+            if not self._saves_index():
+                return
+            try:
+                await asyncio.to_thread(self.index.save)
+            except Exception as e:
+                self.logger.warning(f"Saving the near-duplicate index failed: {e}")
+
+    def _clusters(self, rows: list[tuple]) -> list[int]:
+        ids = [row[0] for row in rows]
+        if self.index is None:
+            return [own_cluster(id) for id in ids]
+        titles = [row[COLUMNS.index("title")] for row in rows]
+        texts = [row[COLUMNS.index("text")] for row in rows]
+        try:
+            return self.index.cluster(ids, titles, texts)
+        except Exception as e:
+            # Clustering is best effort, it never holds back an insert
+            self.logger.warning(f"Clustering {len(ids)} news failed: {e}")
+            return [own_cluster(id) for id in ids]
+
+    async def _retry(self, attempt):
+        backoff = INITIAL_BACKOFF
+        for remaining in range(INSERT_ATTEMPTS - 1, -1, -1):
+            try:
+                return await attempt()
+            except Exception as e:
+                if not remaining:
+                    raise
+                self.logger.warning(f"News insert failed, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff *= 2
+
+    async def _insert(self, rows: list[tuple]):
+        """
+        Insert rows with the revision after the latest one stored for their
+        id. The live row stored for an id is replaced by a tombstone with its
+        sorting key, which may differ from the new row's, so the table keeps
+        only the new row of every id.
+        """
+        ids = [row[0] for row in rows]
+        stored: dict[str, tuple] = {}
+        for start in range(0, len(ids), REVISION_LOOKUP_IDS):
+            end = start + REVISION_LOOKUP_IDS
+            stored |= await self._retry(
+                lambda: self.repository.versions(ids[start:end])
+            )
+        # Hashing the text is CPU bound, flushes run one at a time so the
+        # index is only used by one thread
+        clusters = await asyncio.to_thread(self._clusters, rows)
+        inserted, tombstones = [], []
+        for row, cluster in zip(rows, clusters):
+            # A new id is stored as a deleted row of revision 0
+            revision, is_deleted, *key = stored.get(row[0], (0, 1))
+            if not is_deleted:
+                revision += 1
+                values = {**TOMBSTONE, "id": row[0], **dict(zip(KEY_COLUMNS, key))}
+                tombstones.append((*values.values(), revision, cluster, 1))
+            inserted.append((*row, revision + 1, cluster, 0))
+        data = [list(column) for column in zip(*inserted, *tombstones)]
+        token = str(uuid.uuid4())
+        await self._retry(
+            lambda: self.pool.insert(
+                "news",
+                data,
+                column_names=INSERT_COLUMNS,
+                column_oriented=True,
+                settings={
+                    "insert_deduplicate": 1,
+                    "insert_deduplication_token": token,
+                },
+            )
+        )
+
+    def stats(self) -> IngestStats:
+        return IngestStats(
+            running=self._task is not None and not self._task.done(),
+            buffered=len(self._rows),
+            buffered_bytes=self._bytes,
+            in_flight=self._in_flight,
+            waiting=self.waiting,
+            accepted=self.accepted,
+            duplicates=self.duplicates,
+            flushed=self.flushed,
+            flushes=self.flushes,
+            errors=self.errors,
+            dead_lettered=self.dead_lettered,
+            clustered=self.index.clustered if self.index else 0,
+            indexed=len(self.index) if self.index else 0,
+            last_flush=self.last_flush,
+        )
+
+
+def create_news_writer(pool: ClickHousePool) -> NewsWriter:
+    return NewsWriter(
+        pool=pool,
+        repository=NewsRepository(client=pool, cache=None),
+        batch_rows=settings.INGEST_BATCH_ROWS,
+        batch_bytes=settings.INGEST_BATCH_BYTES,
+        flush_interval=settings.INGEST_FLUSH_INTERVAL,
+        max_rows=settings.INGEST_BUFFER_ROWS,
+        max_bytes=settings.INGEST_BUFFER_BYTES,
+        wait_timeout=settings.INGEST_WAIT_TIMEOUT,
+        index=create_near_duplicate_index() if settings.DEDUP_ENABLED else None,
+        snapshot_interval=settings.DEDUP_SNAPSHOT_INTERVAL,
+        snapshot_max_age=settings.DEDUP_SNAPSHOT_MAX_AGE,
+        lock=WorkerLock(settings.DEDUP_LOCK_PATH),
+        dead_letter_dir=settings.INGEST_DEAD_LETTER_DIR,
+    )
@@ -0,0 +1,320 @@
+import hashlib
+import os
+import string
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+# MinHash signatures of NUM_HASHES values split in BANDS bands of ROWS values.
+# Two articles are candidates when every value of one of their bands is equal,
+# with probability 1 - (1 - s^ROWS)^BANDS for a Jaccard similarity s of their
+# shingles: 0.03 at 0.5, 0.38 at 0.7, 0.77 at 0.8 and 0.99 at 0.9.
+NUM_HASHES = 64
+BANDS = 8
+ROWS = NUM_HASHES // BANDS
+# Shingles are runs of this many words
+SHINGLE_WORDS = 3
+# Bytes that separate words, lowercase ASCII punctuation, whitespace and
+# control characters. NUL must not survive, it marks the end of a document.
+SEPARATORS = (
+    (string.punctuation + string.whitespace).encode() + bytes(range(32)) + b"\x7f"
+)
+NORMALIZE = bytes(32 if byte in SEPARATORS else byte for byte in range(256))
+# Separates documents in the buffer their words are hashed from
+DOCUMENT_SEPARATOR = b" \x00 "
+EMPTY = np.uint64(np.iinfo(np.uint64).max)
+# Entries added since the last merge into the sorted arrays, at least this
+# many or an eighth of the sorted ones before they are merged
+MIN_PENDING = 1 << 16
+
+_random = np.random.default_rng(0x5EED)
+# Tabulation hashing of words, one random value per byte and position in the
+# word modulo 16. Spaces hash to 0 so they don't change the XOR of a word.
+WORD_TABLE = _random.integers(0, 1 << 63, size=(16, 256), dtype=np.uint64)
+WORD_TABLE[:, 32] = 0
+WORD_TABLE = WORD_TABLE.ravel()
+SHINGLE_FACTORS = _random.integers(0, 1 << 63, size=SHINGLE_WORDS, dtype=np.uint64) | 1
+BAND_FACTORS = _random.integers(0, 1 << 63, size=(BANDS, ROWS), dtype=np.uint64) | 1
+DENSIFY_FACTOR = 0x9E3779B97F4A7C15
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, spreads every input bit over the output in place"""
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def _word_hashes(documents: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    """Hash of every word of the documents and the index of its document"""
+    data = DOCUMENT_SEPARATOR.join(documents)
+    if not data.strip():
+        return np.empty(0, np.uint64), np.empty(0, np.intp)
+    text = np.frombuffer(data, np.uint8)
+    in_word = text != 32
+    first = in_word.copy()
+    first[1:] &= ~in_word[:-1]
+    starts = np.flatnonzero(first).astype(np.int32)
+    # Position of every byte in its word, from the start of the word
+    word_start = np.zeros(len(text), np.int32)
+    word_start[starts] = starts
+    np.maximum.accumulate(word_start, out=word_start)
+    index = np.arange(len(text), dtype=np.int32)
+    index -= word_start
+    index &= 15
+    index <<= 8
+    index += text
+    hashes = np.bitwise_xor.reduceat(WORD_TABLE.take(index), starts)
+    separators = text[starts] == 0
+    document = np.cumsum(separators)
+    words = ~separators
+    return _mix(hashes[words]), document[words]
+
+
+def signatures(documents: list[bytes]) -> np.ndarray:
+    """
+    MinHash signatures of the shingles of normalized documents, one row of
+    NUM_HASHES values per document. One permutation hashing: a single hash
+    per shingle, its top bits pick the value it is a minimum candidate of.
+    Values no shingle fell into are filled from the next filled one, rows of
+    documents shorter than a shingle stay EMPTY.
+    """
+    signature = np.full((len(documents), NUM_HASHES), EMPTY, np.uint64)
+    words, document = _word_hashes(documents)
+    if len(words) < SHINGLE_WORDS:
+        return signature
+    count = len(words) - SHINGLE_WORDS + 1
+    shingles = np.zeros(count, np.uint64)
+    for offset, factor in enumerate(SHINGLE_FACTORS):
+        shingles += words[offset : offset + count] * factor
+    _mix(shingles)
+    shingle_document = document[:count]
+    within = shingle_document == document[SHINGLE_WORDS - 1 :]
+    shingles, shingle_document = shingles[within], shingle_document[within]
+    bucket = (shingles >> np.uint64(58)).astype(np.intp)
+    np.minimum.at(
+        signature, (shingle_document, bucket), shingles & np.uint64((1 << 58) - 1)
+    )
+    # Densification by rotation, see Shrivastava and Li, ICML 2014
+    filled = signature.copy()
+    missing = (filled == EMPTY) & (signature != EMPTY).any(axis=1, keepdims=True)
+    shift = 1
+    while missing.any():
+        rotated = np.roll(signature, -shift, axis=1)
+        found = missing & (rotated != EMPTY)
+        filled[found] = rotated[found] + np.uint64(shift * DENSIFY_FACTOR % (1 << 64))
+        missing &= ~found
+        shift += 1
+    return filled
+
+
+def band_keys(signature: np.ndarray) -> np.ndarray:
+    """One key per band of every signature, distinct across bands"""
+    bands = signature.reshape(len(signature), BANDS, ROWS) * BAND_FACTORS
+    keys = bands.sum(axis=2, dtype=np.uint64)
+    keys += np.arange(BANDS, dtype=np.uint64)
+    return _mix(keys)
+
+
+def document(title: str, text: str, chars: int) -> bytes:
+    """Title and the first chars of text, lowercase with words separated by spaces"""
+    return f"{title} {text[:chars]}".lower().encode().translate(NORMALIZE)
+
+
+def own_cluster(id: str) -> int:
+    """
+    Cluster id of an article that is not a copy of an earlier one, the
+    cluster_id default of news: reinterpretAsUInt64(substring(MD5(id), 1, 8))
+    """
+    return int.from_bytes(hashlib.md5(id.encode()).digest()[:8], "little")
+
+
+class DedupStats(BaseModel):
+    articles: int
+    entries: int
+    clustered: int
+    last_snapshot: Optional[datetime]
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of the band keys of the last `capacity` articles, mapping a
+    key to the newest article that had it. An article sharing a band key
+    with an indexed one joins its cluster, other articles start their own.
+    Keys live in sorted numpy arrays searched in one call per batch, keys
+    added since the last merge in a dict, about 140 bytes per article.
+    The index is written to `path` by `save` and read back by `load`, only
+    articles indexed since are lost on a crash. `chars` of text after the
+    title are shingled: wire copies share their lead and differ in the
+    boilerplate around it, and it bounds the time spent per article.
+    """
+
+    def __init__(self, path: str, capacity: int, chars: int):
+        self.path = path
+        self.capacity = capacity
+        self.chars = chars
+        self.clustered = 0
+        self.last_snapshot: Optional[datetime] = None
+        self.logger = get_logger(self.__class__.__name__)
+        self._clear()
+
+    def _clear(self):
+        self._keys = np.empty(0, np.uint64)
+        self._articles = np.empty(0, np.int64)
+        self._pending: dict[int, int] = {}
+        # Cluster of article n at n % capacity
+        self._clusters = np.zeros(self.capacity, np.uint64)
+        self._next = 0
+
+    def _params(self) -> np.ndarray:
+        return np.array([NUM_HASHES, BANDS, SHINGLE_WORDS, self.chars, self.capacity])
+
+    def __len__(self) -> int:
+        return min(self._next, self.capacity)
+
+    def cluster(
+        self,
+        ids: list[str],
+        titles: list[str],
+        texts: list[str],
+        clusters: Optional[list[int]] = None,
+    ) -> list[int]:
+        """
+        Cluster id of every article, indexing them in order. Articles given
+        their clusters, already stored, are indexed in them.
+        """
+        documents = [document(title, text, self.chars) for title, text in zip(titles, texts)]
+        signature = signatures(documents)
+        keys = band_keys(signature)
+        indexable = (signature != EMPTY).all(axis=1).tolist()
+        # Keys already in the sorted arrays, alive or evicted
+        flat = keys.ravel()
+        positions = np.searchsorted(self._keys, flat)
+        stored = np.zeros(len(flat), bool)
+        if len(self._keys):
+            inside = positions < len(self._keys)
+            stored[inside] = self._keys[positions[inside]] == flat[inside]
+        positions = positions.reshape(keys.shape).tolist()
+        stored = stored.reshape(keys.shape).tolist()
+        keys = keys.tolist()
+        known, clusters = clusters, []
+        for i, id in enumerate(ids):
+            if not indexable[i]:
+                clusters.append(own_cluster(id) if known is None else known[i])
+                continue
+            oldest = self._next - self.capacity
+            cluster = None
+            for key, position, in_sorted in zip(keys[i], positions[i], stored[i]):
+                article = (
+                    int(self._articles[position])
+                    if in_sorted
+                    else self._pending.get(key, -1)
+                )
+                if cluster is None and article >= oldest and article >= 0:
+                    cluster = int(self._clusters[article % self.capacity])
+                # The key now leads to this article
+                if in_sorted:
+                    self._articles[position] = self._next
+                else:
+                    self._pending[key] = self._next
+            if known is not None:
+                cluster = known[i]
+            elif cluster is None:
+                cluster = own_cluster(id)
+            else:
+                self.clustered += 1
+            self._clusters[self._next % self.capacity] = cluster
+            self._next += 1
+            clusters.append(cluster)
+        if len(self._pending) >= max(MIN_PENDING, len(self._keys) // 8):
+            self._merge()
+        return clusters
+
+    def _merge(self):
+        """Move pending keys into the sorted arrays, dropping evicted articles"""
+        oldest = self._next - self.capacity
+        alive = self._articles >= oldest
+        keys, articles = self._keys[alive], self._articles[alive]
+        pending = np.fromiter(self._pending.keys(), np.uint64, len(self._pending))
+        pending_articles = np.fromiter(
+            self._pending.values(), np.int64, len(self._pending)
+        )
+        order = np.argsort(pending)
+        pending, pending_articles = pending[order], pending_articles[order]
+        positions = np.searchsorted(keys, pending)
+        self._keys = np.insert(keys, positions, pending)
+        self._articles = np.insert(articles, positions, pending_articles)
+        self._pending = {}
+
+    def save(self):
+        """Write the index to path, replacing the previous snapshot at once"""
+        if self._pending:
+            self._merge()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npz", delete=False) as f:
+            np.savez(
+                f,
+                params=self._params(),
+                keys=self._keys,
+                articles=self._articles,
+                clusters=self._clusters,
+                next=np.array([self._next]),
+            )
+        os.replace(f.name, self.path)
+        self.last_snapshot = datetime.now(timezone.utc)
+
+    def load(self, max_age: Optional[float] = None) -> bool:
+        """
+        Read the snapshot at path, if any was written with the same settings
+        less than max_age seconds ago, and return whether it was read
+        """
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+            if max_age is not None and age > max_age:
+                self.logger.warning(f"Ignoring {self.path}, written {age:.0f}s ago")
+                return False
+            with np.load(self.path) as snapshot:
+                if not np.array_equal(snapshot["params"], self._params()):
+                    self.logger.warning(
+                        f"Ignoring {self.path}, written with other dedup settings"
+                    )
+                    return False
+                self._keys = snapshot["keys"]
+                self._articles = snapshot["articles"]
+                self._clusters = snapshot["clusters"]
+                self._next = int(snapshot["next"][0])
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable {self.path}: {e}")
+            self._clear()
+            return False
+        self.logger.info(f"Loaded {len(self)} articles from {self.path}")
+        return True
+
+    def stats(self) -> DedupStats:
+        return DedupStats(
+            articles=len(self),
+            entries=len(self._keys) + len(self._pending),
+            clustered=self.clustered,
+            last_snapshot=self.last_snapshot,
+        )
+
+
+def create_near_duplicate_index() -> NearDuplicateIndex:
+    return NearDuplicateIndex(
+        path=settings.DEDUP_INDEX_PATH,
+        capacity=settings.DEDUP_INDEX_SIZE,
+        chars=settings.DEDUP_SHINGLE_CHARS,
+    )
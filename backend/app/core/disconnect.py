@@ -0,0 +1,53 @@
+import asyncio
+
+
+class DisconnectMiddleware:
+    """
+    Cancels the handling of a request once its client disconnects, so the
+    ClickHouse queries it awaits are killed rather than run for nobody, see
+    NewsRepository._query. The client's messages are read as they arrive
+    and handed to the application when it asks for them, a disconnect is
+    noticed even while the application is not reading.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        messages: asyncio.Queue = asyncio.Queue()
+        responded = False
+
+        async def send_and_track(message):
+            nonlocal responded
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                responded = True
+            await send(message)
+
+        handler = asyncio.create_task(self.app(scope, messages.get, send_and_track))
+
+        async def watch():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    # Servers also answer disconnect once the response is
+                    # sent, work left after it, like background tasks, goes on
+                    if not responded:
+                        scope["disconnected"] = True
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            handler.cancel()
+            # Cancelled because the server is shutting down, not the client
+            if not scope.get("disconnected") or asyncio.current_task().cancelling():
+                raise
+        finally:
+            watcher.cancel()
@@ -0,0 +1,49 @@
+import io
+from typing import Literal, Optional
+
+from PIL import Image, ImageOps
+
+ImageFormat = Literal["webp", "avif", "jpeg"]
+
+# Pillow format name, content type and encoder options of each output format
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", "image/avif", {"quality": 60, "speed": 8}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True}),
+}
+
+
+def transform(
+    body: bytes,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    format: Optional[ImageFormat] = None,
+) -> tuple[bytes, str]:
+    """
+    Fit an image within width x height, keeping its aspect ratio and never
+    upscaling, and encode it as format, or in its own format when none is
+    given. Returns the encoded bytes and their content type. Decoding and
+    encoding are CPU bound, call it from an executor.
+    """
+    with Image.open(io.BytesIO(body)) as original:
+        source_format = original.format
+        if width or height:
+            size = (width or original.width, height or original.height)
+            # JPEGs decode straight to a smaller scale, far cheaper than a full decode
+            original.draft("RGB", size)
+        image = ImageOps.exif_transpose(original)
+        if width or height:
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+
+    if format is None:
+        options = {}
+        pillow_format = source_format
+        content_type = Image.MIME.get(source_format, "application/octet-stream")
+    else:
+        pillow_format, content_type, options = FORMATS[format]
+    if pillow_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, pillow_format, **options)
+    return output.getvalue(), content_type
@@ -0,0 +1,168 @@
+import time
+from typing import Any, Iterator
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.core.cache import get_query_cache
+
+# Status of requests whose client disconnected before the response, as nginx logs them
+CLIENT_CLOSED_REQUEST = 499
+# Buckets in seconds, from cache hits to full table scans
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the last byte of the response was sent",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled", ["method"]
+)
+CLICKHOUSE_QUERIES = Counter(
+    "clickhouse_queries_total", "ClickHouse queries sent", ["query", "status"]
+)
+CLICKHOUSE_QUERY_DURATION = Histogram(
+    "clickhouse_query_duration_seconds",
+    "Time from sending a ClickHouse query to receiving its result",
+    ["query"],
+    buckets=LATENCY_BUCKETS,
+)
+CLICKHOUSE_READ_ROWS = Counter(
+    "clickhouse_read_rows_total", "Rows ClickHouse read to answer queries", ["query"]
+)
+CLICKHOUSE_READ_BYTES = Counter(
+    "clickhouse_read_bytes_total", "Bytes ClickHouse read to answer queries", ["query"]
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the count, latency and in-flight number of HTTP requests. Routes
+    are labelled by their path template so ids don't create new series.
+    Requests cancelled once their client disconnected are labelled 499.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        status = None
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            # The router adds the matched route to the scope
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            if status is None:
+                status = CLIENT_CLOSED_REQUEST if scope.get("disconnected") else 500
+            HTTP_REQUEST_DURATION.labels(method, path).observe(
+                time.perf_counter() - start
+            )
+            HTTP_REQUESTS.labels(method, path, status).inc()
+
+
+def observe_query(name: str, elapsed: float, summary: dict[str, Any]):
+    """Record a finished ClickHouse query and the reads of its summary"""
+    CLICKHOUSE_QUERIES.labels(name, "ok").inc()
+    CLICKHOUSE_QUERY_DURATION.labels(name).observe(elapsed)
+    CLICKHOUSE_READ_ROWS.labels(name).inc(int(summary.get("read_rows", 0)))
+    CLICKHOUSE_READ_BYTES.labels(name).inc(int(summary.get("read_bytes", 0)))
+
+
+def observe_query_error(name: str, elapsed: float):
+    CLICKHOUSE_QUERIES.labels(name, "error").inc()
+    CLICKHOUSE_QUERY_DURATION.labels(name).observe(elapsed)
+
+
+def observe_query_cancelled(name: str, elapsed: float):
+    CLICKHOUSE_QUERIES.labels(name, "cancelled").inc()
+    CLICKHOUSE_QUERY_DURATION.labels(name).observe(elapsed)
+
+
+# Stats fields that only grow, the others are current values
+CUMULATIVE_STATS = {
+    "hits",
+    "misses",
+    "evictions",
+    "invalidations",
+    "coalesced",
+    "revalidations",
+    "stale",
+    "queries",
+    "errors",
+    "reconnects",
+    "cycles",
+    "fetched",
+    "cached",
+    "failed",
+    "accepted",
+    "duplicates",
+    "flushed",
+    "flushes",
+    "dead_lettered",
+    "clustered",
+    "admitted",
+    "rejected",
+    "timeouts",
+    "killed",
+}
+
+
+class StateCollector(Collector):
+    """
+    Exposes the counters the query cache, proxy cache, prewarmer, ingest
+    buffer, admission controller and ClickHouse pool already keep. They are read when Prometheus
+    scrapes rather than recorded on every request.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def collect(self) -> Iterator:
+        sources = {
+            "query_cache": get_query_cache(),
+            "proxy_cache": getattr(self.state, "proxy_cache", None),
+            "image_prewarm": getattr(self.state, "prewarmer", None),
+            "clickhouse_pool": getattr(self.state, "clickhouse", None),
+            "ingest": getattr(self.state, "news_writer", None),
+            "admission": getattr(self.state, "admission", None),
+        }
+        for prefix, source in sources.items():
+            if source is None:
+                continue
+            for name, value in source.stats().model_dump().items():
+                if not isinstance(value, (int, float)):
+                    continue
+                cumulative = name in CUMULATIVE_STATS
+                family = CounterMetricFamily if cumulative else GaugeMetricFamily
+                yield family(f"{prefix}_{name}", f"{prefix} {name}", value=value)
+
+
+def register_state_collector(state) -> StateCollector:
+    collector = StateCollector(state)
+    REGISTRY.register(collector)
+    return collector
+
+
+def unregister_state_collector(collector: StateCollector):
+    REGISTRY.unregister(collector)
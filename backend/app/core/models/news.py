@@ -31,3 +31,14 @@ class News(BaseModel):
     extracted_keywords: list[str]
     sentiment: str
     sentiment_impactful_texts: list[str]
+
+
+class NewsListItem(BaseModel):
+    id: str
+    url: str
+    title: str
+    top_image: Optional[str]
+    meta_img: Optional[str]
+    meta_site_name: Optional[str]
+    publish_date: Optional[datetime]
+    sentiment: str
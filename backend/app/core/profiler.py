@@ -0,0 +1,200 @@
+import heapq
+import itertools
+import json
+import re
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+REQUEST_ID_HEADER = "X-Request-ID"
+DEBUG_PROFILE_HEADER = "X-Debug-Profile"
+# Request ids end up in query ids and response headers, accept only plain ones
+REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+class QueryProfile(BaseModel):
+    query_id: str
+    request_id: str
+    name: str
+    query: str
+    parameters: dict[str, Any]
+    started_at: datetime
+    elapsed_ms: float
+    server_elapsed_ms: Optional[float]
+    read_rows: int
+    read_bytes: int
+    memory_usage: Optional[int]
+
+
+@dataclass
+class RequestProfile:
+    """Queries of one HTTP request, kept only when it asked for its profile"""
+
+    request_id: str
+    debug: bool = False
+    queries: list[QueryProfile] = field(default_factory=list)
+    _sequence: itertools.count = field(default_factory=lambda: itertools.count(1))
+    # Clients may send one request id twice, ClickHouse refuses a query id
+    # already running and a disconnect would kill the other request's query
+    _unique: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+
+    def next_query_id(self) -> str:
+        return f"{self.request_id}-{self._unique}-{next(self._sequence)}"
+
+
+current_request: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_request", default=None
+)
+
+
+def _summary_int(summary: dict[str, Any], key: str) -> Optional[int]:
+    value = summary.get(key)
+    return int(value) if value not in (None, "") else None
+
+
+class QueryProfiler:
+    """
+    Keeps the `top_n` slowest queries in memory and logs every query slower
+    than `threshold_ms` as one JSON line to the SlowQueryLog logger. Query ids
+    start with the id of the HTTP request that sent them, so a slow query
+    can be found in system.query_log and traced back to its request.
+    """
+
+    def __init__(self, threshold_ms: float, top_n: int):
+        self.threshold_ms = threshold_ms
+        self.top_n = top_n
+        self.logger = get_logger("SlowQueryLog")
+        # Min-heap on elapsed time, the fastest of the kept queries is replaced
+        self._slowest: list[tuple[float, int, QueryProfile]] = []
+        self._sequence = itertools.count()
+
+    def query_id(self) -> str:
+        request = current_request.get()
+        if request is None:
+            return f"background-{uuid.uuid4().hex}"
+        return request.next_query_id()
+
+    def record(
+        self,
+        query_id: str,
+        name: str,
+        query: str,
+        parameters: Optional[dict[str, Any]],
+        started_at: datetime,
+        elapsed: float,
+        summary: dict[str, Any],
+    ) -> Optional[QueryProfile]:
+        request = current_request.get()
+        elapsed_ms = elapsed * 1000
+        debug = request is not None and request.debug
+        slow = elapsed_ms >= self.threshold_ms
+        # A top_n of 0 keeps no slowest queries
+        top = self.top_n > 0 and (
+            len(self._slowest) < self.top_n or elapsed_ms > self._slowest[0][0]
+        )
+        # Most queries are fast and unprofiled, don't build a profile for them
+        if not (debug or slow or top):
+            return None
+        server_elapsed_ns = _summary_int(summary, "elapsed_ns")
+        profile = QueryProfile(
+            query_id=query_id,
+            request_id=request.request_id if request else "background",
+            name=name,
+            query=" ".join(query.split()),
+            parameters={k: str(v) for k, v in (parameters or {}).items()},
+            started_at=started_at,
+            elapsed_ms=elapsed_ms,
+            server_elapsed_ms=server_elapsed_ns / 1e6 if server_elapsed_ns else None,
+            read_rows=_summary_int(summary, "read_rows") or 0,
+            read_bytes=_summary_int(summary, "read_bytes") or 0,
+            memory_usage=_summary_int(summary, "memory_usage"),
+        )
+        if debug:
+            request.queries.append(profile)
+        if top:
+            entry = (elapsed_ms, next(self._sequence), profile)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heapreplace(self._slowest, entry)
+        if slow:
+            self.logger.warning(profile.model_dump_json())
+        return profile
+
+    def slowest(self) -> list[QueryProfile]:
+        return [profile for *_, profile in sorted(self._slowest, reverse=True)]
+
+    def clear(self):
+        self._slowest.clear()
+
+
+def server_timing(queries: list[QueryProfile]) -> str:
+    """Server-Timing header value with one metric per query"""
+    metrics = []
+    for i, query in enumerate(queries, 1):
+        description = json.dumps(
+            f"{query.query_id} rows={query.read_rows} bytes={query.read_bytes}"
+        )
+        metrics.append(
+            f"{query.name}_{i};dur={query.elapsed_ms:.1f};desc={description}"
+        )
+    return ", ".join(metrics)
+
+
+class ProfilerMiddleware:
+    """
+    Gives every request an id, from its X-Request-ID header when set, that
+    its ClickHouse query ids derive from. Requests with an X-Debug-Profile
+    header get the timings of their queries in a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode()
+        if not REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        request = RequestProfile(
+            request_id=request_id,
+            debug=DEBUG_PROFILE_HEADER.lower().encode() in headers,
+        )
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                response_headers = list(message.get("headers", []))
+                response_headers.append(
+                    (REQUEST_ID_HEADER.encode(), request.request_id.encode())
+                )
+                if request.debug and request.queries:
+                    response_headers.append(
+                        (b"server-timing", server_timing(request.queries).encode())
+                    )
+                message = {**message, "headers": response_headers}
+            await send(message)
+
+        token = current_request.set(request)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            current_request.reset(token)
+
+
+profiler = QueryProfiler(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    top_n=settings.SLOW_QUERY_TOP_N,
+)
+
+
+def get_profiler() -> QueryProfiler:
+    return profiler
@@ -1,5 +1,9 @@
+from typing import Optional
 from pydantic import BaseModel
 
 
 class CountResponse(BaseModel):
     count: int
+    exact: bool = True
+    # Half width of the 95% confidence interval of an estimated count
+    error: Optional[int] = None
@@ -0,0 +1,148 @@
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, get_args, get_origin
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from app.core.models.news import News
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPES = (
+    "application/vnd.apache.arrow.stream",
+    "application/vnd.apache.arrow.file",
+)
+# Errors reported back, a bad batch can have thousands
+MAX_ERRORS = 20
+# Field values of a News in the order of its columns
+row_values = attrgetter(*News.model_fields)
+
+
+class BulkResponse(BaseModel):
+    accepted: int
+    # Whether the news are inserted already, only waited for with wait=true
+    flushed: bool = False
+
+
+class _Errors:
+    """Validation errors of a batch, rows are numbered from 1"""
+
+    def __init__(self):
+        self.errors: list[dict] = []
+        self.count = 0
+
+    def add(self, loc: tuple, type: str, msg: str):
+        self.count += 1
+        if self.count <= MAX_ERRORS:
+            self.errors.append({"type": type, "loc": loc, "msg": msg, "input": None})
+
+    def add_row(self, row: int, error: ValidationError):
+        for detail in error.errors(include_url=False, include_context=False):
+            self.add(("body", row, *detail["loc"]), detail["type"], detail["msg"])
+
+    def raise_any(self):
+        if not self.count:
+            return
+        if self.count > MAX_ERRORS:
+            self.errors.append(
+                {
+                    "type": "too_many_errors",
+                    "loc": ("body",),
+                    "msg": f"{self.count} errors, the first {MAX_ERRORS} are reported",
+                    "input": None,
+                }
+            )
+        raise RequestValidationError(self.errors)
+
+
+def parse_ndjson(body: bytes) -> tuple[list[tuple], list[int]]:
+    """
+    Rows and their size in bytes of a News per line, blank lines are
+    skipped. Every row is validated, the errors are raised together.
+    """
+    rows, sizes = [], []
+    errors = _Errors()
+    for number, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            news = News.model_validate_json(line)
+        except ValidationError as e:
+            errors.add_row(number, e)
+            continue
+        rows.append(row_values(news))
+        sizes.append(len(line))
+    errors.raise_any()
+    return rows, sizes
+
+
+def _arrow_type(pa, annotation) -> tuple[Any, bool]:
+    """Arrow type of a News field annotation and whether it can be null"""
+    nullable = type(None) in get_args(annotation)
+    if nullable:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    if get_origin(annotation) is list:
+        return pa.list_(pa.string()), nullable
+    if annotation is datetime:
+        return pa.timestamp("us"), nullable
+    return pa.string(), nullable
+
+
+def _null_rows(pa, pc, column, nullable: bool) -> list[int]:
+    """Rows of a column holding a null, or a list holding one, not allowed"""
+    rows = set()
+    if not nullable and column.null_count:
+        rows.update(pc.indices_nonzero(pc.is_null(column)).to_pylist())
+    if pa.types.is_list(column.type):
+        items = pc.list_flatten(column)
+        if items.null_count:
+            parents = pc.list_parent_indices(column).filter(pc.is_null(items))
+            rows.update(parents.to_pylist())
+    return sorted(rows)
+
+
+def parse_arrow(body: bytes) -> tuple[list[tuple], list[int]]:
+    """
+    Rows and their approximate size in bytes of an Arrow IPC stream or file
+    with News columns. Rows are checked by column rather than one model at a
+    time, which is several times faster: every column is cast to the type of
+    its field and must not hold nulls the field doesn't allow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise HTTPException(
+            status_code=415,
+            detail="Arrow batches need pyarrow, install the arrow extra or send NDJSON",
+        )
+    try:
+        if body[:6] == b"ARROW1":
+            table = pa.ipc.open_file(pa.py_buffer(body)).read_all()
+        else:
+            table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow batch: {e}")
+    errors = _Errors()
+    columns = []
+    for name, field in News.model_fields.items():
+        arrow_type, nullable = _arrow_type(pa, field.annotation)
+        if name not in table.column_names:
+            if field.is_required():
+                errors.add(("body", name), "missing", "Field required")
+            else:
+                default = field.get_default(call_default_factory=True)
+                columns.append([default] * table.num_rows)
+            continue
+        try:
+            column = table.column(name).cast(arrow_type).combine_chunks()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            errors.add(("body", name), "type_error", str(e))
+            continue
+        for row in _null_rows(pa, pc, column, nullable):
+            errors.add(("body", row + 1, name), "null", "Input should not be null")
+        columns.append(column.to_pylist())
+    errors.raise_any()
+    size = table.nbytes // table.num_rows if table.num_rows else 0
+    return list(zip(*columns)), [size] * table.num_rows
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.core.models.news import News, NewsListItem
+from app.core.schemas import CountResponse
+from app.core.schemas.filters.news import NewsFilters
+from app.core.schemas.news import (
+    FacetValue,
+    SentimentByCountry,
+    SentimentByDay,
+    SentimentCount,
+)
+
+DashboardPanel = Literal[
+    "news",
+    "count",
+    "facets",
+    "sentiment",
+    "sentiment_by_date",
+    "sentiment_by_country",
+]
+
+
+class DashboardRequest(BaseModel):
+    filters: NewsFilters = NewsFilters()
+    panels: List[DashboardPanel] = Field(..., min_length=1)
+    limit: int = Field(10, ge=0, le=1000)
+    view: Literal["full", "list"] = "list"
+    facet_fields: List[str] = []
+    top_n: int = Field(20, ge=1, le=1000)
+    from_: Optional[datetime] = Field(None, alias="from")
+    to: Optional[datetime] = None
+    # Count every story once, near-duplicate copies are collapsed
+    collapse: bool = False
+
+    @field_validator("facet_fields")
+    @classmethod
+    def validate_facet_fields(cls, fields: List[str]) -> List[str]:
+        invalid = [field for field in fields if field not in News.model_fields]
+        if invalid:
+            raise ValueError(f"Unknown fields: {', '.join(invalid)}")
+        return fields
+
+
+class DashboardResponse(BaseModel):
+    news: Optional[list[News] | list[NewsListItem]] = None
+    count: Optional[CountResponse] = None
+    facets: Optional[dict[str, list[FacetValue]]] = None
+    sentiment: Optional[list[SentimentCount]] = None
+    sentiment_by_date: Optional[list[SentimentByDay]] = None
+    sentiment_by_country: Optional[list[SentimentByCountry]] = None
@@ -1,8 +1,45 @@
 import re
-from typing import List, Optional, TypeVar
-from pydantic import BaseModel
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
+from pydantic import BaseModel, field_validator
+
+from app.core.schemas.filters.search import SearchQuery
 
 T = TypeVar("T", str, List[str])
+Parameters = Dict[str, Any]
+# Filter keys with whether they are negated, search fields, term and phrase
+# count and whether the last word is a prefix
+Shape = Tuple[Tuple[Tuple[str, bool], ...], Tuple[str, ...], int, int, bool]
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@lru_cache(maxsize=1024)
+def search_template(
+    search_fields: Tuple[str, ...], terms: int, phrases: int, prefix: bool
+) -> str:
+    conditions = [
+        f"({SearchQuery.condition(field, terms, phrases, prefix)})"
+        for field in search_fields
+    ]
+    return f"({' OR '.join(conditions)})"
+
+
+@lru_cache(maxsize=1024)
+def where_template(shape: Shape) -> str:
+    """
+    Where clause with a bind parameter for every value. It only depends on
+    the shape of the filters, so it is built once per shape and ClickHouse
+    sees the same query text for every value.
+    """
+    in_filters, search_fields, terms, _, prefix = shape
+    filters = []
+    if search_fields and (terms or prefix):
+        filters.append(search_template(*shape[1:]))
+    for key, negated in in_filters:
+        op = "NOT IN" if negated else "IN"
+        filters.append(f"{key} {op} {{{key}:Array(String)}}")
+    return " AND ".join(filters)
 
 
 class BaseFilters(BaseModel):
@@ -11,40 +48,95 @@ class BaseFilters(BaseModel):
     not_in_fields: List[str] = []
     search_fields: List[str] = []
 
+    @field_validator("not_in_fields", "search_fields")
+    @classmethod
+    def validate_field_names(cls, fields: List[str]) -> List[str]:
+        invalid = [field for field in fields if not IDENTIFIER.match(field)]
+        if invalid:
+            raise ValueError(f"Invalid field names: {', '.join(invalid)}")
+        return fields
+
     @staticmethod
     def sanitize(value: T) -> T:
-        """Sanitize input by trimming spaces and preventing SQL injection."""
+        """Trim spaces, values are sent as bind parameters so need no escaping"""
         if isinstance(value, list):
-            return [item.strip().replace("'", "''") for item in value]
-        return value.strip().replace("'", "''") if isinstance(value, str) else value
-
-    def build_where_clause(self):
-        filters = []
-        search_filter = self.build_search_filter()
-        if search_filter:
-            filters.append(search_filter)
-
-        for key, values in self.model_dump(
-            exclude_unset=True, exclude={"not_in_fields", "search_fields", "search"}
-        ).items():
-            if values:
-                op = "NOT IN" if key in self.not_in_fields else "IN"
-                values_str = ", ".join(f"'{value}'" for value in values)
-                filters.append(f"{key} {op} ({values_str})")
-
-        return " AND ".join(filters) if filters else ""
-
-    def build_search_filter(self):
+            return [item.strip() for item in value]
+        return value.strip() if isinstance(value, str) else value
+
+    def cache_key(self) -> tuple:
+        """Hashable form of the filters, equal for filters that select the same rows"""
+        return tuple(
+            (key, tuple(sorted(set(value))) if isinstance(value, list) else value)
+            for key, value in sorted(self.model_dump().items())
+        )
+
+    def in_filters(self) -> Dict[str, List[str]]:
+        return {
+            key: values
+            for key, values in self.model_dump(
+                exclude_unset=True,
+                exclude={"not_in_fields", "search_fields", "search"},
+            ).items()
+            if values
+        }
+
+    def search_query(self) -> Optional[SearchQuery]:
         if self.search and self.search_fields:
-            conditions = []
-            for field in self.search_fields:
-                field_conditions = [
-                    f"{field} ILIKE '%{re.escape(keyword)}%'"
-                    for keyword in self.search.split(" ")
-                ]
-                conditions.append(f"({' AND '.join(field_conditions)})")
-            return f"({' OR '.join(conditions)})"
-
-    def apply_filters(self, base_query: str):
-        where_clause = self.build_where_clause()
-        return f"{base_query} WHERE {where_clause}" if where_clause else base_query
+            search = SearchQuery.parse(self.search)
+            if search.terms or search.prefix:
+                return search
+        return None
+
+    def shape(self) -> Shape:
+        search = self.search_query()
+        return (
+            tuple((key, key in self.not_in_fields) for key in self.in_filters()),
+            tuple(self.search_fields) if search else (),
+            len(search.terms) if search else 0,
+            len(search.phrases) if search else 0,
+            bool(search and search.prefix),
+        )
+
+    def parameters(self) -> Parameters:
+        search = self.search_query()
+        return {**self.in_filters(), **(search.parameters() if search else {})}
+
+    def build_where_clause(self) -> Tuple[str, Parameters]:
+        return where_template(self.shape()), self.parameters()
+
+    def build_search_filter(self) -> Optional[str]:
+        search = self.search_query()
+        if search:
+            return search_template(
+                tuple(self.search_fields),
+                len(search.terms),
+                len(search.phrases),
+                bool(search.prefix),
+            )
+        return None
+
+    def build_relevance(self) -> Optional[str]:
+        """
+        Relevance score of a row for the search, matches in the first search
+        field weigh the most. Uses the search parameters of the where clause.
+        """
+        search = self.search_query()
+        if search:
+            weights = range(len(self.search_fields), 0, -1)
+            terms, prefix = len(search.terms), bool(search.prefix)
+            return " + ".join(
+                f"{weight} * ({SearchQuery.score(field, terms, prefix)})"
+                for weight, field in zip(weights, self.search_fields)
+            )
+        return None
+
+    def apply_filters(
+        self,
+        base_query: str,
+        conditions: Optional[List[str]] = None,
+        parameters: Optional[Parameters] = None,
+    ) -> Tuple[str, Parameters]:
+        where, where_parameters = self.build_where_clause()
+        where_clause = " AND ".join(filter(None, [where, *(conditions or [])]))
+        query = f"{base_query} WHERE {where_clause}" if where_clause else base_query
+        return query, {**where_parameters, **(parameters or {})}
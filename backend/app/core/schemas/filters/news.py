@@ -1,6 +1,8 @@
 from typing import List
 
 from fastapi import Query
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from app.core.schemas.filters import BaseFilters
 
 
@@ -61,17 +63,20 @@ class NewsFilters(BaseFilters):
             description="Fields passed as filter will be treated as negation",
         ),
     ) -> "NewsFilters":
-        return NewsFilters(
-            id=NewsFilters.sanitize(id),
-            url=NewsFilters.sanitize(url),
-            language=NewsFilters.sanitize(language),
-            title=NewsFilters.sanitize(title),
-            summary=NewsFilters.sanitize(summary),
-            country=NewsFilters.sanitize(country),
-            author=NewsFilters.sanitize(author),
-            meta_site_name=NewsFilters.sanitize(meta_site_name),
-            sentiment=NewsFilters.sanitize(sentiment),
-            search=NewsFilters.sanitize(search),
-            search_fields=NewsFilters.sanitize(search_fields),
-            not_in_fields=NewsFilters.sanitize(not_in_fields),
-        )
+        try:
+            return NewsFilters(
+                id=NewsFilters.sanitize(id),
+                url=NewsFilters.sanitize(url),
+                language=NewsFilters.sanitize(language),
+                title=NewsFilters.sanitize(title),
+                summary=NewsFilters.sanitize(summary),
+                country=NewsFilters.sanitize(country),
+                author=NewsFilters.sanitize(author),
+                meta_site_name=NewsFilters.sanitize(meta_site_name),
+                sentiment=NewsFilters.sanitize(sentiment),
+                search=NewsFilters.sanitize(search),
+                search_fields=NewsFilters.sanitize(search_fields),
+                not_in_fields=NewsFilters.sanitize(not_in_fields),
+            )
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
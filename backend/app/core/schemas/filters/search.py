@@ -0,0 +1,82 @@
+import re
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+# hasToken splits on every non alphanumeric ASCII character
+TOKEN_SEPARATORS = re.compile(r"[\x00-\x2f\x3a-\x40\x5b-\x60\x7b-\x7f]+")
+PHRASE = re.compile(r'"([^"]*)"')
+# Regular expression of the start of a token, the search prefix is appended
+TOKEN_START = r"(^|[\x00-\x2f\x3a-\x40\x5b-\x60\x7b-\x7f])"
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_SEPARATORS.split(text.lower()) if token]
+
+
+class SearchQuery(BaseModel):
+    """
+    Search text translated into predicates the token bloom filter indexes on
+    lowerUTF8(field) can answer. Every word must appear as a whole token,
+    "quoted phrases" must also appear verbatim. The last word, unless the
+    text ends with a separator like a closing quote, is still being typed:
+    it only has to start a token. The n-gram bloom filter indexes answer a
+    LIKE on the word anywhere in the field, the match on the start of a token
+    is only run on what it keeps.
+    """
+
+    terms: List[str] = []
+    phrases: List[str] = []
+    prefix: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str) -> "SearchQuery":
+        phrases = [
+            " ".join(tokenize(phrase))
+            for phrase in PHRASE.findall(text)
+            if len(tokenize(phrase)) > 1
+        ]
+        terms = list(dict.fromkeys(tokenize(text)))
+        prefix = None
+        if terms and not TOKEN_SEPARATORS.match(text[-1]):
+            prefix = tokenize(text)[-1]
+            terms.remove(prefix)
+        return cls(terms=terms, phrases=phrases, prefix=prefix)
+
+    def parameters(self) -> Dict[str, Any]:
+        parameters = {
+            **{f"search_term_{i}": term for i, term in enumerate(self.terms)},
+            **{f"search_phrase_{i}": phrase for i, phrase in enumerate(self.phrases)},
+        }
+        if self.prefix:
+            # Tokens hold no LIKE wildcard or escape, all three are separators
+            parameters["search_prefix_like"] = f"%{self.prefix}%"
+            parameters["search_prefix"] = TOKEN_START + self.prefix
+        return parameters
+
+    @staticmethod
+    def condition(field: str, terms: int, phrases: int, prefix: bool = False) -> str:
+        conditions = [
+            f"hasToken(lowerUTF8({field}), {{search_term_{i}:String}})"
+            for i in range(terms)
+        ]
+        conditions += [
+            f"position(lowerUTF8({field}), {{search_phrase_{i}:String}}) > 0"
+            for i in range(phrases)
+        ]
+        if prefix:
+            conditions += [
+                f"lowerUTF8({field}) LIKE {{search_prefix_like:String}}",
+                f"match(lowerUTF8({field}), {{search_prefix:String}})",
+            ]
+        return " AND ".join(conditions)
+
+    @staticmethod
+    def score(field: str, terms: int, prefix: bool = False) -> str:
+        """Number of the search terms found in field"""
+        scores = [
+            f"hasToken(lowerUTF8({field}), {{search_term_{i}:String}})"
+            for i in range(terms)
+        ]
+        if prefix:
+            scores.append(f"match(lowerUTF8({field}), {{search_prefix:String}})")
+        return " + ".join(scores)
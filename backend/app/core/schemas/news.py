@@ -1,5 +1,9 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Literal, Optional
+
 from pydantic import BaseModel
-from datetime import date
 
 
 class SentimentCount(BaseModel):
@@ -17,6 +21,19 @@ class SentimentByDay(BaseModel):
     all: int
 
 
+SeriesInterval = Literal["hour", "day", "week", "month"]
+
+
+class SentimentBucket(BaseModel):
+    bucket: datetime
+    positive: int
+    negative: int
+    neutral: int
+    very_negative: int
+    very_positive: int
+    all: int
+
+
 class SentimentByCountry(BaseModel):
     country: str
     positive: int
@@ -25,3 +42,64 @@ class SentimentByCountry(BaseModel):
     very_negative: int
     very_positive: int
     all: int
+
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+
+class NewsCursor(BaseModel):
+    """Position of the last row of a page in the (publish_date, id) sort order"""
+
+    publish_date: Optional[datetime]
+    id: str
+
+    def encode(self) -> str:
+        payload = json.dumps(
+            [
+                self.publish_date.strftime("%Y-%m-%d %H:%M:%S")
+                if self.publish_date
+                else None,
+                self.id,
+            ]
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "NewsCursor":
+        """Raises ValueError when the token is not a cursor issued by `encode`"""
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            publish_date, id = json.loads(base64.urlsafe_b64decode(padded))
+            return cls(publish_date=publish_date, id=id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {token}") from e
+
+    def seek_condition(self) -> str:
+        """
+        Condition selecting the rows after this cursor when ordering by
+        `publish_date DESC, id DESC` (NULL dates sort last), bound to
+        `parameters()`
+        """
+        if self.publish_date is None:
+            return "(publish_date IS NULL AND id < {cursor_id:String})"
+        return (
+            "((publish_date, id) < ({cursor_publish_date:DateTime}, {cursor_id:String})"
+            " OR publish_date IS NULL)"
+        )
+
+    def parameters(self) -> dict[str, Any]:
+        parameters: dict[str, Any] = {"cursor_id": self.id}
+        if self.publish_date is not None:
+            parameters["cursor_publish_date"] = self.publish_date.strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+        return parameters
+
+
+class NewsPage(BaseModel):
+    """A page of GET /news with the cursor of the next one, None on the last"""
+
+    items: list[dict[str, Any]]
+    next_cursor: Optional[str]
@@ -0,0 +1,39 @@
+import fcntl
+import os
+from typing import IO, Optional
+
+
+class WorkerLock:
+    """
+    Lock file held by at most one worker process at a time, electing the
+    worker that runs a background job meant to run once per host. The lock
+    is released by the OS when its holder exits, even when it crashes, so
+    another worker can take over on its next try.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[IO] = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """Take the lock unless another worker holds it, without waiting"""
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            file = open(self.path, "a")
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                return False
+            self._file = file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
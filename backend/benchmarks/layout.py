@@ -0,0 +1,179 @@
+"""
+Compare the read cost of the endpoints' queries on the news table before and
+after 003_redesign_news_table.sql. Every query is run against news_legacy and
+news, and rows read, bytes read and elapsed time are taken from
+system.query_log. news_legacy is a plain MergeTree without the columns added
+since, its queries are read without FINAL and compute cluster_id from id.
+
+    uv run python -m benchmarks.layout --runs 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import re
+import statistics
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Coroutine
+from unittest.mock import MagicMock
+
+from clickhouse_connect import get_client
+
+from app.core.config import settings
+from app.core.database.repositories.news import NewsRepository
+from app.core.schemas.filters.news import NewsFilters
+from app.core.schemas.news import NewsCursor
+
+TABLES = ("news_legacy", "news")
+LEGACY_FINAL = re.compile(r"(?i)(\bfrom\s+news(?:\s+n)?)\s+FINAL\b")
+# Own cluster of every news, as the cluster_id default of news
+LEGACY_CLUSTER_ID = "reinterpretAsUInt64(substring(MD5(id), 1, 8))"
+# Granules left to read by a ReadFromMergeTree step of EXPLAIN indexes = 1
+GRANULES_READ = re.compile(r"Parts: \d+ \| Granules: (\d+)")
+
+
+class RecordingClient:
+    """Stands in for AsyncClient and keeps the SQL the repository sends"""
+
+    def __init__(self):
+        self.queries: list[tuple[str, dict, dict]] = []
+
+    async def query(self, query: str, parameters=None, settings=None, **kwargs):
+        self.queries.append((query, parameters or {}, settings or {}))
+        result = MagicMock()
+        result.named_results.return_value = []
+        result.result_rows = [()]
+        return result
+
+
+def explain_indexes(client, query: str, parameters: dict, query_settings=None) -> str:
+    """Plan of query with the granules every index keeps"""
+    plan = client.query(
+        f"EXPLAIN indexes = 1 {query}", parameters=parameters, settings=query_settings
+    )
+    return "\n".join(line for line, in plan.result_rows)
+
+
+def granules_read(plan: str) -> int:
+    """Granules a plan reads once the primary key and skip indexes are applied"""
+    return sum(int(granules) for granules in GRANULES_READ.findall(plan))
+
+
+def scenarios(sample: dict[str, Any]) -> dict[str, Callable[[NewsRepository], Coroutine]]:
+    country = NewsFilters(country=[sample["country"]])
+    country_language = NewsFilters(
+        country=[sample["country"]], language=[sample["language"]]
+    )
+    site = NewsFilters(meta_site_name=[sample["meta_site_name"]])
+    search = NewsFilters(search=sample["word"], search_fields=["title", "summary"])
+    cursor = NewsCursor(publish_date=sample["publish_date"], id=sample["id"])
+    return {
+        "list first page": lambda repo: repo.fetch(10, 0, country),
+        "list deep offset": lambda repo: repo.fetch(10, 10_000, country),
+        "list cursor": lambda repo: repo.fetch(10, 0, country, cursor),
+        "list view": lambda repo: repo.fetch(
+            10, 0, country, fields=["title", "top_image", "sentiment"]
+        ),
+        "detail by id": lambda repo: repo.get(sample["id"]),
+        "count by country and language": lambda repo: repo.fetch_count(
+            country_language
+        ),
+        "distinct site by country": lambda repo: repo.distinct(
+            "meta_site_name", country
+        ),
+        "sentiment by date for a site": lambda repo: repo.sentiments_count_by_date(
+            sample["publish_date"] - timedelta(days=30), sample["publish_date"], site
+        ),
+        "sentiment by country for a search": lambda repo: repo.sentiments_count_by_country(
+            search
+        ),
+    }
+
+
+def sample_values(client) -> dict[str, Any]:
+    """Pick common filter values so every scenario selects real rows"""
+    row = client.query(
+        """
+        SELECT
+            topK(1)(country)[1] AS country,
+            topK(1)(language)[1] AS language,
+            ifNull(topK(1)(meta_site_name)[1], '') AS meta_site_name,
+            any(id) AS id,
+            quantileExact(0.5)(ifNull(publish_date, toDateTime(0))) AS publish_date,
+            topK(1)(arrayJoin(splitByNonAlpha(lower(title))))[1] AS word
+        FROM
+            news
+        """
+    ).named_results()
+    values = next(iter(row))
+    values["publish_date"] = values["publish_date"] or datetime.now()
+    return values
+
+
+def on_table(query: str, table: str) -> str:
+    if table == "news_legacy":
+        query = LEGACY_FINAL.sub(r"\g<1>", query)
+        query = re.sub(r"\bcluster_id\b", LEGACY_CLUSTER_ID, query)
+    return re.sub(r"(?i)\bfrom(\s+)news\b", rf"from\g<1>{table}", query)
+
+
+def run(runs: int):
+    client = get_client(dsn=settings.CLICKHOUSE_DSN)
+    for table in TABLES:
+        if not client.command(f"EXISTS TABLE {table}"):
+            raise SystemExit(f"Table {table} is missing, run the migrations first")
+
+    repository_client = RecordingClient()
+    repository = NewsRepository(client=repository_client, cache=None)
+    query_ids: dict[tuple[str, str], list[str]] = {}
+    for name, scenario in scenarios(sample_values(client)).items():
+        repository_client.queries.clear()
+        # Only the SQL is needed, parsing the empty result may fail
+        with contextlib.suppress(Exception):
+            asyncio.run(scenario(repository))
+        for table in TABLES:
+            for _ in range(runs):
+                query_id = str(uuid.uuid4())
+                query_ids.setdefault((name, table), []).append(query_id)
+                for query, parameters, query_settings in repository_client.queries:
+                    client.query(
+                        on_table(query, table),
+                        parameters=parameters,
+                        settings={
+                            **query_settings,
+                            "query_id": query_id,
+                            "use_query_cache": 0,
+                        },
+                    )
+
+    client.command("SYSTEM FLUSH LOGS")
+    print(f"{'query':<36}{'table':<13}{'rows read':>14}{'bytes read':>16}{'ms':>10}")
+    for (name, table), ids in query_ids.items():
+        stats = client.query(
+            """
+            SELECT
+                read_rows,
+                read_bytes,
+                query_duration_ms
+            FROM
+                system.query_log
+            WHERE
+                query_id IN {ids:Array(String)}
+                AND type = 'QueryFinish'
+            """,
+            parameters={"ids": ids},
+        ).result_rows
+        if not stats:
+            continue
+        rows, bytes_, elapsed = zip(*stats)
+        print(
+            f"{name:<36}{table:<13}{int(statistics.median(rows)):>14,}"
+            f"{int(statistics.median(bytes_)):>16,}{statistics.median(elapsed):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="news table layout benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per query")
+    run(parser.parse_args().runs)
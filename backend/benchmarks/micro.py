@@ -0,0 +1,261 @@
+"""
+Micro-benchmarks of the backend hot paths: building where clauses from large
+IN lists, parsing query filters, validating result pages into News models and
+endpoint round-trips through the whole ASGI app. ClickHouse is replaced by
+in-memory results so the numbers only depend on the application code.
+
+Every benchmark is calibrated to run at least --min-time seconds per repeat,
+the median over --repeat repeats is kept, with the garbage collector off while
+timing. Results are compared with the stored baseline, --save replaces it and
+--check exits with an error when a benchmark got slower than --tolerance.
+
+    uv run python -m benchmarks.micro
+    uv run python -m benchmarks.micro --save
+    uv run python -m benchmarks.micro --check --filter filters
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from httpx import ASGITransport, AsyncClient
+
+from app import app
+from app.core.database.repositories.news import NEWS_ADAPTER
+from app.core.models.news import News
+from app.core.schemas.filters.news import NewsFilters
+from benchmarks.serialization import FixtureClient, fixture_rows
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+# NewsFilters.parse defaults are Query objects, pass every parameter
+PARSE_DEFAULTS: dict[str, Any] = {
+    "id": [],
+    "url": [],
+    "language": [],
+    "title": [],
+    "summary": [],
+    "country": [],
+    "sentiment": [],
+    "author": [],
+    "meta_site_name": [],
+    "search": None,
+    "search_fields": [],
+    "not_in_fields": [],
+}
+
+
+def ids(count: int) -> list[str]:
+    return [f"{i:032x}" for i in range(count)]
+
+
+def in_filters(count: int) -> NewsFilters:
+    return NewsFilters(
+        id=ids(count),
+        country=["US", "GB", "FR", "DE"],
+        language=["en", "fr", "de"],
+        sentiment=["positive"],
+        not_in_fields=["sentiment"],
+    )
+
+
+def search_filters(count: int) -> NewsFilters:
+    return NewsFilters(
+        id=ids(count),
+        search='election "prime minister" -sport',
+        search_fields=["title", "summary", "text"],
+    )
+
+
+def parse(count: int) -> Callable[[], NewsFilters]:
+    parameters = {
+        **PARSE_DEFAULTS,
+        "id": [f" {id} " for id in ids(count)],
+        "country": ["US", "GB"],
+        "search": "election",
+        "search_fields": ["title"],
+    }
+    return lambda: NewsFilters.parse(**parameters)
+
+
+def validate(count: int) -> Callable[[], list[News]]:
+    client = FixtureClient(fixture_rows(count))
+    rows = list(client.result.named_results())
+    return lambda: NEWS_ADAPTER.validate_python(rows)
+
+
+class Endpoints:
+    """
+    Sends requests to the app on one event loop that lives as long as the
+    benchmarks. TestClient starts a thread and a loop per request outside of
+    a `with` block, which would be most of what is measured, and inside one
+    it runs the lifespan that connects to ClickHouse.
+    The fixture client replaces the pool in app.state rather than through
+    dependency_overrides: with any override set FastAPI rebuilds every
+    dependant on each request, which production never does.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://bench"
+        )
+
+    def round_trip(self, path: str, rows: int) -> Callable[[], Any]:
+        client = FixtureClient(fixture_rows(rows))
+
+        async def request():
+            app.state.clickhouse = client
+            response = await self.client.get(path)
+            response.raise_for_status()
+            return response
+
+        return lambda: self.loop.run_until_complete(request())
+
+    def close(self):
+        self.loop.run_until_complete(self.client.aclose())
+        self.loop.close()
+
+
+def benchmarks(endpoints: Endpoints) -> dict[str, Callable[[], Any]]:
+    """Benchmarks by name, their setup runs here and is not timed"""
+    large, huge = in_filters(1_000), in_filters(10_000)
+    search = search_filters(1_000)
+    return {
+        "filters.build_where_clause in 1k": large.build_where_clause,
+        "filters.build_where_clause in 10k": huge.build_where_clause,
+        "filters.build_where_clause search in 1k": search.build_where_clause,
+        "filters.apply_filters in 10k": lambda: huge.apply_filters(
+            "Select * from news", ["publish_date < now()"], {"limit": 10}
+        ),
+        "filters.parse in 10": parse(10),
+        "filters.parse in 1k": parse(1_000),
+        "validate news 10 rows": validate(10),
+        "validate news 1000 rows": validate(1_000),
+        "endpoint GET /news 10 rows": endpoints.round_trip("/news?limit=10", 10),
+        "endpoint GET /news 1000 rows": endpoints.round_trip(
+            "/news?limit=1000", 1_000
+        ),
+        "endpoint GET /news/{id}": endpoints.round_trip(f"/news/{0:032x}", 1),
+    }
+
+
+def measure(function: Callable[[], Any], repeat: int, min_time: float) -> dict:
+    """Seconds per call of `function`, like timeit with autorange"""
+    function()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "number": number,
+    }
+
+
+def load_baseline() -> dict[str, Any]:
+    if not BASELINE.exists():
+        return {"results": {}}
+    return json.loads(BASELINE.read_text())
+
+
+def save_baseline(results: dict[str, dict]):
+    baseline = {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "results": results,
+    }
+    BASELINE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(args: argparse.Namespace) -> int:
+    # Fixture text is random, keep it the same from run to run
+    random.seed(0)
+    endpoints = Endpoints()
+    selected = {
+        name: function
+        for name, function in benchmarks(endpoints).items()
+        if args.filter in name
+    }
+    previous = getattr(app.state, "clickhouse", None)
+    baseline = load_baseline()["results"]
+    results, regressions = {}, []
+    print(f"{'benchmark':<42}{'median':>12}{'±':>10}{'baseline':>12}{'change':>10}")
+    try:
+        for name, function in selected.items():
+            result = measure(function, args.repeat, args.min_time)
+            results[name] = result
+            line = f"{name:<42}{format_time(result['median']):>12}"
+            line += f"{format_time(result['stdev']):>10}"
+            if name in baseline:
+                reference = baseline[name]["median"]
+                change = result["median"] / reference - 1
+                line += f"{format_time(reference):>12}{change:>+10.1%}"
+                if change > args.tolerance:
+                    regressions.append(name)
+                    line += "  slower"
+            print(line)
+    finally:
+        endpoints.close()
+        app.state.clickhouse = previous
+
+    if args.save:
+        # Keep the baseline of benchmarks that were filtered out
+        save_baseline({**baseline, **results})
+        print(f"Baseline saved to {BASELINE}")
+    if regressions:
+        print(f"{len(regressions)} benchmarks slower than the baseline by more "
+              f"than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1 if args.check else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend hot path micro-benchmarks")
+    parser.add_argument("--filter", default="", help="Only run benchmarks matching")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed repeats")
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Seconds per repeat at least"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed slowdown, 0.2 is 20%%"
+    )
+    parser.add_argument("--save", action="store_true", help="Store as the baseline")
+    parser.add_argument(
+        "--check", action="store_true", help="Fail when slower than the baseline"
+    )
+    sys.exit(main(parser.parse_args()))
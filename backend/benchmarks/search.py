@@ -0,0 +1,95 @@
+"""
+Check the n-gram bloom filter indexes of 010_add_prefix_indexes.sql skip
+granules for a search whose last word is still being typed. The count of
+a prefix search on every search field is explained with EXPLAIN
+indexes = 1, as NewsRepository sends it and with only the match on the
+start of a token. Printed are the granules read without the LIKE, the
+granules the n-gram index of the field keeps, and the granules read with
+it, which FINAL widens back to every part that overlaps the kept ranges
+(use_skip_indexes_if_final_exact_mode). Prefixes are cut from --word, by
+default a word of the title of a random news.
+
+    uv run python -m benchmarks.search --fields title summary
+"""
+
+import argparse
+import asyncio
+import contextlib
+import re
+
+from clickhouse_connect import get_client
+
+from app.core.config import settings
+from app.core.database.repositories.news import NewsRepository
+from app.core.schemas.filters.news import NewsFilters
+from benchmarks.layout import RecordingClient, explain_indexes, granules_read
+
+FIELDS = ("title", "summary", "text")
+PREFIX_LIKE = re.compile(r"lowerUTF8\(\w+\) LIKE \{search_prefix_like:String\} AND ")
+# Granules an index of EXPLAIN indexes = 1 keeps, formatted with its name
+INDEX_GRANULES = r"Name: {}\n(?:.*\n)*?\s*Granules: (\d+)/"
+
+
+def count_query(prefix: str, field: str) -> tuple[str, dict, dict]:
+    """SQL of the exact count of the news with a token starting with prefix"""
+    client = RecordingClient()
+    filters = NewsFilters(search=prefix, search_fields=[field])
+    # Only the SQL is needed, parsing the empty result may fail
+    with contextlib.suppress(Exception):
+        asyncio.run(NewsRepository(client=client, cache=None).fetch_count(filters))
+    return client.queries[0]
+
+
+def title_word(client) -> str:
+    return client.query(
+        """
+        SELECT
+            word
+        FROM
+            news
+            ARRAY JOIN splitByNonAlpha(lowerUTF8(title)) AS word
+        WHERE
+            length(word) >= 6
+        ORDER BY
+            rand()
+        LIMIT
+            1
+        """
+    ).result_rows[0][0]
+
+
+def run(fields: list[str], word: str | None):
+    client = get_client(dsn=settings.CLICKHOUSE_DSN)
+    if not client.command("EXISTS TABLE news"):
+        raise SystemExit("Table news is missing, run the migrations first")
+    word = (word or title_word(client)).lower()
+    total = granules_read(explain_indexes(client, "SELECT id FROM news", {}))
+    print(
+        f"{'field':<10}{'prefix':<16}{'match only':>12}{'n-grams':>10}"
+        f"{'with LIKE':>12}{'table':>10}"
+    )
+    for field in fields:
+        for length in range(3, len(word) + 1):
+            query, parameters, query_settings = count_query(word[:length], field)
+            match_only = granules_read(
+                explain_indexes(
+                    client, PREFIX_LIKE.sub("", query), parameters, query_settings
+                )
+            )
+            plan = explain_indexes(client, query, parameters, query_settings)
+            kept = re.search(INDEX_GRANULES.format(f"{field}_ngrams"), plan)
+            print(
+                f"{field:<10}{word[:length]:<16}{match_only:>12,}"
+                f"{kept.group(1) if kept else '-':>10}"
+                f"{granules_read(plan):>12,}{total:>10,}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="prefix search index benchmark")
+    parser.add_argument(
+        "--fields", nargs="+", choices=FIELDS, default=list(FIELDS), help="Fields"
+    )
+    parser.add_argument("--word", help="Word the prefixes are cut from")
+    args = parser.parse_args()
+    run(args.fields, args.word)
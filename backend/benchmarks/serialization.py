@@ -0,0 +1,135 @@
+"""
+Measure the requests per second one worker serves on GET /news for full pages,
+before and after the fast path that serializes rows with orjson instead of
+validating them into News models. ClickHouse is replaced by an in-memory
+result so only the time spent in the application is measured.
+
+    uv run python -m benchmarks.serialization --limit 1000 --requests 50
+"""
+
+import argparse
+import asyncio
+import random
+import string
+import time
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from pydantic import TypeAdapter
+
+from app import app
+from app.core.database.repositories.news import NewsRepository
+from app.core.models.news import News
+
+
+class FixtureResult:
+    def __init__(self, rows: list[tuple], column_names: tuple[str, ...]):
+        self.result_rows = rows
+        self.column_names = column_names
+        self.summary = {}
+
+    def named_results(self):
+        for row in self.result_rows:
+            yield dict(zip(self.column_names, row))
+
+
+class FixtureClient:
+    """Stands in for the ClickHouse pool and answers every query with rows"""
+
+    def __init__(self, rows: list[tuple]):
+        self.result = FixtureResult(rows, tuple(News.model_fields))
+
+    async def query(self, *args, **kwargs) -> FixtureResult:
+        return self.result
+
+
+def text(length: int) -> str:
+    return "".join(random.choices(string.ascii_lowercase + " ", k=length))
+
+
+def fixture_rows(count: int) -> list[tuple]:
+    """Rows shaped like real news, with article sized text fields"""
+    published = datetime(2024, 5, 1)
+    rows = []
+    for i in range(count):
+        news = {
+            "id": f"{i:032x}",
+            "url": f"https://example.com/{i}",
+            "read_more_link": None,
+            "language": "en",
+            "title": text(80),
+            "top_image": f"https://example.com/{i}.jpg",
+            "meta_img": None,
+            "images": [f"https://example.com/{i}/{j}.jpg" for j in range(5)],
+            "movies": [],
+            "keywords": [text(8) for _ in range(10)],
+            "meta_keywords": [text(8) for _ in range(10)],
+            "tags": [text(8) for _ in range(3)],
+            "authors": [text(12)],
+            "publish_date": published - timedelta(minutes=i),
+            "summary": text(600),
+            "meta_description": text(160),
+            "meta_lang": "en",
+            "meta_favicon": None,
+            "meta_site_name": "Example",
+            "canonical_link": f"https://example.com/{i}",
+            "text": text(5000),
+            "country": "US",
+            "decoded_url": f"https://example.com/{i}",
+            "google_uri": text(40),
+            "extracted_keywords": [text(8) for _ in range(10)],
+            "sentiment": "neutral",
+            "sentiment_impactful_texts": [text(120) for _ in range(2)],
+        }
+        rows.append(tuple(news[name] for name in News.model_fields))
+    return rows
+
+
+def legacy_app(repository: NewsRepository) -> FastAPI:
+    """GET /news as it was: rows validated into models then serialized by FastAPI"""
+    legacy = FastAPI()
+
+    @legacy.get("/news")
+    async def get(limit: int = 10) -> list[News]:
+        news = await repository._query("Select * from news", name="fetch")
+        return TypeAdapter(list[News]).validate_python(list(news.named_results()))
+
+    return legacy
+
+
+async def requests_per_second(target: FastAPI, limit: int, requests: int) -> float:
+    async with AsyncClient(
+        transport=ASGITransport(app=target), base_url="http://bench"
+    ) as client:
+        await client.get(f"/news?limit={limit}")
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(f"/news?limit={limit}")
+            response.raise_for_status()
+        return requests / (time.perf_counter() - start)
+
+
+async def run(limit: int, requests: int):
+    repository = NewsRepository(client=FixtureClient(fixture_rows(limit)), cache=None)
+    app.dependency_overrides[NewsRepository] = lambda: repository
+    results = {
+        "validated models": await requests_per_second(
+            legacy_app(repository), limit, requests
+        ),
+        "orjson rows": await requests_per_second(app, limit, requests),
+    }
+    app.dependency_overrides.clear()
+
+    print(f"GET /news?limit={limit}, {requests} requests on one worker")
+    print(f"{'path':<20}{'req/s':>10}{'ms/req':>10}")
+    for name, rate in results.items():
+        print(f"{name:<20}{rate:>10.1f}{1000 / rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GET /news serialization benchmark")
+    parser.add_argument("--limit", type=int, default=1000, help="Rows per page")
+    parser.add_argument("--requests", type=int, default=50, help="Timed requests")
+    args = parser.parse_args()
+    asyncio.run(run(args.limit, args.requests))
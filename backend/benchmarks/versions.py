@@ -0,0 +1,98 @@
+"""
+Measure the revision lookup POST /news/bulk runs before every insert, on
+news_versions sorted by id and on news where only the id bloom filter serves
+it. A flush of --rows ids, --known of them already stored and the others
+new, is looked up in chunks of REVISION_LOOKUP_IDS like the writer does.
+Granules left after the indexes, from EXPLAIN indexes = 1, and rows read,
+bytes read and elapsed time from the query summaries ClickHouse returns are
+summed over the whole flush.
+
+    uv run python -m benchmarks.versions --rows 20000 --known 0.1
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from clickhouse_connect import get_client
+
+from app.core.config import settings
+from app.core.database.repositories.news import NewsRepository
+from app.core.database.writer import REVISION_LOOKUP_IDS
+from benchmarks.layout import RecordingClient, explain_indexes, granules_read
+
+TABLES = ("news", "news_versions")
+
+
+class LookupClient(RecordingClient):
+    """RecordingClient answering the lookup with no stored versions"""
+
+    async def query(self, query: str, parameters=None, settings=None, **kwargs):
+        result = await super().query(query, parameters, settings, **kwargs)
+        result.result_rows = []
+        return result
+
+
+def lookup_query(ids: list[str]) -> tuple[str, dict]:
+    """SQL NewsRepository.versions sends for ids"""
+    client = LookupClient()
+    asyncio.run(NewsRepository(client=client, cache=None).versions(ids))
+    query, parameters, _ = client.queries[0]
+    return query, parameters
+
+
+def flush_ids(client, rows: int, known: float) -> list[str]:
+    stored = client.query(
+        "SELECT id FROM news_versions ORDER BY rand() LIMIT {limit:UInt32}",
+        parameters={"limit": int(rows * known)},
+    ).result_rows
+    ids = [id for id, in stored]
+    return ids + [uuid.uuid4().hex for _ in range(rows - len(ids))]
+
+
+def run(rows: int, known: float, runs: int):
+    client = get_client(dsn=settings.CLICKHOUSE_DSN)
+    if not client.command("EXISTS TABLE news_versions"):
+        raise SystemExit("Table news_versions is missing, run the migrations first")
+    print(
+        f"{'table':<15}{'granules':>10}{'rows read':>14}{'bytes read':>16}{'ms':>10}"
+    )
+    for table in TABLES:
+        totals = []
+        for _ in range(runs):
+            ids = flush_ids(client, rows, known)
+            granules = read_rows = read_bytes = elapsed = 0
+            for start in range(0, len(ids), REVISION_LOOKUP_IDS):
+                query, parameters = lookup_query(
+                    ids[start : start + REVISION_LOOKUP_IDS]
+                )
+                query = query.replace("news_versions", table)
+                granules += granules_read(explain_indexes(client, query, parameters))
+                started = time.perf_counter()
+                result = client.query(
+                    query, parameters=parameters, settings={"use_query_cache": 0}
+                )
+                elapsed += time.perf_counter() - started
+                read_rows += int(result.summary.get("read_rows", 0))
+                read_bytes += int(result.summary.get("read_bytes", 0))
+            totals.append((granules, read_rows, read_bytes, elapsed))
+        granules, read_rows, read_bytes, elapsed = zip(*totals)
+        print(
+            f"{table:<15}{int(statistics.median(granules)):>10,}"
+            f"{int(statistics.median(read_rows)):>14,}"
+            f"{int(statistics.median(read_bytes)):>16,}"
+            f"{statistics.median(elapsed) * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="revision lookup benchmark")
+    parser.add_argument("--rows", type=int, default=20_000, help="Ids per flush")
+    parser.add_argument(
+        "--known", type=float, default=0.1, help="Fraction of ids already stored"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Flushes per table")
+    args = parser.parse_args()
+    run(args.rows, args.known, args.runs)
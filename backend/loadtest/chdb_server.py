@@ -0,0 +1,208 @@
+"""
+ClickHouse stand-in for machines without a ClickHouse server: serves the
+parts of the ClickHouse HTTP interface clickhouse-connect uses from chDB, the
+in-process ClickHouse engine. Queries run one at a time and query settings
+are ignored, so it is good enough to exercise the app and compare app-side
+changes, not to size ClickHouse itself. Use a real server for that.
+
+    uv run --with chdb python -m loadtest.chdb_server --port 8123 --path .cache/chdb
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import lz4.frame
+import zstandard
+from chdb import session
+
+INSERT_FORMAT = re.compile(r"\s+FORMAT\s+(\w+)\s*$", re.IGNORECASE)
+ERROR_CODE = re.compile(r"Code: (\d+)")
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Inserts are sent as one compressed frame per block"""
+    if encoding == "lz4":
+        chunks = []
+        while body:
+            decompressor = lz4.frame.LZ4FrameDecompressor()
+            chunks.append(decompressor.decompress(body))
+            body = decompressor.unused_data
+        return b"".join(chunks)
+    if encoding == "zstd":
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            io.BytesIO(body), read_across_frames=True
+        )
+        return reader.read()
+    if encoding:
+        raise ValueError(f"Unsupported Content-Encoding {encoding}")
+    return body
+
+
+class ChdbHandler(BaseHTTPRequestHandler):
+    server: "ChdbServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path in ("/ping", "/"):
+            if url.path == "/ping" or not url.query:
+                return self._reply(200, b"Ok.\n", {})
+        self._execute(url.query, b"")
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        # Inserts stream their blocks in chunks
+        chunks = []
+        while size := int(self.rfile.readline().split(b";")[0], 16):
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+        while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+    def do_POST(self):
+        body = self._read_body()
+        try:
+            body = decompress(body, self.headers.get("Content-Encoding"))
+        except Exception as e:
+            return self._error(f"Code: 1. {e}")
+        self._execute(urlsplit(self.path).query, body)
+
+    def _execute(self, query_string: str, body: bytes):
+        params = dict(parse_qsl(query_string, keep_blank_values=True))
+        query = params.get("query", "")
+        if not query and body[:6].upper() == b"INSERT":
+            # The insert statement leads the data, up to the first line break
+            statement, _, body = body.partition(b"\n")
+            query = statement.decode()
+        parameters = {
+            key.removeprefix("param_"): value
+            for key, value in params.items()
+            if key.startswith("param_")
+        }
+        query_id = params.get("query_id") or str(uuid.uuid4())
+        insert = INSERT_FORMAT.search(query) if body and query else None
+        start = time.perf_counter_ns()
+        try:
+            if insert:
+                result = self.server.insert(
+                    params.get("database"), query, insert, body, parameters
+                )
+            else:
+                sql = f"{query}\n{body.decode()}" if query else body.decode()
+                result = self.server.query(
+                    params.get("database"),
+                    sql,
+                    params.get("default_format", "TabSeparated"),
+                    parameters,
+                )
+        except Exception as e:
+            return self._error(str(e))
+        summary = {
+            "read_rows": str(result.rows_read()),
+            "read_bytes": str(result.bytes_read()),
+            "written_rows": str(result.rows_written()),
+            "written_bytes": str(result.bytes_written()),
+            "total_rows_to_read": "0",
+            "result_rows": "0",
+            "result_bytes": str(result.size()),
+            "elapsed_ns": str(time.perf_counter_ns() - start),
+        }
+        self._reply(
+            200,
+            result.bytes(),
+            {
+                "X-ClickHouse-Query-Id": query_id,
+                "X-ClickHouse-Timezone": "UTC",
+                "X-ClickHouse-Summary": json.dumps(summary),
+            },
+        )
+
+    def _error(self, message: str):
+        code = ERROR_CODE.search(message)
+        self._reply(
+            500,
+            message.encode(),
+            {"X-ClickHouse-Exception-Code": code.group(1) if code else "1"},
+        )
+
+    def _reply(self, status: int, body: bytes, headers: dict[str, str]):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ChdbServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], path: str):
+        super().__init__(address, ChdbHandler)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.session = session.Session(path)
+        # A chDB session runs one query at a time
+        self._lock = threading.Lock()
+
+    def _use(self, database: Optional[str]):
+        self.session.query(f"USE {database or 'default'}")
+
+    def query(self, database: Optional[str], sql: str, format: str, parameters):
+        with self._lock:
+            self._use(database)
+            return self.session.query(sql, format, params=parameters)
+
+    def insert(self, database, query: str, insert: re.Match, body: bytes, parameters):
+        """Inserts read their rows from a file, chDB takes no data with the query"""
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".insert") as f:
+            f.write(body)
+            f.flush()
+            sql = (
+                f"{query[: insert.start()]} SELECT * FROM "
+                f"file('{f.name}', '{insert.group(1)}')"
+            )
+            with self._lock:
+                self._use(database)
+                return self.session.query(sql, "TabSeparated", params=parameters)
+
+    def server_close(self):
+        super().server_close()
+        self.session.close()
+
+
+def serve(host: str, port: int, path: str) -> ChdbServer:
+    """Start the stand-in in a background thread"""
+    server = ChdbServer((host, port), path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ClickHouse HTTP stand-in on chDB")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--path", default=".cache/chdb", help="Data directory")
+    args = parser.parse_args()
+    server = ChdbServer((args.host, args.port), args.path)
+    print(f"chDB stand-in listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,260 @@
+"""
+Synthetic news corpus shaped like production: a few countries and sites hold
+most of the news, languages follow the country, sentiment leans neutral, text
+lengths are log-normal with a long tail and words follow a Zipf distribution
+so searches hit some rows, not all. The same seed always gives the same
+countries, sites and vocabulary, so the load generator queries values that
+exist with the same skew as the data.
+
+    uv run python -m loadtest.corpus --rows 1000000 --workers 4
+"""
+
+import argparse
+import itertools
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from clickhouse_connect import get_client
+
+from app.core.models.news import News
+
+COLUMNS = tuple(News.model_fields)
+
+# Country, its languages with their shares, and its share of the news
+COUNTRIES: list[tuple[str, dict[str, float], float]] = [
+    ("US", {"en": 0.95, "es": 0.05}, 30),
+    ("GB", {"en": 1.0}, 12),
+    ("IN", {"en": 0.7, "hi": 0.3}, 10),
+    ("DE", {"de": 1.0}, 7),
+    ("FR", {"fr": 1.0}, 6),
+    ("BR", {"pt": 1.0}, 5),
+    ("CA", {"en": 0.75, "fr": 0.25}, 4),
+    ("ES", {"es": 1.0}, 4),
+    ("IT", {"it": 1.0}, 3.5),
+    ("AU", {"en": 1.0}, 3),
+    ("MX", {"es": 1.0}, 3),
+    ("JP", {"ja": 1.0}, 2.5),
+    ("NG", {"en": 1.0}, 2),
+    ("ZA", {"en": 0.9, "af": 0.1}, 1.5),
+    ("NL", {"nl": 1.0}, 1.5),
+    ("PL", {"pl": 1.0}, 1.2),
+    ("TR", {"tr": 1.0}, 1),
+    ("AR", {"es": 1.0}, 1),
+    ("KE", {"en": 0.8, "sw": 0.2}, 0.8),
+    ("IE", {"en": 1.0}, 0.5),
+]
+SENTIMENTS = {"neutral": 0.55, "negative": 0.3, "positive": 0.15}
+SITES_PER_COUNTRY = 60
+# Real words the load generator searches for, from common to rare
+TOPICS = (
+    "election government minister president police court market economy "
+    "climate war health school football energy prices company workers "
+    "storm vaccine parliament budget inflation trade security protest "
+    "technology bank housing strike border crisis study report"
+).split()
+SYLLABLES = (
+    "ka ri to mu sen la de vo pa ne li ar os tu mi be ra co di fa ge hu "
+    "in jo ke lo ma no pe qu si ta ul ve wa xe yo zu an el"
+).split()
+SITE_WORDS = (
+    "Daily Morning Evening National Post Herald Times Courier Gazette "
+    "Tribune Observer Chronicle Journal Independent Express Star Sun News "
+    "Record Mirror Standard Telegraph Guardian Monitor Voice Review"
+).split()
+NAMES = (
+    "Alex Maria John Priya Lukas Chloe Diego Aiko Emeka Sofia Omar Hannah "
+    "Ivan Lea Mateo Amara Noah Yuki Zara Pedro"
+).split()
+SURNAMES = (
+    "Smith Garcia Müller Sharma Dubois Silva Rossi Tanaka Okafor Kowalski "
+    "Nguyen Jansen Brown Khan Lopez Novak Moreau Cohen Ali Schmidt"
+).split()
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> list[float]:
+    return [1 / rank**exponent for rank in range(1, count + 1)]
+
+
+def log_normal(rng: random.Random, median: float, sigma: float, low: int, high: int):
+    return int(min(max(rng.lognormvariate(math.log(median), sigma), low), high))
+
+
+class Corpus:
+    """Vocabulary, sites and authors the rows are drawn from"""
+
+    def __init__(self, seed: int = 0, vocabulary: int = 20_000, sentences: int = 20_000):
+        rng = random.Random(seed)
+        self.seed = seed
+        words = set()
+        while len(words) < vocabulary:
+            words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        self.words = sorted(words)
+        rng.shuffle(self.words)
+        # Topic words get ranks from 50 to 5000, the most frequent one is in
+        # about half of the news, the rarest in about one percent
+        for i, topic in enumerate(TOPICS):
+            rank = int(50 * 100 ** (i / (len(TOPICS) - 1)))
+            self.words.insert(rank, topic)
+        self.word_weights = list(
+            itertools.accumulate(zipf_weights(len(self.words), exponent=1.0))
+        )
+        self.countries = [country for country, _, _ in COUNTRIES]
+        self.country_weights = list(
+            itertools.accumulate(share for _, _, share in COUNTRIES)
+        )
+        self.languages = {
+            country: (list(languages), list(itertools.accumulate(languages.values())))
+            for country, languages, _ in COUNTRIES
+        }
+        self.sites = {
+            country: [
+                f"{rng.choice(SITE_WORDS)} {rng.choice(SITE_WORDS)} {country} {i}"
+                for i in range(SITES_PER_COUNTRY)
+            ]
+            for country in self.countries
+        }
+        self.site_weights = list(itertools.accumulate(zipf_weights(SITES_PER_COUNTRY)))
+        self.sentiments = list(SENTIMENTS)
+        self.sentiment_weights = list(itertools.accumulate(SENTIMENTS.values()))
+        self.authors = [f"{first} {last}" for first in NAMES for last in SURNAMES]
+        # Text is built from whole sentences, drawing every word of every
+        # article would make loading millions of rows take hours
+        self.sentences = [self._sentence(rng) for _ in range(sentences)]
+
+    def _words(self, rng: random.Random, count: int) -> list[str]:
+        return rng.choices(self.words, cum_weights=self.word_weights, k=count)
+
+    def _sentence(self, rng: random.Random) -> str:
+        words = self._words(rng, log_normal(rng, 14, 0.4, 4, 40))
+        return " ".join(words).capitalize() + "."
+
+    def _text(self, rng: random.Random, sentences: int) -> str:
+        return " ".join(rng.choices(self.sentences, k=sentences))
+
+    def country(self, rng: random.Random) -> str:
+        return rng.choices(self.countries, cum_weights=self.country_weights)[0]
+
+    def language(self, rng: random.Random, country: str) -> str:
+        languages, weights = self.languages[country]
+        return rng.choices(languages, cum_weights=weights)[0]
+
+    def site(self, rng: random.Random, country: str) -> str:
+        return rng.choices(self.sites[country], cum_weights=self.site_weights)[0]
+
+    def sentiment(self, rng: random.Random) -> str:
+        return rng.choices(self.sentiments, cum_weights=self.sentiment_weights)[0]
+
+    def word(self, rng: random.Random) -> str:
+        return self._words(rng, 1)[0]
+
+    def rows(
+        self, count: int, end: datetime, days: int, seed: Optional[int] = None
+    ) -> Iterator[tuple]:
+        """`count` rows in COLUMNS order published over the `days` before `end`"""
+        rng = random.Random(self.seed if seed is None else seed)
+        span = days * 86400
+        for _ in range(count):
+            id = f"{rng.getrandbits(128):032x}"
+            country = self.country(rng)
+            site = self.site(rng, country)
+            domain = site.lower().replace(" ", "-") + ".example"
+            slug = "-".join(self._words(rng, 6))
+            url = f"https://{domain}/{slug}-{id[:8]}"
+            # Recent days are busier, square root skews towards the end
+            age = span * (1 - math.sqrt(rng.random()))
+            publish_date = (
+                (end - timedelta(seconds=age)).replace(microsecond=0)
+                if rng.random() > 0.01
+                else None
+            )
+            title = " ".join(self._words(rng, log_normal(rng, 10, 0.3, 3, 25)))
+            summary = self._text(rng, log_normal(rng, 4, 0.4, 1, 12))
+            text = self._text(rng, log_normal(rng, 30, 0.7, 3, 600))
+            language = self.language(rng, country)
+            keywords = self._words(rng, rng.randint(3, 10))
+            image = f"https://img.{domain}/{id[:16]}.jpg"
+            yield (
+                id,
+                url,
+                url + "#more" if rng.random() < 0.2 else None,
+                language,
+                title.capitalize(),
+                image if rng.random() < 0.9 else None,
+                image if rng.random() < 0.7 else None,
+                [f"https://img.{domain}/{id[:16]}/{i}.jpg" for i in range(rng.randint(0, 8))],
+                [f"https://video.{domain}/{id[:8]}"] if rng.random() < 0.05 else [],
+                keywords,
+                keywords[: rng.randint(0, len(keywords))],
+                self._words(rng, rng.randint(0, 5)),
+                rng.sample(self.authors, rng.choices((0, 1, 2, 3), (10, 70, 15, 5))[0]),
+                publish_date,
+                summary,
+                summary[:160] if rng.random() < 0.8 else None,
+                language if rng.random() < 0.9 else None,
+                f"https://{domain}/favicon.ico" if rng.random() < 0.8 else None,
+                site if rng.random() < 0.97 else None,
+                url,
+                text,
+                country,
+                url,
+                f"CBMi{rng.getrandbits(256):064x}",
+                self._words(rng, rng.randint(5, 15)),
+                self.sentiment(rng),
+                rng.sample(self.sentences, rng.randint(0, 3)),
+            )
+
+
+def _load(dsn: str, seed: int, worker: int, count: int, end: datetime, days: int,
+          batch: int) -> int:
+    client = get_client(dsn=dsn, autogenerate_session_id=False)
+    rows = Corpus(seed).rows(count, end, days, seed=seed * 1000 + worker + 1)
+    loaded = 0
+    while chunk := list(itertools.islice(rows, batch)):
+        client.insert("news", chunk, column_names=COLUMNS)
+        loaded += len(chunk)
+    client.close()
+    return loaded
+
+
+def load(
+    dsn: str,
+    rows: int,
+    seed: int = 0,
+    days: int = 365,
+    end: Optional[datetime] = None,
+    batch: int = 20_000,
+    workers: int = 1,
+) -> int:
+    """Insert `rows` synthetic news into the news table, split over processes"""
+    # ClickHouse stores DateTime in UTC
+    end = end or datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    shares = [rows // workers + (i < rows % workers) for i in range(workers)]
+    if workers == 1:
+        return _load(dsn, seed, 0, rows, end, days, batch)
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(_load, dsn, seed, i, share, end, days, batch)
+            for i, share in enumerate(shares)
+        ]
+        return sum(future.result() for future in futures)
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Load synthetic news into ClickHouse")
+    parser.add_argument("--dsn", default=settings.CLICKHOUSE_DSN)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=365, help="Days of news")
+    parser.add_argument("--batch", type=int, default=20_000, help="Rows per insert")
+    parser.add_argument("--workers", type=int, default=1, help="Loading processes")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    loaded = load(args.dsn, args.rows, args.seed, args.days, None, args.batch, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {loaded} news in {elapsed:.1f}s, {loaded / elapsed:.0f} rows/s")
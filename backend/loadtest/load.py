@@ -0,0 +1,360 @@
+"""
+Async load generator replaying a weighted mix of the API's read routes with
+values drawn from the synthetic corpus, popular countries, sites and words
+more often than rare ones. Reports throughput, errors and p50/p95/p99
+latency per route, and writes them as JSON to compare runs across commits.
+
+With --rate requests arrive on a Poisson schedule whatever the latency, and
+latency counts from the scheduled start so a stalled server isn't hidden by
+the generator waiting on it. Without it --concurrency users send requests
+back to back.
+
+    uv run python -m loadtest.load --url http://localhost:8000 --duration 60 --rate 200
+    uv run python -m loadtest.load --compare loadtest/results/before.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import httpx
+
+from loadtest.corpus import Corpus
+
+Request = tuple[str, dict[str, Any]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    weight: float
+    request: Callable[["Mix", random.Random], Request]
+
+
+@dataclass
+class RouteStats:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+
+    def record(self, latency: float, status: Optional[int]):
+        self.latencies.append(latency)
+        if status is None or status >= 400:
+            self.errors += 1
+        key = status or 0
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+
+def percentile(ordered: list[float], share: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+class Mix:
+    """
+    The scenarios and the values they query. Ids of news seen in responses
+    are kept to request them by id later, like a user opening a result.
+    """
+
+    def __init__(self, corpus: Corpus, end: datetime):
+        self.corpus = corpus
+        self.end = end
+        self.ids: deque[str] = deque(maxlen=10_000)
+        self.scenarios = [
+            Scenario("list", 25, Mix.page),
+            Scenario("list site", 8, Mix.page_site),
+            Scenario("list deep offset", 2, Mix.page_deep),
+            Scenario("search", 10, Mix.search),
+            Scenario("search relevance", 3, Mix.search_relevance),
+            Scenario("by id", 10, Mix.by_id),
+            Scenario("count", 8, Mix.count),
+            Scenario("count approximate", 4, Mix.count_approximate),
+            Scenario("distinct", 4, Mix.distinct),
+            Scenario("facets", 4, Mix.facets),
+            Scenario("sentiment", 5, Mix.sentiment),
+            Scenario("sentiment by date", 5, Mix.sentiment_by_date),
+            Scenario("sentiment series", 5, Mix.sentiment_series),
+            Scenario("sentiment by country", 3, Mix.sentiment_by_country),
+        ]
+        self.weights = [scenario.weight for scenario in self.scenarios]
+
+    def pick(self, rng: random.Random) -> Scenario:
+        return rng.choices(self.scenarios, weights=self.weights)[0]
+
+    def filters(self, rng: random.Random) -> dict[str, Any]:
+        country = self.corpus.country(rng)
+        filters: dict[str, Any] = {"country": country}
+        if rng.random() < 0.4:
+            filters["language"] = self.corpus.language(rng, country)
+        if rng.random() < 0.2:
+            filters["sentiment"] = self.corpus.sentiment(rng)
+        return filters
+
+    def since(self, rng: random.Random) -> str:
+        days = rng.choice((1, 7, 30, 90))
+        return (self.end - timedelta(days=days)).isoformat()
+
+    def page(self, rng):
+        return "/news", {**self.filters(rng), "limit": rng.choice((10, 20, 50))}
+
+    def page_site(self, rng):
+        country = self.corpus.country(rng)
+        return "/news", {
+            "meta_site_name": self.corpus.site(rng, country),
+            "limit": 20,
+            "view": "list",
+        }
+
+    def page_deep(self, rng):
+        return "/news", {**self.filters(rng), "limit": 20, "offset": rng.randint(1, 500) * 20}
+
+    def search(self, rng):
+        return "/news", {
+            **self.filters(rng),
+            "search": self.corpus.word(rng),
+            "search_fields": ["title", "summary"],
+            "limit": 20,
+        }
+
+    def search_relevance(self, rng):
+        path, params = self.search(rng)
+        return path, {**params, "sort": "relevance"}
+
+    def by_id(self, rng):
+        if not self.ids:
+            return self.page(rng)
+        return f"/news/{rng.choice(self.ids)}", {}
+
+    def count(self, rng):
+        return "/news/count", self.filters(rng)
+
+    def count_approximate(self, rng):
+        return "/news/count", {**self.filters(rng), "approximate": "true"}
+
+    def distinct(self, rng):
+        field = rng.choice(("meta_site_name", "language", "sentiment"))
+        return "/news/distinct", {**self.filters(rng), "field": field, "top_n": 100}
+
+    def facets(self, rng):
+        return "/news/facets", {
+            "country": self.corpus.country(rng),
+            "field": ["meta_site_name", "sentiment", "keywords"],
+        }
+
+    def sentiment(self, rng):
+        return "/news/aggregate/sentiment", self.filters(rng)
+
+    def sentiment_by_date(self, rng):
+        return "/news/aggregate/sentiment/date", {
+            **self.filters(rng),
+            "from": self.since(rng),
+            "to": self.end.isoformat(),
+        }
+
+    def sentiment_series(self, rng):
+        return "/news/aggregate/sentiment/series", {
+            **self.filters(rng),
+            "from": self.since(rng),
+            "to": self.end.isoformat(),
+            "interval": rng.choice(("hour", "day", "day", "week")),
+        }
+
+    def sentiment_by_country(self, rng):
+        return "/news/aggregate/sentiment/country", {}
+
+    def remember(self, response: httpx.Response):
+        if response.request.url.path != "/news" or response.status_code != 200:
+            return
+        for news in response.json()[:5]:
+            self.ids.append(news["id"])
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, mix: Mix, seed: int):
+        self.client = client
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.stats: dict[str, RouteStats] = {}
+        self.recording = False
+        self.late = 0
+
+    async def send(self, scenario: Scenario, scheduled: float):
+        path, params = scenario.request(self.mix, self.rng)
+        status = None
+        try:
+            response = await self.client.get(path, params=params)
+            status = response.status_code
+            self.mix.remember(response)
+        except httpx.HTTPError:
+            pass
+        if self.recording:
+            stats = self.stats.setdefault(scenario.name, RouteStats())
+            stats.record(time.perf_counter() - scheduled, status)
+
+    async def closed(self, concurrency: int, deadline: float):
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.send(self.mix.pick(self.rng), time.perf_counter())
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+    async def open(self, rate: float, deadline: float):
+        tasks = set()
+        scheduled = time.perf_counter()
+        while scheduled < deadline:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.01:
+                # The generator fell behind its schedule, rates are lower than asked
+                self.late += 1
+            task = asyncio.create_task(self.send(self.mix.pick(self.rng), scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            scheduled += self.rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+
+    async def run(
+        self, duration: float, warmup: float, concurrency: int, rate: Optional[float]
+    ) -> float:
+        """Run for warmup then duration seconds, returns the recorded seconds"""
+        elapsed = 0.0
+        for recording, seconds in ((False, warmup), (True, duration)):
+            if seconds <= 0:
+                continue
+            self.recording = recording
+            start = time.perf_counter()
+            deadline = start + seconds
+            if rate:
+                await self.open(rate, deadline)
+            else:
+                await self.closed(concurrency, deadline)
+            elapsed = time.perf_counter() - start
+        return elapsed
+
+
+def summarize(stats: dict[str, RouteStats], elapsed: float) -> dict[str, dict]:
+    routes = {"all": RouteStats()}
+    for name, route in sorted(stats.items()):
+        routes[name] = route
+        routes["all"].latencies += route.latencies
+        routes["all"].errors += route.errors
+        for status, count in route.statuses.items():
+            routes["all"].statuses[status] = routes["all"].statuses.get(status, 0) + count
+    summary = {}
+    for name, route in routes.items():
+        ordered = sorted(route.latencies)
+        summary[name] = {
+            "requests": len(ordered),
+            "errors": route.errors,
+            "throughput": len(ordered) / elapsed,
+            "p50_ms": percentile(ordered, 0.5) * 1000,
+            "p95_ms": percentile(ordered, 0.95) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+            "max_ms": (ordered[-1] if ordered else 0) * 1000,
+        }
+        if route.statuses:
+            summary[name]["statuses"] = {str(k): v for k, v in route.statuses.items()}
+    return summary
+
+
+def print_report(routes: dict[str, dict], baseline: Optional[dict[str, dict]] = None):
+    header = f"{'route':<22}{'req/s':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header + ("   p95 vs baseline" if baseline else ""))
+    for name, route in routes.items():
+        line = (
+            f"{name:<22}{route['throughput']:>9.1f}{route['errors']:>8}"
+            f"{route['p50_ms']:>9.1f}{route['p95_ms']:>9.1f}{route['p99_ms']:>9.1f}"
+        )
+        reference = (baseline or {}).get(name)
+        if reference and reference["p95_ms"]:
+            line += f"{route['p95_ms'] / reference['p95_ms'] - 1:>+18.1%}"
+        print(line)
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(
+    url: str,
+    duration: float,
+    warmup: float = 10,
+    concurrency: int = 32,
+    rate: Optional[float] = None,
+    seed: int = 0,
+    end: Optional[datetime] = None,
+) -> dict[str, Any]:
+    """Run the mix against url and return the report"""
+    end = end or datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    mix = Mix(Corpus(seed), end)
+    connections = concurrency if not rate else max(concurrency, int(rate))
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        generator = LoadGenerator(client, mix, seed)
+        elapsed = await generator.run(duration, warmup, concurrency, rate)
+    return {
+        "commit": commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "url": url,
+            "duration": duration,
+            "warmup": warmup,
+            "concurrency": None if rate else concurrency,
+            "rate": rate,
+            "seed": seed,
+        },
+        "late": generator.late,
+        "routes": summarize(generator.stats, elapsed),
+    }
+
+
+def write_report(report: dict[str, Any], output: Optional[str], compare: Optional[str]):
+    baseline = json.loads(Path(compare).read_text())["routes"] if compare else None
+    print_report(report["routes"], baseline)
+    if report["late"]:
+        print(f"The generator fell behind for {report['late']} requests, "
+              "the rate achieved is lower than asked")
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Report written to {output}")
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--duration", type=float, default=60, help="Recorded seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="Unrecorded seconds first")
+    parser.add_argument("--concurrency", type=int, default=32, help="Users without --rate")
+    parser.add_argument("--rate", type=float, help="Requests per second, open loop")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--compare", help="Report JSON to compare p95 latencies with")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a mix of API calls")
+    parser.add_argument("--url", default="http://localhost:8000")
+    add_arguments(parser)
+    args = parser.parse_args()
+    report = asyncio.run(
+        run(args.url, args.duration, args.warmup, args.concurrency, args.rate, args.seed)
+    )
+    write_report(report, args.output, args.compare)
@@ -0,0 +1,228 @@
+"""
+End-to-end load test: starts a local ClickHouse, applies the migrations,
+loads the synthetic corpus, starts the app against it with uvicorn and
+replays the request mix, then stops everything it started.
+
+ClickHouse is one of
+- server: the clickhouse binary (https://clickhouse.com/docs/install) run as
+  a server in a temporary directory, for numbers that size production
+- chdb: the chDB stand-in of loadtest/chdb_server.py, runs anywhere with
+  `pip install chdb` but answers one query at a time
+- external: an already running server given by --dsn, whose database is
+  dropped and recreated
+
+    uv run python -m loadtest.run --clickhouse server --rows 1000000 --workers 4 \\
+        --rate 100 --output loadtest/results/$(git rev-parse --short HEAD).json
+    uv run --with chdb python -m loadtest.run --clickhouse chdb --rows 20000 --duration 30
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from clickhouse_connect import get_client
+
+from loadtest import corpus, load
+
+MIGRATIONS = Path(__file__).parent.parent / "migrations-clickhouse"
+DATABASE = "loadtest"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, process: Optional[subprocess.Popen], timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process and process.poll() is not None:
+            raise RuntimeError(f"{process.args[0]} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+@contextlib.contextmanager
+def started(command: list[str], log: Path, **kwargs) -> Iterator[subprocess.Popen]:
+    with open(log, "wb") as output:
+        process = subprocess.Popen(
+            command, stdout=output, stderr=subprocess.STDOUT, **kwargs
+        )
+        try:
+            yield process
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+@contextlib.contextmanager
+def clickhouse(kind: str, directory: Path, dsn: Optional[str]) -> Iterator[str]:
+    """Start ClickHouse and yield the DSN of its loadtest database"""
+    if kind == "external":
+        if not dsn:
+            raise ValueError("--dsn is required with --clickhouse external")
+        url = urlsplit(dsn)
+        yield urlunsplit(url._replace(path=f"/{DATABASE}"))
+        return
+    port = free_port()
+    if kind == "server":
+        binary = shutil.which("clickhouse")
+        if binary is None:
+            raise RuntimeError("No clickhouse binary on PATH, see https://clickhouse.com/docs/install")
+        command = [
+            binary,
+            "server",
+            "--",
+            f"--path={directory / 'clickhouse'}/",
+            f"--http_port={port}",
+            f"--tcp_port={free_port()}",
+            "--listen_host=127.0.0.1",
+            "--mysql_port=",
+            "--postgresql_port=",
+        ]
+    else:
+        command = [
+            sys.executable,
+            "-m",
+            "loadtest.chdb_server",
+            f"--port={port}",
+            f"--path={directory / 'chdb'}",
+        ]
+    with started(command, directory / "clickhouse.log") as process:
+        wait_until_up(f"http://127.0.0.1:{port}/ping", process, 60)
+        yield f"http://default:@127.0.0.1:{port}/{DATABASE}"
+
+
+def statements(sql: str) -> list[str]:
+    """Statements of a migration file, they end with a semicolon at a line end"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = (
+        statement.strip().rstrip(";").strip()
+        for statement in "\n".join(lines).split(";\n")
+    )
+    return [statement for statement in statements if statement]
+
+
+def migrate(dsn: str):
+    """Recreate the database and apply every migration in order"""
+    url = urlsplit(dsn)
+    client = get_client(dsn=urlunsplit(url._replace(path="/default")))
+    client.command(f"DROP DATABASE IF EXISTS {DATABASE}")
+    client.command(f"CREATE DATABASE {DATABASE}")
+    client.close()
+    client = get_client(dsn=dsn)
+    for migration in sorted(MIGRATIONS.glob("*.sql")):
+        for statement in statements(migration.read_text()):
+            client.command(statement)
+    client.close()
+
+
+def app_environment(dsn: str, directory: Path) -> dict[str, str]:
+    return {
+        **os.environ,
+        "PROJECT_NAME": "media-monitoring-loadtest",
+        "CLICKHOUSE_DSN": dsn,
+        "DEBUG": "false",
+        # Nothing leaves the machine during the test
+        "IMAGE_PREWARM_ENABLED": "false",
+        "PROXY_CACHE_DIR": str(directory / "proxy"),
+        "DEDUP_INDEX_PATH": str(directory / "dedup" / "index.npz"),
+        "DEDUP_LOCK_PATH": str(directory / "dedup" / "index.lock"),
+        "INGEST_DEAD_LETTER_DIR": str(directory / "dead-letter"),
+    }
+
+
+def main(args: argparse.Namespace):
+    directory = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    # Corpus and request mix agree on what "recent" means
+    end = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    try:
+        with clickhouse(args.clickhouse, directory, args.dsn) as dsn:
+            print(f"ClickHouse at {urlsplit(dsn).netloc}, logs in {directory}")
+            if not args.skip_load:
+                migrate(dsn)
+                start = time.perf_counter()
+                rows = corpus.load(
+                    dsn, args.rows, args.seed, args.days, end, args.batch, args.workers
+                )
+                print(f"Loaded {rows} news in {time.perf_counter() - start:.1f}s")
+            port = free_port()
+            command = [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "app:app",
+                "--port",
+                str(port),
+                "--workers",
+                str(args.app_workers),
+                "--no-access-log",
+            ]
+            with started(
+                command, directory / "app.log", env=app_environment(dsn, directory)
+            ) as app:
+                url = f"http://127.0.0.1:{port}"
+                wait_until_up(f"{url}/news?limit=1", app, 60)
+                report = asyncio.run(
+                    load.run(
+                        url,
+                        args.duration,
+                        args.warmup,
+                        args.concurrency,
+                        args.rate,
+                        args.seed,
+                        end,
+                    )
+                )
+        report["config"].update(
+            clickhouse=args.clickhouse,
+            rows=args.rows,
+            days=args.days,
+            app_workers=args.app_workers,
+        )
+        load.write_report(report, args.output, args.compare)
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test")
+    parser.add_argument(
+        "--clickhouse", choices=("server", "chdb", "external"), default="server"
+    )
+    parser.add_argument("--dsn", help="ClickHouse of --clickhouse external")
+    parser.add_argument("--rows", type=int, default=100_000, help="News to load")
+    parser.add_argument("--batch", type=int, default=20_000, help="Rows per insert")
+    parser.add_argument("--workers", type=int, default=1, help="Loading processes")
+    parser.add_argument("--days", type=int, default=365, help="Days of news")
+    parser.add_argument(
+        "--skip-load", action="store_true", help="Reuse the data of --clickhouse external"
+    )
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the data and logs directory"
+    )
+    load.add_arguments(parser)
+    main(parser.parse_args())
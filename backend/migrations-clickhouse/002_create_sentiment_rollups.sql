@@ -0,0 +1,42 @@
+CREATE TABLE IF NOT EXISTS news_sentiment_daily (
+    day Date,
+    country String,
+    language String,
+    sentiment String,
+    count UInt64
+) ENGINE = SummingMergeTree()
+ORDER BY
+    (day, country, language, sentiment);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS news_sentiment_daily_mv TO news_sentiment_daily AS
+SELECT
+    toDate(ifNull(publish_date, toDateTime(0))) AS day,
+    country,
+    language,
+    sentiment,
+    count() AS count
+FROM
+    news
+GROUP BY
+    day,
+    country,
+    language,
+    sentiment;
+
+-- Backfill rows inserted before the view existed. Run while ingestion is
+-- paused, rows inserted in between would be counted twice.
+INSERT INTO
+    news_sentiment_daily
+SELECT
+    toDate(ifNull(publish_date, toDateTime(0))) AS day,
+    country,
+    language,
+    sentiment,
+    count() AS count
+FROM
+    news
+GROUP BY
+    day,
+    country,
+    language,
+    sentiment;
@@ -0,0 +1,74 @@
+-- Rebuild news with a layout for the NewsFilters access paths: the sort key
+-- leads with the low cardinality filter columns and publish_date, parts are
+-- partitioned by month, and the large text columns use ZSTD. The previous
+-- table is kept as news_legacy for benchmarks/layout.py, drop it once the
+-- new layout is verified. Run while ingestion is paused.
+CREATE TABLE IF NOT EXISTS news_v2 (
+    id String,
+    url String,
+    read_more_link String NULL,
+    language LowCardinality(String),
+    title String CODEC(ZSTD(3)),
+    top_image String NULL,
+    meta_img String NULL,
+    images Array(String) CODEC(ZSTD(3)),
+    movies Array(String) CODEC(ZSTD(3)),
+    keywords Array(String) CODEC(ZSTD(3)),
+    meta_keywords Array(String) CODEC(ZSTD(3)),
+    tags Array(String) CODEC(ZSTD(3)),
+    authors Array(String) CODEC(ZSTD(3)),
+    publish_date DateTime NULL,
+    summary String CODEC(ZSTD(3)),
+    meta_description String NULL CODEC(ZSTD(3)),
+    meta_lang LowCardinality(Nullable(String)),
+    meta_favicon String NULL,
+    meta_site_name LowCardinality(Nullable(String)),
+    canonical_link String NULL,
+    text String CODEC(ZSTD(3)),
+    country LowCardinality(String),
+    decoded_url String CODEC(ZSTD(3)),
+    google_uri String CODEC(ZSTD(3)),
+    extracted_keywords Array(String) CODEC(ZSTD(3)),
+    sentiment LowCardinality(String),
+    sentiment_impactful_texts Array(String) CODEC(ZSTD(3)),
+    INDEX id_bloom_filter id TYPE bloom_filter GRANULARITY 4,
+    INDEX url_bloom_filter url TYPE bloom_filter GRANULARITY 4,
+    INDEX meta_site_name_set meta_site_name TYPE set(1024) GRANULARITY 4
+) ENGINE = MergeTree()
+PARTITION BY
+    toYYYYMM(ifNull(publish_date, toDateTime(0)))
+ORDER BY
+    (country, language, sentiment, publish_date, cityHash64(id))
+SAMPLE BY
+    cityHash64(id)
+SETTINGS
+    allow_nullable_key = 1;
+
+INSERT INTO
+    news_v2
+SELECT
+    *
+FROM
+    news;
+
+EXCHANGE TABLES news AND news_v2;
+
+RENAME TABLE news_v2 TO news_legacy;
+
+-- Re-attach the rollup view to the new table
+DROP VIEW IF EXISTS news_sentiment_daily_mv;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS news_sentiment_daily_mv TO news_sentiment_daily AS
+SELECT
+    toDate(ifNull(publish_date, toDateTime(0))) AS day,
+    country,
+    language,
+    sentiment,
+    count() AS count
+FROM
+    news
+GROUP BY
+    day,
+    country,
+    language,
+    sentiment;
@@ -0,0 +1,13 @@
+-- Token bloom filters for the search translator in
+-- app/core/schemas/filters/search.py, which matches hasToken(lowerUTF8(field), ...)
+ALTER TABLE news ADD INDEX IF NOT EXISTS title_tokens lowerUTF8(title) TYPE tokenbf_v1(8192, 3, 0) GRANULARITY 1;
+
+ALTER TABLE news ADD INDEX IF NOT EXISTS summary_tokens lowerUTF8(summary) TYPE tokenbf_v1(32768, 3, 0) GRANULARITY 1;
+
+ALTER TABLE news ADD INDEX IF NOT EXISTS text_tokens lowerUTF8(text) TYPE tokenbf_v1(262144, 3, 0) GRANULARITY 1;
+
+ALTER TABLE news MATERIALIZE INDEX title_tokens;
+
+ALTER TABLE news MATERIALIZE INDEX summary_tokens;
+
+ALTER TABLE news MATERIALIZE INDEX text_tokens;
@@ -0,0 +1,90 @@
+-- Rebuild news as a ReplacingMergeTree so re-sent articles replace their
+-- previous version instead of adding a row. Rows with the same sorting key,
+-- so the same id, country, language, sentiment and publish_date, are merged
+-- into the one with the highest revision. Merges happen in the background,
+-- readers that must not see duplicates query with FINAL, cheap per partition
+-- since duplicates always share their publish_date month.
+-- POST /news/bulk sets revision to 1 for unseen ids and one more than the
+-- stored revision for re-sent ones, the sentiment rollup only counts
+-- revision 1 so re-sent articles are counted once. Rows inserted without a
+-- revision get 1.
+-- The previous table is kept as news_unversioned, drop it once the new one
+-- is verified. Run while ingestion is paused.
+CREATE TABLE IF NOT EXISTS news_v3 (
+    id String,
+    url String,
+    read_more_link String NULL,
+    language LowCardinality(String),
+    title String CODEC(ZSTD(3)),
+    top_image String NULL,
+    meta_img String NULL,
+    images Array(String) CODEC(ZSTD(3)),
+    movies Array(String) CODEC(ZSTD(3)),
+    keywords Array(String) CODEC(ZSTD(3)),
+    meta_keywords Array(String) CODEC(ZSTD(3)),
+    tags Array(String) CODEC(ZSTD(3)),
+    authors Array(String) CODEC(ZSTD(3)),
+    publish_date DateTime NULL,
+    summary String CODEC(ZSTD(3)),
+    meta_description String NULL CODEC(ZSTD(3)),
+    meta_lang LowCardinality(Nullable(String)),
+    meta_favicon String NULL,
+    meta_site_name LowCardinality(Nullable(String)),
+    canonical_link String NULL,
+    text String CODEC(ZSTD(3)),
+    country LowCardinality(String),
+    decoded_url String CODEC(ZSTD(3)),
+    google_uri String CODEC(ZSTD(3)),
+    extracted_keywords Array(String) CODEC(ZSTD(3)),
+    sentiment LowCardinality(String),
+    sentiment_impactful_texts Array(String) CODEC(ZSTD(3)),
+    revision UInt32 DEFAULT 1,
+    INDEX id_bloom_filter id TYPE bloom_filter GRANULARITY 4,
+    INDEX url_bloom_filter url TYPE bloom_filter GRANULARITY 4,
+    INDEX meta_site_name_set meta_site_name TYPE set(1024) GRANULARITY 4,
+    INDEX title_tokens lowerUTF8(title) TYPE tokenbf_v1(8192, 3, 0) GRANULARITY 1,
+    INDEX summary_tokens lowerUTF8(summary) TYPE tokenbf_v1(32768, 3, 0) GRANULARITY 1,
+    INDEX text_tokens lowerUTF8(text) TYPE tokenbf_v1(262144, 3, 0) GRANULARITY 1
+) ENGINE = ReplacingMergeTree(revision)
+PARTITION BY
+    toYYYYMM(ifNull(publish_date, toDateTime(0)))
+ORDER BY
+    (country, language, sentiment, publish_date, cityHash64(id))
+SAMPLE BY
+    cityHash64(id)
+SETTINGS
+    allow_nullable_key = 1,
+    -- Retried inserts with the same insert_deduplication_token are dropped
+    non_replicated_deduplication_window = 1000;
+
+INSERT INTO
+    news_v3
+SELECT
+    *,
+    1 AS revision
+FROM
+    news;
+
+EXCHANGE TABLES news AND news_v3;
+
+RENAME TABLE news_v3 TO news_unversioned;
+
+-- Re-attach the rollup view, counting each article once
+DROP VIEW IF EXISTS news_sentiment_daily_mv;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS news_sentiment_daily_mv TO news_sentiment_daily AS
+SELECT
+    toDate(ifNull(publish_date, toDateTime(0))) AS day,
+    country,
+    language,
+    sentiment,
+    count() AS count
+FROM
+    news
+WHERE
+    revision = 1
+GROUP BY
+    day,
+    country,
+    language,
+    sentiment;
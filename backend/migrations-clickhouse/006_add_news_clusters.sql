@@ -0,0 +1,5 @@
+-- Near-duplicate news, copies of one story on several sites, share a
+-- cluster_id assigned by POST /news/bulk, see app/core/dedup.py. News stored
+-- before are each their own cluster, hashed from their id like own_cluster
+-- does. collapse=true reads count each cluster once.
+ALTER TABLE news ADD COLUMN IF NOT EXISTS cluster_id UInt64 DEFAULT reinterpretAsUInt64(substring(MD5(id), 1, 8));
@@ -0,0 +1,43 @@
+-- Count every version of a news in the sentiment rollup. It only counted
+-- revision 1, so a news re-sent with another sentiment, country, language or
+-- publish_date stayed counted under its first values. A tombstone now takes
+-- the news off the counts of the row it replaces, see 007_news_tombstones.sql,
+-- and the new row adds it to its own. count turns signed, a day of tombstones
+-- alone takes away from counts inserted earlier. Run while ingestion is paused.
+DROP VIEW IF EXISTS news_sentiment_daily_mv;
+
+ALTER TABLE news_sentiment_daily MODIFY COLUMN count Int64;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS news_sentiment_daily_mv TO news_sentiment_daily AS
+SELECT
+    toDate(ifNull(publish_date, toDateTime(0))) AS day,
+    country,
+    language,
+    sentiment,
+    sum(if(is_deleted, -1, 1)) AS count
+FROM
+    news
+GROUP BY
+    day,
+    country,
+    language,
+    sentiment;
+
+-- Rebuild the counts from the live rows
+TRUNCATE TABLE news_sentiment_daily;
+
+INSERT INTO
+    news_sentiment_daily
+SELECT
+    toDate(ifNull(publish_date, toDateTime(0))) AS day,
+    country,
+    language,
+    sentiment,
+    count() AS count
+FROM
+    news FINAL
+GROUP BY
+    day,
+    country,
+    language,
+    sentiment;
@@ -0,0 +1,44 @@
+-- Latest version of every id, looked up by POST /news/bulk before it inserts
+-- a batch, see NewsRepository.versions. news is sorted for the filters, so an
+-- id lookup there is only served by the id bloom filter and reads most of
+-- the id column for a batch of mostly new ids. Sorted by id, a lookup reads
+-- the granules of the ids of the batch. Rows with the highest revision of an
+-- id are kept, tombstones included.
+CREATE TABLE IF NOT EXISTS news_versions (
+    id String,
+    revision UInt32,
+    is_deleted UInt8,
+    country LowCardinality(String),
+    language LowCardinality(String),
+    sentiment LowCardinality(String),
+    publish_date DateTime NULL
+) ENGINE = ReplacingMergeTree(revision)
+ORDER BY
+    id;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS news_versions_mv TO news_versions AS
+SELECT
+    id,
+    revision,
+    is_deleted,
+    country,
+    language,
+    sentiment,
+    publish_date
+FROM
+    news;
+
+-- Backfill rows inserted before the view existed. Run while ingestion is
+-- paused.
+INSERT INTO
+    news_versions
+SELECT
+    id,
+    revision,
+    is_deleted,
+    country,
+    language,
+    sentiment,
+    publish_date
+FROM
+    news;
@@ -0,0 +1,13 @@
+-- N-gram bloom filters for the last word of a search, which only has to start
+-- a token of lowerUTF8(field) and so can't use the token bloom filters of
+-- 004_add_search_indexes.sql. SearchQuery.condition checks it with a LIKE
+-- '%prefix%' these indexes answer once the prefix has 4 characters, then
+-- with the match on the start of a token. 3-grams and text are left out, a
+-- granule of them holds nearly every n-gram and nothing is skipped.
+ALTER TABLE news ADD INDEX IF NOT EXISTS title_ngrams lowerUTF8(title) TYPE ngrambf_v1(4, 65536, 3, 0) GRANULARITY 1;
+
+ALTER TABLE news ADD INDEX IF NOT EXISTS summary_ngrams lowerUTF8(summary) TYPE ngrambf_v1(4, 262144, 3, 0) GRANULARITY 1;
+
+ALTER TABLE news MATERIALIZE INDEX title_ngrams;
+
+ALTER TABLE news MATERIALIZE INDEX summary_ngrams;
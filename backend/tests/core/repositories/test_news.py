@@ -1,10 +1,22 @@
+import asyncio
+import io
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from datetime import datetime, timedelta
 from faker import Faker
-from app.core.database import AsyncClient
+from clickhouse_connect.driver.exceptions import DatabaseError
+from prometheus_client import REGISTRY
+from app.core.admission import Budget, QueryBudgetExceeded, current_budget
+from app.core.cache import QueryCache
+from app.core.database import ClickHousePool
 from app.core.database.repositories.news import NewsRepository
-from app.core.schemas.news import SentimentByDay, SentimentByCountry, SentimentCount
+from app.core.schemas.news import (
+    FacetValue,
+    NewsCursor,
+    SentimentByDay,
+    SentimentByCountry,
+    SentimentCount,
+)
 from app.core.schemas import CountResponse
 from app.core.models.news import News
 from app.core.schemas.filters.news import NewsFilters
@@ -47,13 +59,14 @@ def fake_news() -> News:
 
 @pytest.fixture
 def mock_client() -> AsyncMock:
-    client: AsyncMock = AsyncMock(spec=AsyncClient)
+    client: AsyncMock = AsyncMock(spec=ClickHousePool)
+    client.query.return_value.summary = {}
     return client
 
 
 @pytest.fixture
 def news_repository(mock_client: AsyncMock) -> NewsRepository:
-    return NewsRepository(client=mock_client)
+    return NewsRepository(client=mock_client, cache=None)
 
 
 @pytest.fixture
@@ -75,7 +88,7 @@ class TestNewsRepository:
         mock_client.query.return_value.named_results.return_value = [
             fake_news.model_dump()
         ]
-        news_filters.apply_filters.return_value = "fake query"
+        news_filters.apply_filters.return_value = ("fake query", {})
         result: list[News] = await news_repository.fetch(
             limit=1, offset=0, filters=news_filters
         )
@@ -85,6 +98,226 @@ class TestNewsRepository:
         assert isinstance(result[0], News)
         assert result[0].id == fake_news.id
 
+    async def should_record_query_metrics_by_method(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.summary = {
+            "read_rows": "100",
+            "read_bytes": "2048",
+        }
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        before = REGISTRY.get_sample_value(
+            "clickhouse_read_rows_total", {"query": "fetch"}
+        ) or 0
+        await news_repository.fetch(limit=1, offset=0)
+
+        assert (
+            REGISTRY.get_sample_value("clickhouse_read_rows_total", {"query": "fetch"})
+            == before + 100
+        )
+        assert REGISTRY.get_sample_value(
+            "clickhouse_query_duration_seconds_count", {"query": "fetch"}
+        )
+
+    async def should_label_queries_of_helpers_with_the_public_method(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [{"count": 1}]
+        labels = {"query": "fetch_count"}
+        before = REGISTRY.get_sample_value(
+            "clickhouse_query_duration_seconds_count", labels
+        ) or 0
+        # Counted by the _parts_count helper
+        await news_repository.fetch_count(approximate=True)
+
+        assert (
+            REGISTRY.get_sample_value("clickhouse_query_duration_seconds_count", labels)
+            == before + 1
+        )
+
+    async def should_send_queries_with_settings_of_request_budget(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        budget = Budget(
+            max_concurrency=1,
+            max_queue=1,
+            settings={
+                "max_execution_time": 10,
+                "do_not_merge_across_partitions_select_final": 0,
+            },
+        )
+        token = current_budget.set(budget)
+        try:
+            await news_repository.fetch(limit=1, offset=0)
+        finally:
+            current_budget.reset(token)
+
+        settings = mock_client.query.call_args.kwargs["settings"]
+        assert settings["max_execution_time"] == 10
+        # Settings of the method win
+        assert settings["do_not_merge_across_partitions_select_final"] == 1
+
+    async def should_raise_budget_exceeded_for_queries_stopped_at_a_limit(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.side_effect = DatabaseError(
+            "HTTPDriver received ClickHouse error code 158\n Code: 158. Limit for rows"
+        )
+
+        with pytest.raises(QueryBudgetExceeded, match="too many rows read"):
+            await news_repository.fetch_count(NewsFilters())
+
+    async def should_kill_query_when_its_caller_is_cancelled(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        started = asyncio.Event()
+
+        async def query(*args, **kwargs):
+            started.set()
+            await asyncio.sleep(60)
+
+        mock_client.query.side_effect = query
+        fetching = asyncio.create_task(news_repository.fetch(limit=1, offset=0))
+        await started.wait()
+        fetching.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await fetching
+        query_id = mock_client.query.call_args.kwargs["settings"]["query_id"]
+        mock_client.kill.assert_called_once_with(query_id)
+        assert REGISTRY.get_sample_value(
+            "clickhouse_queries_total", {"query": "fetch", "status": "cancelled"}
+        )
+
+    async def should_fetch_news_rows_without_validation(
+        self,
+        news_repository: NewsRepository,
+        mock_client: AsyncMock,
+        fake_news: News,
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [
+            fake_news.model_dump()
+        ]
+        result = await news_repository.fetch(limit=1, offset=0, validate=False)
+
+        assert result == [fake_news.model_dump()]
+        assert f"Select {', '.join(News.model_fields)} from news FINAL" in (
+            mock_client.query.call_args.args[0]
+        )
+
+    async def should_fetch_news_after_cursor(
+        self,
+        news_repository: NewsRepository,
+        mock_client: AsyncMock,
+        fake_news: News,
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [
+            fake_news.model_dump()
+        ]
+        cursor = NewsCursor(publish_date=datetime(2025, 3, 1), id="abc")
+        await news_repository.fetch(
+            limit=10, offset=50, filters=NewsFilters(country=["US"]), cursor=cursor
+        )
+
+        query: str = mock_client.query.call_args.args[0]
+        parameters = mock_client.query.call_args.kwargs["parameters"]
+        assert f"country IN {{country:Array(String)}} AND {cursor.seek_condition()}" in query
+        assert query.endswith(
+            "order by publish_date desc, id desc limit {limit:UInt32} offset {offset:UInt64}"
+        )
+        assert parameters == {
+            "country": ["US"],
+            "cursor_id": "abc",
+            "cursor_publish_date": "2025-03-01 00:00:00",
+            "limit": 10,
+            "offset": 0,
+        }
+
+    async def should_fetch_projected_news_fields(
+        self,
+        news_repository: NewsRepository,
+        mock_client: AsyncMock,
+        fake_news: News,
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [
+            fake_news.model_dump(include={"id", "publish_date", "title"})
+        ]
+        result = await news_repository.fetch(limit=1, offset=0, fields=["title"])
+
+        query: str = mock_client.query.call_args.args[0]
+        assert query.startswith("Select id, publish_date, title from news")
+        assert result[0]["title"] == fake_news.title
+
+    async def should_get_news_by_id(
+        self,
+        news_repository: NewsRepository,
+        mock_client: AsyncMock,
+        fake_news: News,
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [
+            fake_news.model_dump()
+        ]
+        result = await news_repository.get(fake_news.id)
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "WHERE id IN {id:Array(String)}" in query
+        assert mock_client.query.call_args.kwargs["parameters"] == {
+            "id": [fake_news.id]
+        }
+        assert result == fake_news
+
+    async def should_return_none_for_missing_news(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        assert await news_repository.get("missing") is None
+
+    async def should_export_news_as_stream(
+        self,
+        news_repository: NewsRepository,
+        mock_client: AsyncMock,
+        news_filters: MagicMock,
+    ) -> None:
+        content = b'{"id": "1"}\n' * 50_000
+        mock_client.raw_stream.return_value.__aenter__.return_value = io.BytesIO(
+            content
+        )
+        news_filters.apply_filters.return_value = ("fake query", {})
+        chunks = await news_repository.export("ndjson", filters=news_filters)
+
+        exported = [chunk async for chunk in chunks]
+        settings = mock_client.raw_stream.call_args.kwargs["settings"]
+        assert settings["do_not_merge_across_partitions_select_final"] == 1
+        assert settings["query_id"]
+        assert mock_client.raw_stream.call_args.kwargs["fmt"] == "JSONEachRow"
+        assert len(exported) > 1
+        assert b"".join(exported) == content
+        mock_client.raw_stream.return_value.__aexit__.assert_awaited_once()
+        mock_client.kill.assert_not_called()
+
+    async def should_kill_export_query_when_its_reader_gives_up(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.raw_stream.return_value.__aenter__.return_value = io.BytesIO(
+            b'{"id": "1"}\n' * 50_000
+        )
+        chunks = await news_repository.export("ndjson")
+        await anext(chunks)
+        await chunks.aclose()
+
+        settings = mock_client.raw_stream.call_args.kwargs["settings"]
+        mock_client.kill.assert_called_once_with(settings["query_id"])
+        mock_client.raw_stream.return_value.__aexit__.assert_awaited_once()
+
     async def should_fetch_news_count(
         self,
         news_repository: NewsRepository,
@@ -93,13 +326,149 @@ class TestNewsRepository:
     ) -> None:
         mock_client.query.return_value.named_results = MagicMock()
         mock_client.query.return_value.named_results.return_value = [{"count": 10}]
-        news_filters.apply_filters.return_value = "fake query"
+        news_filters.apply_filters.return_value = ("fake query", {})
         result: CountResponse = await news_repository.fetch_count(filters=news_filters)
 
         news_filters.apply_filters.assert_called_once()
         assert isinstance(result, CountResponse)
         assert result.count == 10
 
+    async def should_approximate_unfiltered_count_from_parts(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [{"count": 10}]
+        result = await news_repository.fetch_count(NewsFilters(), approximate=True)
+
+        assert "system.parts" in mock_client.query.call_args.args[0]
+        assert result == CountResponse(count=10, exact=False)
+
+    async def should_approximate_rollup_filters_count_from_rollup(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [{"count": 10}]
+        result = await news_repository.fetch_count(
+            NewsFilters(country=["US"]), approximate=True
+        )
+
+        assert "from news_sentiment_daily" in mock_client.query.call_args.args[0]
+        assert result == CountResponse(count=10, exact=True)
+
+    async def should_estimate_other_filters_count_from_sample(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [
+            {"sampled": 100, "count": 1000.0}
+        ]
+        result = await news_repository.fetch_count(
+            NewsFilters(search="election", search_fields=["title"]), approximate=True
+        )
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "news SAMPLE 0.1" in query
+        assert "uniqExact(id) as sampled" in query and "is_deleted = 0" in query
+        assert result.count == 1000
+        assert not result.exact
+        # 1.96 * sqrt(100 * 0.9) / 0.1
+        assert result.error == 186
+
+    async def should_fetch_one_news_per_cluster_when_collapsed(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        await news_repository.fetch(10, 0, NewsFilters(), collapse=True)
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "order by publish_date desc, id desc limit 1 by cluster_id" in query
+
+    async def should_count_clusters_when_collapsed(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [{"count": 4}]
+        exact = await news_repository.fetch_count(NewsFilters(), collapse=True)
+        exact_query: str = mock_client.query.call_args.args[0]
+        approximate = await news_repository.fetch_count(
+            NewsFilters(), approximate=True, collapse=True
+        )
+
+        assert "uniqExact(cluster_id)" in exact_query
+        # Tombstones and replaced rows not merged yet are not counted
+        assert "from news FINAL" in exact_query
+        assert "uniq(cluster_id)" in mock_client.query.call_args.args[0]
+        assert exact == CountResponse(count=4)
+        assert approximate == CountResponse(count=4, exact=False)
+
+    async def should_fetch_distinct_image_urls_of_newest_news(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.result_rows = [
+            ("https://a.com/1.png", "https://a.com/1.png", None),
+            ("https://a.com/2.png", "", "https://a.com/favicon.ico"),
+        ]
+        result = await news_repository.image_urls(datetime(2024, 1, 1), 10)
+
+        assert result == [
+            "https://a.com/1.png",
+            "https://a.com/2.png",
+            "https://a.com/favicon.ico",
+        ]
+        assert mock_client.query.call_args.kwargs["parameters"] == {
+            "since": datetime(2024, 1, 1),
+            "limit": 10,
+        }
+
+    async def should_page_recent_documents_oldest_first(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        since = datetime(2024, 1, 1)
+        first = MagicMock(result_rows=[(since,)])
+        full = MagicMock(
+            result_rows=[
+                ("a", "A", "text", 1, since),
+                ("b", "B", "text", 2, datetime(2024, 1, 2)),
+            ]
+        )
+        last = MagicMock(result_rows=[("c", "C", "text", 3, datetime(2024, 1, 3))])
+        mock_client.query.side_effect = [first, full, last]
+        pages = [
+            page
+            async for page in news_repository.recent_documents(10, 100, page_rows=2)
+        ]
+
+        assert pages == [
+            [("a", "A", "text", 1), ("b", "B", "text", 2)],
+            [("c", "C", "text", 3)],
+        ]
+        calls = mock_client.query.call_args_list
+        assert calls[0].kwargs["parameters"] == {"limit": 10}
+        assert calls[2].kwargs["parameters"] == {
+            "chars": 100,
+            "since": since,
+            "page_rows": 2,
+            "after": datetime(2024, 1, 2),
+            "after_id": "b",
+        }
+
+    async def should_fetch_latest_versions_by_id(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.result_rows = [
+            ("a", 2, 0, "US", "en", "positive", datetime(2024, 1, 2))
+        ]
+        result = await news_repository.versions(["a", "b"])
+
+        assert result == {"a": (2, 0, "US", "en", "positive", datetime(2024, 1, 2))}
+        query: str = mock_client.query.call_args.args[0]
+        assert "news_versions" in query.split("WHERE")[0]
+        # Any publish_date, a re-sent news may have another one
+        assert "publish_date" not in query.split("WHERE")[1]
+        assert "LIMIT" in query and "1 BY id" in query
+        assert mock_client.query.call_args.kwargs["parameters"] == {"ids": ["a", "b"]}
+
     async def should_fetch_news_distinct_field_values(
         self,
         news_repository: NewsRepository,
@@ -108,16 +477,65 @@ class TestNewsRepository:
     ) -> None:
         mock_client.query.return_value.named_results = MagicMock()
         mock_client.query.return_value.named_results.return_value = [
-            {"country": "US"},
-            {"country": "UK"},
+            {"facet": "country", "value": "US", "count": 5},
+            {"facet": "country", "value": "UK", "count": 3},
         ]
-        news_filters.apply_filters.return_value = "fake query"
+        news_filters.apply_filters.return_value = ("fake query", {})
         result: list[str] = await news_repository.distinct(
             "country", filters=news_filters
         )
         news_filters.apply_filters.assert_called_once()
         assert result == ["US", "UK"]
 
+    async def should_fetch_facets_in_one_scan(
+        self,
+        news_repository: NewsRepository,
+        mock_client: AsyncMock,
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [
+            {"facet": "country", "value": "US", "count": 5},
+            {"facet": "tags", "value": "politics", "count": 2},
+        ]
+        result = await news_repository.facets(
+            ["country", "meta_site_name", "tags"],
+            NewsFilters(language=["en"]),
+            top_n=5,
+            prefix="Po",
+        )
+
+        mock_client.query.assert_awaited_once()
+        query: str = mock_client.query.call_args.args[0]
+        assert "[('country', toString(country))]" in query
+        assert "if(isNull(meta_site_name), []" in query
+        assert "arrayMap(value -> ('tags', value), tags)" in query
+        assert "LIMIT {top_n:UInt32} BY facet" in query
+        assert "news FINAL" in query
+        settings = mock_client.query.call_args.kwargs["settings"]
+        assert settings["do_not_merge_across_partitions_select_final"] == 1
+        assert mock_client.query.call_args.kwargs["parameters"] == {
+            "language": ["en"],
+            "prefix": "po",
+            "top_n": 5,
+        }
+        assert result == {
+            "country": [FacetValue(value="US", count=5)],
+            "meta_site_name": [],
+            "tags": [FacetValue(value="politics", count=2)],
+        }
+
+    async def should_not_query_facets_without_fields(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        assert await news_repository.facets([], NewsFilters(language=["en"])) == {}
+        mock_client.query.assert_not_awaited()
+
+    async def should_reject_distinct_unknown_field(
+        self, news_repository: NewsRepository
+    ) -> None:
+        with pytest.raises(ValueError):
+            await news_repository.distinct("country; DROP TABLE news")
+
     async def should_fetch_news_sentiments_count(
         self, news_repository: NewsRepository, mock_client: AsyncMock
     ) -> None:
@@ -179,3 +597,139 @@ class TestNewsRepository:
         assert isinstance(result[0], SentimentByCountry)
         assert result[0].country == "US"
         assert result[0].all == 29
+
+    async def should_read_aggregates_from_rollup(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        await news_repository.sentiments_count_by_country(
+            NewsFilters(country=["US"], sentiment=["positive"])
+        )
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "FROM\n                    news_sentiment_daily" in query
+        assert (
+            "country IN {country:Array(String)} AND sentiment IN {sentiment:Array(String)}"
+            in query
+        )
+
+    async def should_fall_back_to_news_for_filters_outside_rollup(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        await news_repository.sentiments_count_by_date(
+            datetime(2025, 1, 1),
+            datetime(2025, 2, 1),
+            NewsFilters(search="election", search_fields=["title"]),
+        )
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "news_sentiment_daily" not in query
+        assert "news n FINAL" in query
+        assert "DATE(publish_date) >= {from_date:Date}" in query
+        assert (
+            mock_client.query.call_args.kwargs["parameters"]["from_date"]
+            == "2025-01-01"
+        )
+
+    async def should_count_clusters_from_news_when_collapsed(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        await news_repository.sentiments_count_by_country(
+            NewsFilters(country=["US"]), collapse=True
+        )
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "news_sentiment_daily" not in query
+        assert "uniqExactIf(cluster_id, sentiment = 'positive') AS positive" in query
+
+    async def should_fetch_filled_sentiment_series_from_rollup(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [
+            {
+                "bucket": datetime(2025, 1, 6),
+                "positive": 1,
+                "negative": 0,
+                "neutral": 0,
+                "very_negative": 0,
+                "very_positive": 0,
+                "all": 1,
+            }
+        ]
+        result = await news_repository.sentiments_series(
+            "week",
+            datetime(2025, 1, 1),
+            datetime(2025, 2, 1),
+            NewsFilters(country=["US"]),
+        )
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "toStartOfInterval(day, INTERVAL 1 WEEK)" in query
+        assert "news_sentiment_daily" in query
+        assert "WITH FILL" in query
+        assert result[0].bucket == datetime(2025, 1, 6)
+
+    async def should_fetch_hourly_sentiment_series_from_news(
+        self, news_repository: NewsRepository, mock_client: AsyncMock
+    ) -> None:
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        await news_repository.sentiments_series(
+            "hour", datetime(2025, 1, 1), datetime(2025, 1, 2)
+        )
+
+        query: str = mock_client.query.call_args.args[0]
+        assert "news_sentiment_daily" not in query
+        assert "toStartOfInterval(publish_date, INTERVAL 1 HOUR)" in query
+        assert mock_client.query.call_args.kwargs["parameters"] == {
+            "from_time": "2025-01-01 00:00:00",
+            "to_time": "2025-01-02 00:00:00",
+        }
+
+    async def should_serve_repeated_aggregates_from_cache(
+        self, mock_client: AsyncMock
+    ) -> None:
+        cache = QueryCache(ttl=60, max_size=10, version_check_interval=60)
+        news_repository = NewsRepository(client=mock_client, cache=cache)
+        mock_client.query.return_value.result_rows = [(1, 10)]
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = [{"count": 10}]
+
+        await news_repository.fetch_count(NewsFilters(country=["US", "UK"]))
+        result = await news_repository.fetch_count(
+            NewsFilters(country=["UK", "US", "UK"])
+        )
+
+        # one data version probe and one count query
+        assert mock_client.query.await_count == 2
+        assert result.count == 10
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    async def should_serve_ranges_ending_now_from_cache_until_the_bucket_changes(
+        self, mock_client: AsyncMock
+    ) -> None:
+        cache = QueryCache(ttl=60, max_size=10, version_check_interval=60)
+        news_repository = NewsRepository(client=mock_client, cache=cache)
+        mock_client.query.return_value.result_rows = [(1, 10)]
+        mock_client.query.return_value.named_results = MagicMock()
+        mock_client.query.return_value.named_results.return_value = []
+        start = datetime(2025, 1, 1, 8, 30)
+
+        for minutes in (0, 10, 20):
+            now = datetime(2025, 1, 2, 9, minutes, 5)
+            await news_repository.sentiments_count_by_date(start, now)
+            await news_repository.sentiments_series("hour", start, now)
+        await news_repository.sentiments_series("hour", start, now.replace(hour=10))
+
+        # One data version probe, two queries and the one of the next hour
+        assert mock_client.query.await_count == 4
+        assert mock_client.query.call_args.kwargs["parameters"] == {
+            "from_time": "2025-01-01 08:00:00",
+            "to_time": "2025-01-02 10:00:00",
+        }
@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.core.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    Budget,
+    Limiter,
+    Overloaded,
+    budget_error,
+    query_settings,
+)
+
+
+@pytest.fixture
+def controller() -> AdmissionController:
+    return AdmissionController(
+        budgets={
+            "read": Budget(
+                max_concurrency=1,
+                max_queue=1,
+                settings={"max_execution_time": 10},
+            ),
+            "search": Budget(max_concurrency=2, max_queue=0),
+        },
+        max_concurrency=2,
+        max_queue=0,
+        timeout=0.05,
+        retry_after=3,
+    )
+
+
+@pytest.fixture
+def app(controller: AdmissionController) -> FastAPI:
+    app = FastAPI()
+    release = asyncio.Event()
+    app.state.release = release
+
+    @app.get("/news")
+    async def news():
+        await release.wait()
+        return query_settings()
+
+    @app.get("/proxy")
+    async def proxy():
+        return {}
+
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return app
+
+
+@pytest.fixture
+async def client(app: FastAPI):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def should_reject_at_once_when_queue_is_full():
+    limiter = Limiter(max_concurrency=1, max_queue=0, timeout=1, status_code=429)
+
+    async with limiter.acquire():
+        with pytest.raises(Overloaded) as raised:
+            async with limiter.acquire():
+                pass
+
+    assert raised.value.status_code == 429
+    assert (limiter.stats().admitted, limiter.stats().rejected) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def should_admit_queued_caller_once_slot_is_free():
+    limiter = Limiter(max_concurrency=1, max_queue=1, timeout=1, status_code=429)
+    entered = []
+
+    async def hold():
+        async with limiter.acquire():
+            entered.append(len(entered))
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(hold(), hold())
+
+    assert entered == [0, 1]
+    assert limiter.stats().in_flight == limiter.stats().waiting == 0
+
+
+@pytest.mark.asyncio
+async def should_answer_503_when_queued_caller_times_out():
+    limiter = Limiter(max_concurrency=1, max_queue=1, timeout=0.01, status_code=429)
+
+    async with limiter.acquire():
+        with pytest.raises(Overloaded) as raised:
+            async with limiter.acquire():
+                pass
+
+    assert raised.value.status_code == 503
+    assert limiter.stats().timeouts == 1
+
+
+def should_classify_search_requests_apart(controller: AdmissionController):
+    assert controller.classify("/news", b"country=US") == "read"
+    assert controller.classify("/news", b"search=election") == "search"
+    assert controller.classify("/news", b"search=") == "read"
+    # No budget for the class in this controller
+    assert controller.classify("/news/distinct", b"") is None
+    assert controller.classify("/proxy", b"") is None
+
+
+def should_recognize_budget_errors():
+    exceeded = budget_error(
+        Exception("HTTPDriver received ClickHouse error code 159\n Code: 159. Timeout")
+    )
+
+    assert "execution time exceeded" in str(exceeded)
+    # Raised with group_by_overflow_mode throw of the aggregate budgets
+    grouped = budget_error(
+        Exception("received ClickHouse error code 158\n Limit for rows to GROUP BY")
+    )
+    assert "too many rows read or grouped" in str(grouped)
+    assert budget_error(Exception("received ClickHouse error code 62")) is None
+
+
+@pytest.mark.asyncio
+async def should_give_queries_the_settings_of_the_request_budget(
+    app: FastAPI, client: AsyncClient
+):
+    app.state.release.set()
+    response = await client.get("/news")
+
+    assert response.json() == {"max_execution_time": 10}
+    assert query_settings() == {}
+
+
+@pytest.mark.asyncio
+async def should_turn_away_requests_past_the_route_queue(
+    app: FastAPI, client: AsyncClient, controller: AdmissionController
+):
+    first = asyncio.create_task(client.get("/news"))
+    second = asyncio.create_task(client.get("/news"))
+    while controller.stats().classes["read"].waiting < 1:
+        await asyncio.sleep(0)
+
+    third = await client.get("/news")
+    # Other routes are not held back
+    proxied = await client.get("/proxy")
+    app.state.release.set()
+
+    assert third.status_code == 429
+    assert third.headers["Retry-After"] == "3"
+    assert proxied.status_code == 200
+    assert [(await request).status_code for request in (first, second)] == [200, 200]
+
+
+@pytest.mark.asyncio
+async def should_answer_503_once_every_slot_is_taken(
+    app: FastAPI, client: AsyncClient, controller: AdmissionController
+):
+    held = [
+        asyncio.create_task(client.get("/news?search=a")),
+        asyncio.create_task(client.get("/news?search=b")),
+    ]
+    while controller.stats().in_flight < 2:
+        await asyncio.sleep(0)
+
+    response = await client.get("/news")
+    app.state.release.set()
+    await asyncio.gather(*held)
+
+    assert response.status_code == 503
+    assert controller.stats().rejected == 1
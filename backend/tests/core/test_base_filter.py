@@ -1,4 +1,8 @@
-from app.core.schemas.filters import BaseFilters
+import pytest
+from pydantic import ValidationError
+
+from app.core.schemas.filters import BaseFilters, where_template
+from app.core.schemas.filters.search import TOKEN_START
 
 
 def should_default_values():
@@ -11,43 +15,127 @@ def should_default_values():
 
 def should_sanitize_string():
     assert BaseFilters.sanitize(" test ") == "test"
-    assert BaseFilters.sanitize("O'Reilly") == "O''Reilly"
+    assert BaseFilters.sanitize("O'Reilly") == "O'Reilly"
 
 
 def should_sanitize_list():
     assert BaseFilters.sanitize([" test1 ", " test2 "]) == ["test1", "test2"]
-    assert BaseFilters.sanitize(["O'Reilly"]) == ["O''Reilly"]
+    assert BaseFilters.sanitize(["O'Reilly"]) == ["O'Reilly"]
+
+
+def should_reject_invalid_field_names():
+    with pytest.raises(ValidationError):
+        BaseFilters(search="x", search_fields=["title) OR (1=1"])
+    with pytest.raises(ValidationError):
+        BaseFilters(not_in_fields=["id; DROP TABLE news"])
 
 
 def should_build_where_clause_with_id():
     filters = BaseFilters(id=["123", "456"])
-    assert filters.build_where_clause() == "id IN ('123', '456')"
+    assert filters.build_where_clause() == (
+        "id IN {id:Array(String)}",
+        {"id": ["123", "456"]},
+    )
 
 
 def should_build_where_clause_with_not_in_fields():
     filters = BaseFilters(id=["123", "456"], not_in_fields=["id"])
-    assert filters.build_where_clause() == "id NOT IN ('123', '456')"
+    assert filters.build_where_clause() == (
+        "id NOT IN {id:Array(String)}",
+        {"id": ["123", "456"]},
+    )
 
 
 def should_build_where_clause_with_multiple_fields():
     filters = BaseFilters(id=["123"], search_fields=["name"], search="John Doe")
-    assert "id IN ('123')" in filters.build_where_clause()
+    where, parameters = filters.build_where_clause()
+    assert "id IN {id:Array(String)}" in where
+    assert parameters == {
+        "id": ["123"],
+        "search_term_0": "john",
+        "search_prefix_like": "%doe%",
+        "search_prefix": TOKEN_START + "doe",
+    }
+
+
+def should_bind_quotes_as_values():
+    filters = BaseFilters(id=["' OR 1=1 --", "\\' OR 1=1 --"])
+    where, parameters = filters.build_where_clause()
+    assert where == "id IN {id:Array(String)}"
+    assert parameters == {"id": ["' OR 1=1 --", "\\' OR 1=1 --"]}
+
+
+def should_share_template_between_values_of_same_shape():
+    where_template.cache_clear()
+    BaseFilters(id=["1"], search="a b", search_fields=["name"]).build_where_clause()
+    where, _ = BaseFilters(
+        id=["2", "3"], search="c d", search_fields=["name"]
+    ).build_where_clause()
+    assert where_template.cache_info().hits == 1
+    assert where == (
+        "((hasToken(lowerUTF8(name), {search_term_0:String})"
+        " AND lowerUTF8(name) LIKE {search_prefix_like:String}"
+        " AND match(lowerUTF8(name), {search_prefix:String})))"
+        " AND id IN {id:Array(String)}"
+    )
 
 
 def should_build_search_filter():
-    filters = BaseFilters(search="John Doe", search_fields=["name", "email"])
-    expected = "((name ILIKE '%John%' AND name ILIKE '%Doe%') OR (email ILIKE '%John%' AND email ILIKE '%Doe%'))"
+    filters = BaseFilters(search='John "Doe"', search_fields=["name", "email"])
+    expected = (
+        "((hasToken(lowerUTF8(name), {search_term_0:String}) AND hasToken(lowerUTF8(name), {search_term_1:String}))"
+        " OR (hasToken(lowerUTF8(email), {search_term_0:String}) AND hasToken(lowerUTF8(email), {search_term_1:String})))"
+    )
     assert filters.build_search_filter() == expected
 
 
+def should_skip_search_filter_without_terms():
+    filters = BaseFilters(search=" '%! ", search_fields=["name"])
+    assert filters.build_search_filter() is None
+
+
+def should_build_relevance():
+    filters = BaseFilters(search="John Doe", search_fields=["name", "email"])
+    expected = (
+        "2 * (hasToken(lowerUTF8(name), {search_term_0:String}) + match(lowerUTF8(name), {search_prefix:String}))"
+        " + 1 * (hasToken(lowerUTF8(email), {search_term_0:String}) + match(lowerUTF8(email), {search_prefix:String}))"
+    )
+    assert filters.build_relevance() == expected
+
+
 def should_apply_filters_without_conditions():
     filters = BaseFilters()
     query = "SELECT * FROM users"
-    assert filters.apply_filters(query) == "SELECT * FROM users"
+    assert filters.apply_filters(query) == ("SELECT * FROM users", {})
 
 
 def should_apply_filters_with_conditions():
-    filters = BaseFilters(id=["123"], search="John", search_fields=["name"])
+    filters = BaseFilters(id=["123"], search="John.", search_fields=["name"])
+    query = "SELECT * FROM users"
+    expected = (
+        "SELECT * FROM users WHERE ((hasToken(lowerUTF8(name), {search_term_0:String})))"
+        " AND id IN {id:Array(String)}"
+    )
+    assert filters.apply_filters(query) == (
+        expected,
+        {"id": ["123"], "search_term_0": "john"},
+    )
+
+
+def should_apply_filters_with_extra_conditions():
+    filters = BaseFilters(id=["123"])
+    query = "SELECT * FROM users"
+    expected = "SELECT * FROM users WHERE id IN {id:Array(String)} AND age > {age:UInt8}"
+    assert filters.apply_filters(query, ["age > {age:UInt8}"], {"age": 18}) == (
+        expected,
+        {"id": ["123"], "age": 18},
+    )
+
+
+def should_apply_extra_conditions_without_filters():
+    filters = BaseFilters()
     query = "SELECT * FROM users"
-    expected = "SELECT * FROM users WHERE ((name ILIKE '%John%')) AND id IN ('123')"
-    assert filters.apply_filters(query) == expected
+    assert filters.apply_filters(query, ["age > 18"]) == (
+        query + " WHERE age > 18",
+        {},
+    )
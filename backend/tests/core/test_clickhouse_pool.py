@@ -0,0 +1,136 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from clickhouse_connect.driver.exceptions import OperationalError
+
+from app.core.database import ClickHousePool, ClickHouseUnavailable
+
+
+@pytest.fixture
+def pool() -> ClickHousePool:
+    return ClickHousePool(
+        dsn="clickhouse://localhost",
+        max_concurrency=2,
+        health_check_interval=60,
+        max_backoff=1,
+    )
+
+
+@pytest.fixture
+def get_async_client():
+    with patch(
+        "app.core.database.pool.get_async_client", new_callable=AsyncMock
+    ) as mock:
+        yield mock
+
+
+@pytest.mark.asyncio
+async def should_connect_once_for_every_query(pool, get_async_client):
+    await pool.start()
+    await pool.query("select 1")
+    await pool.query("select 2")
+    await pool.close()
+
+    get_async_client.assert_awaited_once()
+    assert get_async_client.return_value.query.await_count == 2
+    assert pool.stats().queries == 2
+
+
+@pytest.mark.asyncio
+async def should_bound_concurrent_queries(pool, get_async_client):
+    release = asyncio.Event()
+    running = 0
+    max_running = 0
+
+    async def query(*args, **kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await release.wait()
+        running -= 1
+
+    get_async_client.return_value.query.side_effect = query
+    await pool.start()
+    tasks = [asyncio.create_task(pool.query("select 1")) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert (pool.in_flight, pool.waiting) == (2, 3)
+    release.set()
+    await asyncio.gather(*tasks)
+    await pool.close()
+
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def should_reject_queries_while_disconnected(pool, get_async_client):
+    get_async_client.side_effect = OperationalError("connection refused")
+    await pool.start()
+
+    with pytest.raises(ClickHouseUnavailable):
+        await pool.query("select 1")
+    assert not pool.stats().healthy
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def should_reconnect_after_failed_query(pool, get_async_client):
+    await pool.start()
+    get_async_client.return_value.query.side_effect = OperationalError("reset")
+    get_async_client.return_value.ping.return_value = False
+
+    with pytest.raises(OperationalError):
+        await pool.query("select 1")
+    for _ in range(10):
+        await asyncio.sleep(0)
+    stats = pool.stats()
+    await pool.close()
+
+    assert stats.errors == 1
+    assert stats.reconnects == 1
+    assert stats.healthy
+
+
+@pytest.mark.asyncio
+async def should_kill_queries_through_control_client_while_slots_are_taken(
+    pool, get_async_client
+):
+    release = asyncio.Event()
+
+    async def query(*args, **kwargs):
+        await release.wait()
+
+    client, control = AsyncMock(), AsyncMock()
+    client.query.side_effect = query
+    get_async_client.side_effect = [client, control]
+    await pool.start()
+    running = [asyncio.create_task(pool.query("select 1")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    pool.kill("request-1")
+    while not pool.stats().killed:
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*running)
+    await pool.close()
+
+    (kill,) = control.command.await_args.args
+    assert kill.startswith("KILL QUERY")
+    assert control.command.await_args.kwargs["parameters"] == {"query_id": "request-1"}
+    control.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def should_hold_slot_until_stream_is_closed(pool, get_async_client):
+    stream = MagicMock()
+    get_async_client.return_value.raw_stream.return_value = stream
+    await pool.start()
+
+    async with pool.raw_stream("select 1", fmt="JSONEachRow") as opened:
+        assert opened is stream
+        assert pool.stats().in_flight == 1
+        stream.close.assert_not_called()
+    await pool.close()
+
+    stream.close.assert_called_once()
+    assert pool.stats().in_flight == 0
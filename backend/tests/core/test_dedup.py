@@ -0,0 +1,154 @@
+import os
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.core.dedup import (
+    EMPTY,
+    NUM_HASHES,
+    NearDuplicateIndex,
+    own_cluster,
+    signatures,
+)
+
+WORDS = [f"word{i}" for i in range(5000)]
+
+
+def story(seed: int, length: int = 150) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def copy_of(text: str, seed: int, edits: int = 3) -> str:
+    """Text with a few words replaced, like a wire story re-published"""
+    rng = random.Random(seed)
+    words = text.split()
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+@pytest.fixture
+def index(tmp_path: Path) -> NearDuplicateIndex:
+    return NearDuplicateIndex(str(tmp_path / "index.npz"), capacity=100, chars=1000)
+
+
+def should_give_identical_documents_identical_signatures():
+    first, second, other = signatures(
+        [b"the quick brown fox jumps", b"the quick brown fox jumps", b"a b c d e"]
+    )
+
+    assert (first == second).all()
+    assert (first != other).any()
+    assert first.shape == (NUM_HASHES,) and (first != EMPTY).all()
+
+
+def should_cluster_near_duplicates_together(index: NearDuplicateIndex):
+    text = story(1)
+    clusters = index.cluster(
+        ["a", "b", "c"],
+        ["Storm hits the coast", "Storm hits the coast", "Markets rally"],
+        [text, copy_of(text, 2), story(3)],
+    )
+
+    assert clusters[0] == own_cluster("a")
+    assert clusters[1] == clusters[0]
+    assert clusters[2] == own_cluster("c")
+    assert index.stats().clustered == 1
+
+
+def should_cluster_copies_across_batches(index: NearDuplicateIndex):
+    text = story(1)
+    [first] = index.cluster(["a"], ["title"], [text])
+    [second] = index.cluster(["b"], ["title"], [copy_of(text, 2)])
+
+    assert second == first
+
+
+def should_give_documents_shorter_than_a_shingle_their_own_cluster(
+    index: NearDuplicateIndex,
+):
+    clusters = index.cluster(["a", "b"], ["Breaking", "Breaking"], ["", ""])
+
+    assert clusters == [own_cluster("a"), own_cluster("b")]
+    assert len(index) == 0
+
+
+def should_forget_articles_beyond_capacity(index: NearDuplicateIndex):
+    text = story(1)
+    index.cluster(["a"], ["title"], [text])
+    index.cluster(
+        [f"other{i}" for i in range(100)],
+        ["title"] * 100,
+        [story(i + 10) for i in range(100)],
+    )
+    [copy] = index.cluster(["b"], ["title"], [copy_of(text, 2)])
+
+    assert copy == own_cluster("b")
+    assert len(index) == 100
+
+
+def should_restore_saved_index(index: NearDuplicateIndex):
+    text = story(1)
+    [first] = index.cluster(["a"], ["title"], [text])
+    index.save()
+
+    restored = NearDuplicateIndex(index.path, capacity=100, chars=1000)
+    restored.load()
+    [copy] = restored.cluster(["b"], ["title"], [copy_of(text, 2)])
+
+    assert copy == first
+    assert restored.stats().articles == 2
+    assert index.stats().last_snapshot is not None
+
+
+def should_ignore_snapshot_of_other_settings(index: NearDuplicateIndex):
+    index.cluster(["a"], ["title"], [story(1)])
+    index.save()
+
+    other = NearDuplicateIndex(index.path, capacity=50, chars=1000)
+    other.load()
+
+    assert len(other) == 0
+    assert np.count_nonzero(other._clusters) == 0
+
+
+def should_ignore_stale_snapshot(index: NearDuplicateIndex):
+    index.cluster(["a"], ["title"], [story(1)])
+    index.save()
+    os.utime(index.path, (time.time() - 120,) * 2)
+
+    restored = NearDuplicateIndex(index.path, capacity=100, chars=1000)
+
+    assert restored.load(max_age=60) is False
+    assert len(restored) == 0
+    assert restored.load(max_age=300) is True
+
+
+def should_index_stored_articles_in_their_clusters(index: NearDuplicateIndex):
+    text = story(1)
+    index.cluster(["a"], ["title"], [text], clusters=[42])
+    [copy] = index.cluster(["b"], ["title"], [copy_of(text, 2)])
+
+    assert copy == 42
+    # Indexing stored articles is not clustering new ones
+    assert index.stats().clustered == 1
+
+
+def should_hash_own_clusters_like_the_cluster_id_default():
+    # SELECT reinterpretAsUInt64(substring(MD5('abc'), 1, 8))
+    assert own_cluster("abc") == 12704604231530709392
+
+
+def should_read_control_characters_as_word_separators(index: NearDuplicateIndex):
+    text = story(1)
+    controlled = "\x00" + text.replace(" ", " \x00\x01\x7f", 20)
+    clusters = index.cluster(
+        ["a", "b", "c"], ["title", "title", "title"], [story(2), controlled, text]
+    )
+
+    # A NUL is not taken for the end of a document
+    assert clusters == [own_cluster("a"), own_cluster("b"), own_cluster("b")]
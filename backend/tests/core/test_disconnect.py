@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.disconnect import DisconnectMiddleware
+from app.core.metrics import MetricsMiddleware
+
+
+class Client:
+    """ASGI receive and send of a client that can hang up at any time"""
+
+    def __init__(self, body: bytes = b""):
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.messages.put_nowait(
+            {"type": "http.request", "body": body, "more_body": False}
+        )
+        self.sent: list[dict] = []
+
+    async def receive(self) -> dict:
+        return await self.messages.get()
+
+    async def send(self, message: dict):
+        self.sent.append(message)
+
+    def disconnect(self):
+        self.messages.put_nowait({"type": "http.disconnect"})
+
+
+async def respond(send, body: bytes = b"ok"):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+@pytest.mark.asyncio
+async def should_cancel_request_once_client_disconnects():
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def app(scope, receive, send):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    client = Client()
+    scope = {"type": "http"}
+    handling = asyncio.create_task(
+        DisconnectMiddleware(app)(scope, client.receive, client.send)
+    )
+    await started.wait()
+    client.disconnect()
+    await asyncio.wait_for(handling, 1)
+
+    assert cancelled.is_set()
+    assert scope["disconnected"]
+    assert client.sent == []
+
+
+@pytest.mark.asyncio
+async def should_pass_request_body_to_the_application():
+    async def app(scope, receive, send):
+        message = await receive()
+        await respond(send, message["body"])
+
+    client = Client(b"payload")
+    await DisconnectMiddleware(app)({"type": "http"}, client.receive, client.send)
+
+    assert client.sent[-1]["body"] == b"payload"
+
+
+@pytest.mark.asyncio
+async def should_let_work_after_the_response_finish():
+    finished = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await respond(send)
+        # Servers report a disconnect once the response is sent
+        client.disconnect()
+        await asyncio.sleep(0.01)
+        finished.set()
+
+    client = Client()
+    scope = {"type": "http"}
+    await DisconnectMiddleware(app)(scope, client.receive, client.send)
+
+    assert finished.is_set()
+    assert "disconnected" not in scope
+
+
+@pytest.mark.asyncio
+async def should_count_requests_of_gone_clients_as_499():
+    started = asyncio.Event()
+
+    async def app(scope, receive, send):
+        started.set()
+        await asyncio.sleep(60)
+
+    labels = {"method": "GET", "route": "unmatched", "status": "499"}
+    before = REGISTRY.get_sample_value("http_requests_total", labels) or 0
+    client = Client()
+    handling = asyncio.create_task(
+        MetricsMiddleware(DisconnectMiddleware(app))(
+            {"type": "http", "method": "GET"}, client.receive, client.send
+        )
+    )
+    await started.wait()
+    client.disconnect()
+    await asyncio.wait_for(handling, 1)
+
+    assert REGISTRY.get_sample_value("http_requests_total", labels) == before + 1
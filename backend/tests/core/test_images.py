@@ -0,0 +1,48 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.core.images import transform
+
+
+def encode(image: Image.Image, format: str) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format)
+    return output.getvalue()
+
+
+@pytest.fixture
+def jpeg() -> bytes:
+    return encode(Image.new("RGB", (800, 400), "red"), "JPEG")
+
+
+def should_fit_width_keeping_aspect_ratio(jpeg: bytes):
+    body, content_type = transform(jpeg, width=200)
+    with Image.open(io.BytesIO(body)) as image:
+        assert (image.format, image.size) == ("JPEG", (200, 100))
+    assert content_type == "image/jpeg"
+
+
+def should_never_upscale(jpeg: bytes):
+    body, _ = transform(jpeg, width=1600, height=1600)
+    with Image.open(io.BytesIO(body)) as image:
+        assert image.size == (800, 400)
+
+
+@pytest.mark.parametrize(
+    "format, pillow_format, content_type",
+    [("webp", "WEBP", "image/webp"), ("avif", "AVIF", "image/avif")],
+)
+def should_transcode(jpeg: bytes, format, pillow_format, content_type):
+    body, actual_content_type = transform(jpeg, height=100, format=format)
+    with Image.open(io.BytesIO(body)) as image:
+        assert (image.format, image.size) == (pillow_format, (200, 100))
+    assert actual_content_type == content_type
+
+
+def should_flatten_transparency_for_jpeg():
+    png = encode(Image.new("RGBA", (10, 10)), "PNG")
+    body, _ = transform(png, format="jpeg")
+    with Image.open(io.BytesIO(body)) as image:
+        assert image.mode == "RGB"
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.schemas.news import NewsCursor
+
+
+def should_round_trip_cursor():
+    cursor = NewsCursor(publish_date=datetime(2025, 3, 1, 12, 30), id="abc")
+    assert NewsCursor.decode(cursor.encode()) == cursor
+
+
+def should_round_trip_cursor_without_publish_date():
+    cursor = NewsCursor(publish_date=None, id="abc")
+    assert NewsCursor.decode(cursor.encode()) == cursor
+
+
+def should_reject_invalid_cursor():
+    with pytest.raises(ValueError):
+        NewsCursor.decode("not-a-cursor")
+
+
+def should_build_seek_condition():
+    cursor = NewsCursor(publish_date=datetime(2025, 3, 1, 12, 30), id="abc")
+    assert cursor.seek_condition() == (
+        "((publish_date, id) < ({cursor_publish_date:DateTime}, {cursor_id:String})"
+        " OR publish_date IS NULL)"
+    )
+    assert cursor.parameters() == {
+        "cursor_id": "abc",
+        "cursor_publish_date": "2025-03-01 12:30:00",
+    }
+
+
+def should_build_seek_condition_within_null_publish_dates():
+    cursor = NewsCursor(publish_date=None, id="abc")
+    assert cursor.seek_condition() == (
+        "(publish_date IS NULL AND id < {cursor_id:String})"
+    )
+    assert cursor.parameters() == {"cursor_id": "abc"}
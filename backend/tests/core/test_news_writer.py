@@ -0,0 +1,291 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.database import ClickHousePool
+from app.core.database.writer import (
+    COLUMNS,
+    INSERT_COLUMNS,
+    TOMBSTONE,
+    BufferFull,
+    NewsWriter,
+)
+from app.core.dedup import NearDuplicateIndex, own_cluster
+from app.core.schemas.bulk import parse_ndjson
+from app.core.worker_lock import WorkerLock
+
+
+def row(id: str, title: str = "title", text: str = "") -> tuple:
+    values = dict(TOMBSTONE)
+    values.update(id=id, title=title, text=text, publish_date=datetime(2024, 1, 1))
+    return tuple(values[column] for column in COLUMNS)
+
+
+def inserted(pool: AsyncMock, call: int = 0) -> list[dict]:
+    data = pool.insert.await_args_list[call].args[1]
+    return [dict(zip(INSERT_COLUMNS, values)) for values in zip(*data)]
+
+
+@pytest.fixture
+def pool() -> AsyncMock:
+    return AsyncMock(spec=ClickHousePool)
+
+
+@pytest.fixture
+def writer(pool: AsyncMock) -> NewsWriter:
+    repository = AsyncMock()
+    repository.versions.return_value = {}
+    return NewsWriter(
+        pool=pool,
+        repository=repository,
+        batch_rows=3,
+        batch_bytes=1000,
+        flush_interval=60,
+        max_rows=4,
+        max_bytes=10_000,
+        wait_timeout=0.05,
+    )
+
+
+@pytest.mark.asyncio
+async def should_insert_buffered_rows_column_oriented(
+    writer: NewsWriter, pool: AsyncMock
+):
+    flushed = await writer.put([row("a"), row("b")], [10, 10])
+    await writer.flush()
+
+    assert await flushed == 2
+    args, kwargs = pool.insert.await_args
+    assert args[0] == "news" and kwargs["column_oriented"] is True
+    assert [news["id"] for news in inserted(pool)] == ["a", "b"]
+    assert kwargs["settings"]["insert_deduplication_token"]
+    stats = writer.stats()
+    assert (stats.buffered, stats.flushed, stats.flushes) == (0, 2, 1)
+
+
+@pytest.mark.asyncio
+async def should_keep_latest_version_of_buffered_row(
+    writer: NewsWriter, pool: AsyncMock
+):
+    await writer.put([row("a", "first")], [10])
+    await writer.put([row("a", "second")], [12])
+
+    assert writer.stats().buffered_bytes == 12
+    await writer.flush()
+
+    assert [news["title"] for news in inserted(pool)] == ["second"]
+    assert writer.stats().duplicates == 1
+
+
+@pytest.mark.asyncio
+async def should_replace_stored_news_with_a_tombstone_of_its_sorting_key(
+    writer: NewsWriter, pool: AsyncMock
+):
+    writer.repository.versions.return_value = {
+        "a": (2, 0, "US", "en", "negative", datetime(2023, 12, 31))
+    }
+    await writer.put([row("a"), row("b")], [10, 10])
+    await writer.flush()
+
+    news = inserted(pool)
+    assert [(n["id"], n["revision"], n["is_deleted"]) for n in news] == [
+        ("a", 4, 0),
+        ("b", 1, 0),
+        ("a", 3, 1),
+    ]
+    tombstone = news[-1]
+    assert (tombstone["country"], tombstone["sentiment"]) == ("US", "negative")
+    assert tombstone["publish_date"] == datetime(2023, 12, 31)
+    assert (tombstone["title"], tombstone["images"]) == ("", [])
+
+
+@pytest.mark.asyncio
+async def should_not_tombstone_deleted_news(writer: NewsWriter, pool: AsyncMock):
+    writer.repository.versions.return_value = {
+        "a": (3, 1, "US", "en", "negative", datetime(2023, 12, 31))
+    }
+    await writer.put([row("a")], [10])
+    await writer.flush()
+
+    assert [(n["revision"], n["is_deleted"]) for n in inserted(pool)] == [(4, 0)]
+
+
+@pytest.mark.asyncio
+async def should_insert_own_cluster_without_index(writer: NewsWriter, pool: AsyncMock):
+    await writer.put([row("a")], [10])
+    await writer.flush()
+
+    assert [news["cluster_id"] for news in inserted(pool)] == [own_cluster("a")]
+
+
+@pytest.mark.asyncio
+async def should_insert_near_duplicates_in_one_cluster(
+    writer: NewsWriter, pool: AsyncMock, tmp_path
+):
+    writer.index = NearDuplicateIndex(str(tmp_path / "index.npz"), 10, 1000)
+    text = " ".join(f"word{i}" for i in range(100))
+    copy = text.replace("word50", "other")
+    await writer.put([row("a", text=text), row("b", text=copy)], [10, 10])
+    await writer.close()
+
+    assert [news["cluster_id"] for news in inserted(pool)] == [own_cluster("a")] * 2
+    assert writer.stats().clustered == 1
+    # The index is saved on close
+    assert (tmp_path / "index.npz").exists()
+
+
+@pytest.mark.asyncio
+async def should_insert_own_clusters_when_clustering_fails(
+    writer: NewsWriter, pool: AsyncMock, tmp_path
+):
+    writer.index = NearDuplicateIndex(str(tmp_path / "index.npz"), 10, 1000)
+    writer.index.cluster = MagicMock(side_effect=IndexError("out of bounds"))
+    flushed = await writer.put([row("a"), row("b")], [10, 10])
+    await writer.flush()
+
+    assert await flushed == 2
+    assert [news["cluster_id"] for news in inserted(pool)] == [
+        own_cluster("a"),
+        own_cluster("b"),
+    ]
+
+
+@pytest.mark.asyncio
+async def should_rebuild_index_from_stored_news_without_snapshot(
+    writer: NewsWriter, pool: AsyncMock, tmp_path
+):
+    writer.index = NearDuplicateIndex(str(tmp_path / "index.npz"), 10, 1000)
+    text = " ".join(f"word{i}" for i in range(100))
+
+    async def recent_documents(limit, chars, page_rows):
+        yield [("a", "title", text[:chars], 42)]
+
+    writer.repository.recent_documents = recent_documents
+    writer.flush_interval = 0.01
+    writer.start()
+    try:
+        flushed = await writer.put([row("b", text=text.replace("word50", "x"))], [10])
+        await asyncio.wait_for(flushed, 1)
+    finally:
+        await writer.close()
+
+    assert [news["cluster_id"] for news in inserted(pool)] == [42]
+
+
+@pytest.mark.asyncio
+async def should_save_index_only_on_the_worker_holding_the_lock(
+    writer: NewsWriter, tmp_path
+):
+    writer.index = NearDuplicateIndex(str(tmp_path / "index.npz"), 10, 1000)
+    other = WorkerLock(str(tmp_path / "index.lock"))
+    assert other.acquire()
+    writer.lock = WorkerLock(other.path)
+    await writer.close()
+
+    assert not (tmp_path / "index.npz").exists()
+    other.release()
+    await writer.close()
+
+    assert (tmp_path / "index.npz").exists()
+    # Released on close for the next worker
+    assert not writer.lock.held
+
+
+@pytest.mark.asyncio
+async def should_flush_in_background_once_batch_is_full(
+    writer: NewsWriter, pool: AsyncMock
+):
+    writer.start()
+    try:
+        flushed = await writer.put([row("a"), row("b"), row("c")], [10, 10, 10])
+        await asyncio.wait_for(flushed, 1)
+    finally:
+        await writer.close()
+
+    assert pool.insert.await_count == 1
+
+
+@pytest.mark.asyncio
+async def should_flush_in_background_once_oldest_row_is_due(
+    writer: NewsWriter, pool: AsyncMock
+):
+    writer.flush_interval = 0.01
+    writer.start()
+    try:
+        flushed = await writer.put([row("a")], [10])
+        await asyncio.wait_for(flushed, 1)
+    finally:
+        await writer.close()
+
+    assert writer.stats().flushed == 1
+
+
+@pytest.mark.asyncio
+async def should_raise_buffer_full_when_no_flush_makes_room(writer: NewsWriter):
+    await writer.put([row("a"), row("b"), row("c")], [10, 10, 10])
+
+    with pytest.raises(BufferFull):
+        await writer.put([row("d"), row("e")], [10, 10])
+    assert writer.stats().buffered == 3
+
+
+@pytest.mark.asyncio
+async def should_retry_failed_insert_with_same_token(
+    writer: NewsWriter, pool: AsyncMock, monkeypatch
+):
+    monkeypatch.setattr("app.core.database.writer.INITIAL_BACKOFF", 0)
+    pool.insert.side_effect = [Exception("timeout"), None]
+    flushed = await writer.put([row("a")], [10])
+    await writer.flush()
+
+    assert await flushed == 1
+    first, second = pool.insert.await_args_list
+    assert first.kwargs["settings"] == second.kwargs["settings"]
+    assert first.args[1] == second.args[1]
+
+
+@pytest.mark.asyncio
+async def should_fail_waiting_callers_when_insert_is_given_up(
+    writer: NewsWriter, pool: AsyncMock, monkeypatch
+):
+    monkeypatch.setattr("app.core.database.writer.INITIAL_BACKOFF", 0)
+    pool.insert.side_effect = Exception("down")
+    flushed = await writer.put([row("a")], [10])
+    await writer.flush()
+
+    with pytest.raises(Exception, match="down"):
+        await flushed
+    stats = writer.stats()
+    assert (stats.errors, stats.in_flight, stats.flushed) == (1, 0, 0)
+
+
+@pytest.mark.asyncio
+async def should_dead_letter_batches_given_up(
+    writer: NewsWriter, pool: AsyncMock, monkeypatch, tmp_path
+):
+    monkeypatch.setattr("app.core.database.writer.INSERT_ATTEMPTS", 1)
+    writer.dead_letter_dir = str(tmp_path / "dead-letter")
+    pool.insert.side_effect = [None, Exception("down")]
+    rows = [row(id) for id in "abcde"]
+    flushed = await writer.put(rows, [10] * 5)
+    await writer.flush()
+
+    with pytest.raises(Exception, match="down"):
+        await flushed
+    [path] = (tmp_path / "dead-letter").iterdir()
+    # Only the batch given up, the first one is inserted
+    dead_lettered, _ = parse_ndjson(path.read_bytes())
+    assert dead_lettered == rows[3:]
+    assert writer.stats().dead_lettered == 2
+
+
+@pytest.mark.asyncio
+async def should_insert_buffered_rows_on_close(writer: NewsWriter, pool: AsyncMock):
+    writer.start()
+    await writer.put([row("a")], [10])
+    await writer.close()
+
+    assert pool.insert.await_count == 1
+    assert not writer.stats().running
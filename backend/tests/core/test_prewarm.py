@@ -0,0 +1,116 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.core.cache.prewarm import ImagePrewarmer
+from app.core.cache.proxy import ProxyCache
+from app.core.worker_lock import WorkerLock
+
+
+@pytest.fixture
+def requests() -> list[httpx.Request]:
+    return []
+
+
+@pytest.fixture
+def prewarmer(tmp_path, requests) -> ImagePrewarmer:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == "/missing.png":
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"image")
+
+    return ImagePrewarmer(
+        repository=AsyncMock(),
+        cache=ProxyCache(directory=str(tmp_path), max_size=1 << 20, default_ttl=60),
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        interval=60,
+        lookback=3600,
+        batch=100,
+        concurrency=2,
+        host_rate=1000,
+    )
+
+
+@pytest.mark.asyncio
+async def should_store_new_images_in_proxy_cache(prewarmer: ImagePrewarmer):
+    prewarmer.repository.image_urls.return_value = [
+        "https://a.com/1.png",
+        "https://b.com/2.png",
+        "https://a.com/missing.png",
+    ]
+    await prewarmer.prewarm()
+
+    response = await prewarmer.cache.get(prewarmer.client, "https://a.com/1.png")
+    assert response.cache == "HIT"
+    stats = prewarmer.stats()
+    assert (stats.cycles, stats.pending, stats.fetched, stats.failed) == (1, 0, 2, 1)
+
+
+@pytest.mark.asyncio
+async def should_skip_images_already_prewarmed(prewarmer: ImagePrewarmer, requests):
+    prewarmer.repository.image_urls.return_value = ["https://a.com/1.png"]
+    await prewarmer.prewarm()
+    await prewarmer.prewarm()
+
+    assert len(requests) == 1
+    assert prewarmer.stats().cycles == 2
+
+
+@pytest.mark.asyncio
+async def should_rate_limit_requests_per_host(prewarmer: ImagePrewarmer):
+    prewarmer.host_rate = 2
+    prewarmer.repository.image_urls.return_value = [
+        "https://a.com/1.png",
+        "https://a.com/2.png",
+        "https://a.com/3.png",
+        "https://b.com/1.png",
+    ]
+    with patch("app.core.cache.prewarm.asyncio.sleep", new=AsyncMock()) as sleep:
+        await prewarmer.prewarm()
+
+    assert sorted(call.args[0] for call in sleep.await_args_list) == pytest.approx(
+        [0.5, 1.0], abs=0.05
+    )
+
+
+@pytest.mark.asyncio
+async def should_not_let_a_throttled_host_hold_every_slot(
+    prewarmer: ImagePrewarmer, requests
+):
+    prewarmer.host_rate = 20
+    prewarmer.repository.image_urls.return_value = [
+        *(f"https://a.com/{i}.png" for i in range(4)),
+        "https://b.com/1.png",
+    ]
+    await prewarmer.prewarm()
+
+    hosts = [request.url.host for request in requests]
+    # b.com is fetched while a.com waits for its next turn
+    assert hosts.index("b.com") == 1
+
+
+@pytest.mark.asyncio
+async def should_prewarm_only_on_the_worker_holding_the_lock(
+    prewarmer: ImagePrewarmer, tmp_path
+):
+    other = WorkerLock(str(tmp_path / "locks" / "prewarm.lock"))
+    assert other.acquire()
+    prewarmer.lock = WorkerLock(other.path)
+    prewarmer.interval = 0.01
+    prewarmer.repository.image_urls.return_value = []
+    prewarmer.start()
+    await asyncio.sleep(0.05)
+
+    assert not prewarmer.stats().leader
+    prewarmer.repository.image_urls.assert_not_awaited()
+
+    # The other worker is gone
+    other.release()
+    while not prewarmer.stats().cycles:
+        await asyncio.sleep(0.01)
+    assert prewarmer.stats().leader
+    await prewarmer.close()
+    assert other.acquire()
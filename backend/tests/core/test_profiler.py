@@ -0,0 +1,123 @@
+import re
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app import app
+from app.core.database import ClickHousePool
+from app.core.database.repositories.news import NewsRepository
+
+from app.core.profiler import (
+    QueryProfiler,
+    RequestProfile,
+    current_request,
+    server_timing,
+)
+
+SUMMARY = {"read_rows": "10", "read_bytes": "2048", "elapsed_ns": "5000000"}
+
+
+@pytest.fixture
+def profiler() -> QueryProfiler:
+    return QueryProfiler(threshold_ms=100, top_n=2)
+
+
+def record(profiler: QueryProfiler, elapsed: float, name: str = "fetch"):
+    return profiler.record(
+        profiler.query_id(),
+        name,
+        "Select *\n  from news",
+        {"limit": 10},
+        datetime.now(timezone.utc),
+        elapsed,
+        SUMMARY,
+    )
+
+
+def should_keep_slowest_queries(profiler: QueryProfiler):
+    for elapsed in (0.01, 0.05, 0.03, 0.02):
+        record(profiler, elapsed)
+
+    assert [query.elapsed_ms for query in profiler.slowest()] == [50, 30]
+
+
+def should_keep_no_slowest_queries_with_top_n_0():
+    profiler = QueryProfiler(threshold_ms=100, top_n=0)
+
+    assert record(profiler, 0.01) is None
+    assert record(profiler, 0.2) is not None
+    assert profiler.slowest() == []
+
+
+def should_capture_query_summary(profiler: QueryProfiler):
+    profile = record(profiler, 0.01)
+
+    assert profile.query == "Select * from news"
+    assert profile.parameters == {"limit": "10"}
+    assert (profile.read_rows, profile.read_bytes) == (10, 2048)
+    assert profile.server_elapsed_ms == 5
+
+
+def should_log_queries_over_threshold(profiler: QueryProfiler, caplog):
+    record(profiler, 0.01)
+    record(profiler, 0.2)
+
+    slow = [r for r in caplog.records if r.name == "SlowQueryLog"]
+    assert len(slow) == 1
+    assert '"elapsed_ms":200' in slow[0].getMessage()
+
+
+def should_tie_query_ids_to_request(profiler: QueryProfiler):
+    token = current_request.set(
+        RequestProfile(request_id="abc", debug=True, _unique="u1")
+    )
+    try:
+        first = record(profiler, 0.01, "fetch")
+        second = record(profiler, 0.02, "fetch_count")
+        request = current_request.get()
+    finally:
+        current_request.reset(token)
+
+    assert (first.query_id, second.query_id) == ("abc-u1-1", "abc-u1-2")
+    assert request.queries == [first, second]
+    assert server_timing(request.queries).startswith(
+        'fetch_1;dur=10.0;desc="abc-u1-1 rows=10 bytes=2048", fetch_count_2;dur=20.0'
+    )
+
+
+@pytest.mark.asyncio
+async def should_return_server_timing_on_debug_profile():
+    client = AsyncMock(spec=ClickHousePool)
+    client.query.return_value.summary = SUMMARY
+    client.query.return_value.named_results = MagicMock(return_value=[{"count": 3}])
+    previous = app.dependency_overrides.get(NewsRepository)
+    app.dependency_overrides[NewsRepository] = lambda: NewsRepository(
+        client=client, cache=None
+    )
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as ac:
+            plain = await ac.get("/news/count")
+            profiled = await ac.get(
+                "/news/count", headers={"X-Debug-Profile": "1", "X-Request-ID": "r1"}
+            )
+    finally:
+        if previous:
+            app.dependency_overrides[NewsRepository] = previous
+        else:
+            del app.dependency_overrides[NewsRepository]
+
+    assert "server-timing" not in plain.headers
+    assert profiled.headers["server-timing"].startswith('fetch_count_1;dur=')
+    query_id = client.query.call_args.kwargs["settings"]["query_id"]
+    assert re.fullmatch(r"r1-[0-9a-f]{12}-1", query_id)
+    assert f'desc="{query_id} rows=10 bytes=2048"' in profiled.headers["server-timing"]
+
+
+def should_give_requests_with_the_same_id_distinct_query_ids():
+    first, second = RequestProfile(request_id="abc"), RequestProfile(request_id="abc")
+
+    assert first.next_query_id() != second.next_query_id()
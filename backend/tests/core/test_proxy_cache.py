@@ -0,0 +1,170 @@
+import asyncio
+import io
+import httpx
+import pytest
+from PIL import Image
+
+from app.core.cache.disk import DiskCache
+from app.core.cache.proxy import BodyTooLarge, ProxyCache, freshness
+
+
+@pytest.fixture
+def cache(tmp_path) -> ProxyCache:
+    return ProxyCache(directory=str(tmp_path), max_size=1 << 20, default_ttl=60)
+
+
+def upstream(*responses: httpx.Response) -> tuple[httpx.AsyncClient, list]:
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0)
+        return responses[min(len(requests), len(responses)) - 1]
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+
+def should_follow_cache_control_and_expires():
+    assert freshness({"cache-control": "public, max-age=120"}, 60) == 120
+    assert freshness({"cache-control": "max-age=120, s-maxage=30"}, 60) == 30
+    assert freshness({"cache-control": "no-cache"}, 60) == 0
+    assert freshness({"cache-control": "no-store"}, 60) is None
+    assert freshness({"expires": "Thu, 01 Jan 1970 00:00:00 GMT"}, 60) == 0
+    assert freshness({}, 60) == 60
+
+
+def should_evict_least_recently_used_bodies(tmp_path):
+    disk = DiskCache(str(tmp_path), max_size=10)
+    disk.set("a", {}, b"aaaa")
+    disk.set("b", {}, b"bbbb")
+    disk.get("a")
+    disk.set("c", {}, b"cccc")
+
+    assert disk.get("b") is None
+    assert disk.get("a") == ({}, b"aaaa")
+    assert (disk.size, disk.evictions) == (8, 1)
+
+    reloaded = DiskCache(str(tmp_path), max_size=10)
+    reloaded.load()
+    assert (len(reloaded), reloaded.size) == (2, 8)
+
+
+@pytest.mark.asyncio
+async def should_serve_repeated_loads_from_disk(cache: ProxyCache):
+    client, requests = upstream(httpx.Response(200, content=b"image"))
+
+    first = await cache.get(client, "https://example.com/image.png")
+    second = await cache.get(client, "https://example.com/image.png")
+
+    assert (first.cache, second.cache) == ("MISS", "HIT")
+    assert second.body == b"image"
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def should_coalesce_concurrent_misses(cache: ProxyCache):
+    client, requests = upstream(httpx.Response(200, content=b"image"))
+
+    responses = await asyncio.gather(
+        *(cache.get(client, "https://example.com/image.png") for _ in range(5))
+    )
+
+    assert {response.body for response in responses} == {b"image"}
+    assert len(requests) == 1
+    assert cache.stats().coalesced == 4
+
+
+@pytest.mark.asyncio
+async def should_revalidate_stale_entries_with_etag(cache: ProxyCache):
+    client, requests = upstream(
+        httpx.Response(
+            200, headers={"ETag": '"v1"', "Cache-Control": "no-cache"}, content=b"image"
+        ),
+        httpx.Response(304, headers={"Cache-Control": "max-age=60"}),
+    )
+
+    await cache.get(client, "https://example.com/image.png")
+    revalidated = await cache.get(client, "https://example.com/image.png")
+    cached = await cache.get(client, "https://example.com/image.png")
+
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+    assert (revalidated.cache, revalidated.body) == ("REVALIDATED", b"image")
+    assert cached.cache == "HIT"
+    assert len(requests) == 2
+
+
+@pytest.mark.asyncio
+async def should_serve_stale_entry_when_origin_fails(cache: ProxyCache):
+    client, _ = upstream(
+        httpx.Response(200, headers={"Cache-Control": "no-cache"}, content=b"image"),
+        httpx.Response(503),
+    )
+
+    await cache.get(client, "https://example.com/image.png")
+    response = await cache.get(client, "https://example.com/image.png")
+
+    assert (response.status_code, response.cache) == (200, "STALE")
+    assert response.body == b"image"
+
+
+@pytest.mark.asyncio
+async def should_not_store_no_store_responses(cache: ProxyCache):
+    client, requests = upstream(
+        httpx.Response(200, headers={"Cache-Control": "no-store"}, content=b"image")
+    )
+
+    await cache.get(client, "https://example.com/image.png")
+    await cache.get(client, "https://example.com/image.png")
+
+    assert len(requests) == 2
+
+
+@pytest.mark.asyncio
+async def should_cache_resized_variants(cache: ProxyCache):
+    original = io.BytesIO()
+    Image.new("RGB", (400, 200)).save(original, "JPEG")
+    client, requests = upstream(
+        httpx.Response(200, headers={"ETag": '"v1"'}, content=original.getvalue())
+    )
+
+    url = "https://example.com/image.png"
+    resized = await cache.get(client, url, 100, None, "webp")
+    again = await cache.get(client, url, 100, None, "webp")
+    full = await cache.get(client, url)
+
+    assert resized.headers["content-type"] == "image/webp"
+    assert "etag" not in resized.headers
+    assert (again.cache, again.body) == ("HIT", resized.body)
+    assert (full.cache, full.body) == ("HIT", original.getvalue())
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def should_serve_original_when_not_an_image(cache: ProxyCache):
+    client, _ = upstream(httpx.Response(200, content=b"not an image"))
+
+    response = await cache.get(client, "https://example.com/image.png", 100)
+
+    assert response.body == b"not an image"
+
+
+@pytest.mark.asyncio
+async def should_refuse_bodies_past_the_limit(tmp_path):
+    cache = ProxyCache(
+        directory=str(tmp_path), max_size=1 << 20, default_ttl=60, max_body_size=8
+    )
+
+    async def chunks():
+        for _ in range(4):
+            yield b"xxxx"
+
+    declared, _ = upstream(httpx.Response(200, content=b"x" * 16))
+    streamed, _ = upstream(httpx.Response(200, content=chunks()))
+    small, _ = upstream(httpx.Response(200, content=b"image"))
+
+    with pytest.raises(BodyTooLarge):
+        await cache.get(declared, "https://a.com/big")
+    with pytest.raises(BodyTooLarge):
+        await cache.get(streamed, "https://b.com/big")
+    assert (await cache.get(small, "https://c.com/small")).body == b"image"
+    assert len(cache.disk) == 1
@@ -0,0 +1,57 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.cache import QueryCache
+
+
+@pytest.fixture
+def cache() -> QueryCache:
+    return QueryCache(ttl=60, max_size=2, version_check_interval=5)
+
+
+def should_count_hits_and_misses(cache: QueryCache):
+    assert cache.get("key") == (False, None)
+    cache.set("key", 1)
+    assert cache.get("key") == (True, 1)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def should_expire_entries_after_ttl(cache: QueryCache):
+    with patch("app.core.cache.time.monotonic", return_value=0):
+        cache.set("key", 1)
+    with patch("app.core.cache.time.monotonic", return_value=61):
+        assert cache.get("key") == (False, None)
+    assert cache.stats().size == 0
+
+
+def should_evict_least_recently_used(cache: QueryCache):
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.evictions == 1
+
+
+@pytest.mark.asyncio
+async def should_clear_when_data_version_changes(cache: QueryCache):
+    data_version = AsyncMock(side_effect=[(1, 10), (2, 20)])
+    with patch("app.core.cache.time.monotonic", return_value=0):
+        await cache.validate(data_version)
+        cache.set("key", 1)
+    with patch("app.core.cache.time.monotonic", return_value=10):
+        await cache.validate(data_version)
+        assert cache.get("key") == (False, None)
+    assert cache.invalidations == 1
+
+
+@pytest.mark.asyncio
+async def should_throttle_data_version_checks(cache: QueryCache):
+    data_version = AsyncMock(return_value=(1, 10))
+    with patch("app.core.cache.time.monotonic", return_value=0):
+        await cache.validate(data_version)
+    with patch("app.core.cache.time.monotonic", return_value=1):
+        await cache.validate(data_version)
+    data_version.assert_awaited_once()
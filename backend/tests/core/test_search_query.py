@@ -0,0 +1,61 @@
+import re
+
+from app.core.schemas.filters.search import TOKEN_START, SearchQuery
+
+
+def should_parse_terms_on_token_separators():
+    search = SearchQuery.parse("U.S. Election-Results, élection  2024 election.")
+    assert search.terms == ["u", "s", "election", "results", "élection", "2024"]
+    assert search.prefix is None
+
+
+def should_match_the_last_word_as_a_prefix():
+    search = SearchQuery.parse("election resul")
+    assert (search.terms, search.prefix) == (["election"], "resul")
+    # Typed again, the word must only start a token
+    assert SearchQuery.parse("elect b elect").terms == ["b"]
+
+
+def should_parse_quoted_phrases():
+    search = SearchQuery.parse('"New  York" mayor "single"')
+    assert search.terms == ["new", "york", "mayor", "single"]
+    assert search.phrases == ["new york"]
+
+
+def should_bind_terms_and_phrases():
+    search = SearchQuery.parse('"new york" mayor')
+    assert search.parameters() == {
+        "search_term_0": "new",
+        "search_term_1": "york",
+        "search_phrase_0": "new york",
+        "search_prefix_like": "%mayor%",
+        "search_prefix": TOKEN_START + "mayor",
+    }
+
+
+def should_find_words_by_their_start_only():
+    pattern = re.compile(SearchQuery.parse("elect").parameters()["search_prefix"])
+    assert pattern.search("the election results")
+    assert pattern.search("mid-election")
+    assert not pattern.search("a selection")
+
+
+def should_build_condition_for_terms_and_phrases():
+    assert SearchQuery.condition("title", 2, 1) == (
+        "hasToken(lowerUTF8(title), {search_term_0:String})"
+        " AND hasToken(lowerUTF8(title), {search_term_1:String})"
+        " AND position(lowerUTF8(title), {search_phrase_0:String}) > 0"
+    )
+
+
+def should_check_prefix_with_a_like_the_ngram_indexes_answer():
+    # The LIKE must be on the indexed expression, see 010_add_prefix_indexes.sql
+    assert SearchQuery.condition("title", 0, 0, prefix=True) == (
+        "lowerUTF8(title) LIKE {search_prefix_like:String}"
+        " AND match(lowerUTF8(title), {search_prefix:String})"
+    )
+
+
+def should_drop_quotes_from_terms():
+    search = SearchQuery.parse("O'Reilly \\' OR 1=1 --")
+    assert search.terms == ["o", "reilly", "or", "1"]
@@ -0,0 +1,48 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app.core.models.news import News
+from loadtest.corpus import COLUMNS, Corpus
+from loadtest.load import percentile
+from loadtest.run import statements
+
+END = datetime(2025, 6, 1)
+
+
+def should_generate_rows_matching_the_news_model():
+    for row in Corpus(0, vocabulary=500, sentences=200).rows(50, END, 30):
+        news = News.model_validate(dict(zip(COLUMNS, row)))
+        assert news.publish_date is None or (
+            END - timedelta(days=30) <= news.publish_date <= END
+        )
+
+
+def should_generate_the_same_rows_for_a_seed():
+    first = list(Corpus(1, vocabulary=500, sentences=200).rows(20, END, 30))
+    second = list(Corpus(1, vocabulary=500, sentences=200).rows(20, END, 30))
+    assert first == second
+
+
+def should_skew_countries_and_sites():
+    corpus = Corpus(0, vocabulary=500, sentences=200)
+    rows = [dict(zip(COLUMNS, row)) for row in corpus.rows(2000, END, 30)]
+    countries = Counter(row["country"] for row in rows).most_common()
+    assert countries[0][0] == "US"
+    assert countries[0][1] > 4 * countries[-1][1]
+    us_sites = Counter(row["meta_site_name"] for row in rows if row["country"] == "US")
+    assert us_sites[corpus.sites["US"][0]] > us_sites[corpus.sites["US"][-1]]
+
+
+def should_take_nearest_rank_percentiles():
+    ordered = [float(i) for i in range(1, 101)]
+    assert percentile(ordered, 0.5) == 50
+    assert percentile(ordered, 0.99) == 99
+    assert percentile([], 0.5) == 0
+
+
+def should_split_migrations_into_statements():
+    sql = "-- comment;\nCREATE TABLE a (x UInt8);\n\nINSERT INTO a\nSELECT 1;\n"
+    assert statements(sql) == [
+        "CREATE TABLE a (x UInt8)",
+        "INSERT INTO a\nSELECT 1",
+    ]
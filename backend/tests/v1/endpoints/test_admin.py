@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app import app
+from app.core.config import settings
+from app.core.database.writer import create_news_writer
+from v1.dependencies import get_news_writer
+
+
+@pytest.fixture
+async def client():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def should_get_cache_stats(client: AsyncClient):
+    response = await client.get("/admin/cache")
+    assert response.status_code == 200
+    assert {"hits", "misses", "size"} <= set(response.json())
+
+
+@pytest.mark.asyncio
+async def should_get_clickhouse_pool_stats(client: AsyncClient):
+    response = await client.get("/admin/clickhouse")
+    assert response.status_code == 200
+    assert {"healthy", "in_flight", "waiting", "reconnects"} <= set(response.json())
+
+
+@pytest.mark.asyncio
+async def should_get_prewarm_stats_only_when_running(client: AsyncClient):
+    response = await client.get("/admin/prewarm")
+    assert response.status_code == 200
+    assert response.json() is None
+
+
+@pytest.mark.asyncio
+async def should_get_ingest_stats(client: AsyncClient):
+    previous = app.dependency_overrides.get(get_news_writer)
+    writer = create_news_writer(app.state.clickhouse)
+    app.dependency_overrides[get_news_writer] = lambda: writer
+    try:
+        response = await client.get("/admin/ingest")
+    finally:
+        if previous:
+            app.dependency_overrides[get_news_writer] = previous
+        else:
+            del app.dependency_overrides[get_news_writer]
+    assert response.status_code == 200
+    assert {"buffered", "accepted", "duplicates", "flushes"} <= set(response.json())
+
+
+@pytest.mark.asyncio
+async def should_get_admission_stats(client: AsyncClient):
+    response = await client.get("/admin/admission")
+    assert response.status_code == 200
+    assert {"in_flight", "waiting", "rejected"} <= set(response.json())
+    assert {"read", "search", "heavy"} <= set(response.json()["classes"])
+
+
+@pytest.mark.asyncio
+async def should_get_slow_queries_in_debug(client: AsyncClient):
+    with patch.object(settings, "DEBUG", True):
+        response = await client.get("/admin/queries/slow")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+@pytest.mark.asyncio
+async def should_hide_slow_queries_outside_debug(client: AsyncClient):
+    with patch.object(settings, "DEBUG", False):
+        response = await client.get("/admin/queries/slow")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def should_echo_request_id(client: AsyncClient):
+    response = await client.get("/admin/cache", headers={"X-Request-ID": "req-1"})
+    assert response.headers["X-Request-ID"] == "req-1"
+
+    response = await client.get("/admin/cache", headers={"X-Request-ID": "bad id!"})
+    assert response.headers["X-Request-ID"] != "bad id!"
@@ -0,0 +1,45 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app import app
+from app.core.metrics import register_state_collector, unregister_state_collector
+
+
+@pytest.fixture
+async def client():
+    collector = register_state_collector(app.state)
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+    unregister_state_collector(collector)
+
+
+@pytest.mark.asyncio
+async def should_expose_route_metrics(client: AsyncClient):
+    await client.get("/admin/cache")
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_requests_total{method="GET",route="/admin/cache",status="200"}'
+        in response.text
+    )
+    assert "http_request_duration_seconds_bucket" in response.text
+
+
+@pytest.mark.asyncio
+async def should_label_unknown_paths_as_unmatched(client: AsyncClient):
+    await client.get("/unknown/path")
+    response = await client.get("/metrics")
+
+    assert 'route="unmatched",status="404"' in response.text
+
+
+@pytest.mark.asyncio
+async def should_expose_cache_and_pool_stats(client: AsyncClient):
+    response = await client.get("/metrics")
+
+    assert "query_cache_hits_total" in response.text
+    assert "proxy_cache_misses_total" in response.text
+    assert "clickhouse_pool_in_flight" in response.text
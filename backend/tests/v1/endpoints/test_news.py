@@ -1,18 +1,29 @@
+import asyncio
+import io
 from faker import Faker
 import pytest
+from pydantic import TypeAdapter
 from httpx import ASGITransport, AsyncClient
 from datetime import datetime, timedelta
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
+import orjson
+import pyarrow as pa
 import pytz
 from app import app
+from app.core.database.writer import BufferFull
 from app.core.database.repositories.news import NewsRepository
-from app.core.models.news import News
+from app.core.models.news import News, NewsListItem
 from app.core.schemas import CountResponse
+from app.core.schemas.bulk import MAX_ERRORS
 from app.core.schemas.news import (
+    FacetValue,
+    NewsCursor,
     SentimentByCountry,
+    SentimentBucket,
     SentimentByDay,
     SentimentCount,
 )
+from v1.dependencies import get_news_writer
 
 fake = Faker()
 
@@ -50,15 +61,51 @@ def fake_news() -> News:
 
 
 class MockNewsRepository:
-    async def fetch(self, *args, **kwargs) -> list[News]:
-        return [fake_news() for _ in range(2)]
+    async def fetch(
+        self,
+        limit,
+        offset,
+        filters=None,
+        cursor=None,
+        fields=None,
+        relevance=False,
+        validate=True,
+        collapse=False,
+    ) -> list[News] | list[dict]:
+        # Both news are copies of one story
+        news = [fake_news() for _ in range(1 if collapse else 2)]
+        if fields:
+            include = {"id", "publish_date", *fields}
+            return [item.model_dump(include=include) for item in news]
+        if not validate:
+            return [item.model_dump() for item in news]
+        return news
 
-    async def fetch_count(self, *args, **kwargs) -> CountResponse:
+    async def get(self, id: str) -> Optional[News]:
+        return None if id == "missing" else fake_news().model_copy(update={"id": id})
+
+    async def export(self, format, *args, **kwargs) -> AsyncGenerator[bytes, None]:
+        async def chunks():
+            for news in [fake_news() for _ in range(2)]:
+                yield news.model_dump_json().encode() + b"\n"
+
+        return chunks()
+
+    async def fetch_count(
+        self, filters=None, approximate=False, collapse=False
+    ) -> CountResponse:
+        if collapse:
+            return CountResponse(count=7, exact=not approximate)
+        if approximate:
+            return CountResponse(count=10, exact=False, error=2)
         return CountResponse(count=10)
 
     async def distinct(self, *args, **kwargs) -> list[str]:
         return ["positive", "negative", "neutral"]
 
+    async def facets(self, fields, *args, **kwargs) -> dict[str, list[FacetValue]]:
+        return {field: [FacetValue(value="positive", count=3)] for field in fields}
+
     async def sentiments_count(self, *args, **kwargs) -> list[SentimentCount]:
         return [
             SentimentCount(name="positive", count=100),
@@ -66,6 +113,19 @@ class MockNewsRepository:
             SentimentCount(name="neutral", count=30),
         ]
 
+    async def sentiments_series(self, *args, **kwargs) -> list[SentimentBucket]:
+        return [
+            SentimentBucket(
+                bucket="2025-03-01T00:00:00",
+                positive=50,
+                negative=25,
+                neutral=15,
+                very_negative=5,
+                very_positive=5,
+                all=100,
+            )
+        ]
+
     async def sentiments_count_by_date(self, *args, **kwargs) -> list[SentimentByDay]:
         return [
             SentimentByDay(
@@ -104,7 +164,25 @@ class MockNewsRepository:
         ]
 
 
+class MockNewsWriter:
+    wait_timeout = 1
+
+    def __init__(self):
+        self.rows: list[tuple] = []
+        self.full = False
+
+    async def put(self, rows, sizes) -> asyncio.Future:
+        if self.full:
+            raise BufferFull("Ingest buffer is full")
+        self.rows.extend(rows)
+        flushed = asyncio.get_running_loop().create_future()
+        flushed.set_result(len(rows))
+        return flushed
+
+
 app.dependency_overrides[NewsRepository] = MockNewsRepository
+news_writer = MockNewsWriter()
+app.dependency_overrides[get_news_writer] = lambda: news_writer
 
 
 @pytest.fixture
@@ -120,6 +198,103 @@ async def should_get_news(client: AsyncClient) -> None:
     response = await client.get("/news?limit=5&offset=0")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+    # Serialized without models, the rows still match the News schema
+    TypeAdapter(list[News]).validate_python(response.json())
+
+
+@pytest.mark.asyncio
+async def should_return_next_cursor_for_full_page(client: AsyncClient) -> None:
+    response = await client.get("/news?limit=2")
+    assert response.status_code == 200
+    cursor = NewsCursor.decode(response.headers["X-Next-Cursor"])
+    assert cursor.id == response.json()[-1]["id"]
+
+
+@pytest.mark.asyncio
+async def should_not_return_next_cursor_for_last_page(client: AsyncClient) -> None:
+    response = await client.get("/news?limit=5")
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.asyncio
+async def should_return_next_cursor_in_envelope(client: AsyncClient) -> None:
+    full = (await client.get("/news?limit=2&envelope=true")).json()
+    last = (await client.get("/news?limit=5&envelope=true")).json()
+
+    cursor = NewsCursor.decode(full["next_cursor"])
+    assert cursor.id == full["items"][-1]["id"]
+    assert len(last["items"]) == 2 and last["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def should_reject_invalid_cursor(client: AsyncClient) -> None:
+    response = await client.get("/news?cursor=invalid")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def should_get_news_by_relevance(client: AsyncClient) -> None:
+    response = await client.get(
+        "/news?limit=2&sort=relevance&search=election&search_fields=title"
+    )
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.asyncio
+async def should_reject_cursor_with_relevance_sort(client: AsyncClient) -> None:
+    cursor = NewsCursor(publish_date=None, id="abc").encode()
+    response = await client.get(f"/news?sort=relevance&cursor={cursor}")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def should_get_news_list_view(client: AsyncClient) -> None:
+    response = await client.get("/news?view=list")
+    assert response.status_code == 200
+    assert set(response.json()[0]) == set(NewsListItem.model_fields)
+
+
+@pytest.mark.asyncio
+async def should_get_news_projected_fields(client: AsyncClient) -> None:
+    response = await client.get("/news?limit=2&fields=title&fields=sentiment")
+    assert response.status_code == 200
+    assert set(response.json()[0]) == {"id", "publish_date", "title", "sentiment"}
+    assert "X-Next-Cursor" in response.headers
+
+
+@pytest.mark.asyncio
+async def should_reject_unknown_fields(client: AsyncClient) -> None:
+    response = await client.get("/news?fields=title&fields=password")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def should_get_news_by_id(client: AsyncClient) -> None:
+    response = await client.get("/news/abc")
+    assert response.status_code == 200
+    assert response.json()["id"] == "abc"
+
+
+@pytest.mark.asyncio
+async def should_return_not_found_for_missing_news(client: AsyncClient) -> None:
+    response = await client.get("/news/missing")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def should_export_news(client: AsyncClient) -> None:
+    response = await client.get("/news/export?format=ndjson")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    assert len(response.text.splitlines()) == 2
+
+
+@pytest.mark.asyncio
+async def should_reject_unknown_export_format(client: AsyncClient) -> None:
+    response = await client.get("/news/export?format=xml")
+    assert response.status_code == 422
 
 
 @pytest.mark.asyncio
@@ -130,6 +305,27 @@ async def should_get_news_count(client: AsyncClient) -> None:
     assert "count" in response.json()
 
 
+@pytest.mark.asyncio
+async def should_get_approximate_news_count(client: AsyncClient) -> None:
+    response = await client.get("/news/count?approximate=true&search=x&search_fields=title")
+    assert response.status_code == 200
+    assert response.json() == {"count": 10, "exact": False, "error": 2}
+
+
+@pytest.mark.asyncio
+async def should_get_collapsed_news(client: AsyncClient) -> None:
+    response = await client.get("/news?collapse=true")
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+@pytest.mark.asyncio
+async def should_get_collapsed_news_count(client: AsyncClient) -> None:
+    response = await client.get("/news/count?collapse=true")
+    assert response.status_code == 200
+    assert response.json() == {"count": 7, "exact": True, "error": None}
+
+
 @pytest.mark.asyncio
 async def should_get_news_distinct_field_values(client: AsyncClient) -> None:
     response = await client.get("/news/distinct?field=title")
@@ -137,6 +333,68 @@ async def should_get_news_distinct_field_values(client: AsyncClient) -> None:
     assert isinstance(response.json(), list)
 
 
+@pytest.mark.asyncio
+async def should_get_news_facets(client: AsyncClient) -> None:
+    response = await client.get("/news/facets?field=country&field=tags&top_n=5")
+    assert response.status_code == 200
+    assert response.json()["tags"] == [{"value": "positive", "count": 3}]
+
+
+@pytest.mark.asyncio
+async def should_reject_facets_unknown_field(client: AsyncClient) -> None:
+    response = await client.get("/news/facets?field=country&field=password")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def should_reject_distinct_unknown_field(client: AsyncClient) -> None:
+    response = await client.get("/news/distinct?field=password")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def should_reject_invalid_search_fields(client: AsyncClient) -> None:
+    response = await client.get("/news?search=x&search_fields=title)%20OR%20(1")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def should_get_dashboard_panels(client: AsyncClient) -> None:
+    response = await client.post(
+        "/news/dashboard",
+        json={
+            "filters": {"country": ["US"]},
+            "panels": ["news", "count", "facets", "sentiment_by_date"],
+            "facet_fields": ["country", "tags"],
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["news"][0]) == set(NewsListItem.model_fields)
+    assert body["count"] == {"count": 10, "exact": True, "error": None}
+    assert set(body["facets"]) == {"country", "tags"}
+    assert len(body["sentiment_by_date"]) == 1
+    assert body["sentiment"] is None
+
+
+@pytest.mark.asyncio
+async def should_get_dashboard_facets_without_fields(client: AsyncClient) -> None:
+    response = await client.post(
+        "/news/dashboard", json={"panels": ["facets", "count"]}
+    )
+    assert response.status_code == 200
+    assert response.json()["facets"] == {}
+
+
+@pytest.mark.asyncio
+async def should_reject_dashboard_unknown_facet_field(client: AsyncClient) -> None:
+    response = await client.post(
+        "/news/dashboard",
+        json={"panels": ["facets"], "facet_fields": ["password"]},
+    )
+    assert response.status_code == 422
+
+
 @pytest.mark.asyncio
 async def should_get_sentiment_count(client: AsyncClient) -> None:
     response = await client.get("/news/aggregate/sentiment")
@@ -154,8 +412,152 @@ async def should_get_sentiment_count_by_date(client: AsyncClient) -> None:
     assert isinstance(response.json(), list)
 
 
+@pytest.mark.asyncio
+async def should_get_sentiment_series(client: AsyncClient) -> None:
+    response = await client.get(
+        "/news/aggregate/sentiment/series?from=2025-01-01&to=2025-03-01&interval=week"
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["bucket"] == "2025-03-01T00:00:00"
+
+
+@pytest.mark.asyncio
+async def should_reject_sentiment_series_with_too_many_buckets(
+    client: AsyncClient,
+) -> None:
+    response = await client.get(
+        "/news/aggregate/sentiment/series?from=2020-01-01&to=2025-01-01&interval=hour"
+    )
+    assert response.status_code == 422
+
+
 @pytest.mark.asyncio
 async def should_get_sentiment_count_by_country(client: AsyncClient) -> None:
     response = await client.get("/news/aggregate/sentiment/country")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+
+def ndjson(*news: News) -> bytes:
+    return b"\n".join(item.model_dump_json().encode() for item in news)
+
+
+@pytest.fixture
+def writer() -> MockNewsWriter:
+    news_writer.rows.clear()
+    news_writer.full = False
+    return news_writer
+
+
+@pytest.mark.asyncio
+async def should_accept_ndjson_news(
+    client: AsyncClient, writer: MockNewsWriter
+) -> None:
+    news = [fake_news(), fake_news()]
+    response = await client.post(
+        "/news/bulk",
+        content=ndjson(*news) + b"\n\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 2, "flushed": False}
+    assert [row[0] for row in writer.rows] == [item.id for item in news]
+    assert writer.rows[0][list(News.model_fields).index("title")] == news[0].title
+
+
+@pytest.mark.asyncio
+async def should_answer_once_flushed_when_waiting(
+    client: AsyncClient, writer: MockNewsWriter
+) -> None:
+    response = await client.post(
+        "/news/bulk?wait=true",
+        content=ndjson(fake_news()),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"accepted": 1, "flushed": True}
+
+
+@pytest.mark.asyncio
+async def should_accept_arrow_news(
+    client: AsyncClient, writer: MockNewsWriter
+) -> None:
+    news = [fake_news(), fake_news()]
+    table = pa.Table.from_pylist([item.model_dump() for item in news])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as stream:
+        stream.write_table(table)
+    response = await client.post(
+        "/news/bulk",
+        content=sink.getvalue(),
+        headers={"Content-Type": "application/vnd.apache.arrow.stream"},
+    )
+    assert response.status_code == 202
+    assert [row[0] for row in writer.rows] == [item.id for item in news]
+    assert writer.rows[1] == tuple(news[1].model_dump().values())
+
+
+@pytest.mark.asyncio
+async def should_reject_arrow_news_with_nulls(
+    client: AsyncClient, writer: MockNewsWriter
+) -> None:
+    news = [fake_news().model_dump() for _ in range(2)]
+    news[1]["title"] = None
+    news[0]["keywords"] = ["a", None]
+    table = pa.Table.from_pylist(news)
+    sink = io.BytesIO()
+    with pa.ipc.new_file(sink, table.schema) as file:
+        file.write_table(table)
+    response = await client.post(
+        "/news/bulk",
+        content=sink.getvalue(),
+        headers={"Content-Type": "application/vnd.apache.arrow.file"},
+    )
+    assert response.status_code == 422
+    locations = [error["loc"] for error in response.json()["detail"]]
+    assert locations == [["body", 2, "title"], ["body", 1, "keywords"]]
+    assert writer.rows == []
+
+
+@pytest.mark.asyncio
+async def should_reject_bulk_news_with_invalid_rows(
+    client: AsyncClient, writer: MockNewsWriter
+) -> None:
+    invalid = fake_news().model_dump(mode="json")
+    del invalid["title"]
+    body = ndjson(fake_news()) + b"\n" + orjson.dumps(invalid) + b"\n{"
+    response = await client.post(
+        "/news/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 422
+    locations = [error["loc"][:2] for error in response.json()["detail"]]
+    assert locations == [["body", 2], ["body", 3]]
+    assert writer.rows == []
+
+    body = b"\n".join([b"{}"] * (MAX_ERRORS + 5))
+    response = await client.post(
+        "/news/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.json()["detail"][-1]["type"] == "too_many_errors"
+
+
+@pytest.mark.asyncio
+async def should_reject_bulk_news_of_unknown_media_type(client: AsyncClient) -> None:
+    response = await client.post(
+        "/news/bulk", content=b"[]", headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 415
+
+
+@pytest.mark.asyncio
+async def should_ask_to_retry_later_when_buffer_is_full(
+    client: AsyncClient, writer: MockNewsWriter
+) -> None:
+    writer.full = True
+    response = await client.post(
+        "/news/bulk",
+        content=ndjson(fake_news()),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
@@ -2,32 +2,51 @@ import httpx
 import pytest
 from httpx import ASGITransport, AsyncClient
 from app import app
-from unittest.mock import AsyncMock, MagicMock
-from v1.endpoints.proxy import get_async_client
+from app.core.cache.proxy import ProxyCache
+from v1.endpoints.proxy import get_async_client, get_proxy_cache
 
 
 @pytest.fixture
-async def client():
+async def client(tmp_path):
+    upstream = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200,
+                headers={"Content-Type": "text/plain", "Cache-Control": "max-age=60"},
+                content=b"Test content",
+            )
+        )
+    )
+    app.dependency_overrides[get_async_client] = lambda: upstream
+    app.dependency_overrides[get_proxy_cache] = lambda: ProxyCache(
+        directory=str(tmp_path), max_size=1 << 20, default_ttl=60
+    )
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
     ) as ac:
         yield ac
+    app.dependency_overrides.clear()
 
 
 @pytest.mark.asyncio
 async def should_returns_proxy_content(client: AsyncClient):
-    mock_client = AsyncMock(httpx.AsyncClient)
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.headers = {"Content-Type": "text/plain"}
-    mock_response.aiter_bytes.return_value = [b"Test content"]
-    mock_client.get.return_value = mock_response
-
-    def get_mock_client():
-        return mock_client
-
-    app.dependency_overrides[get_async_client] = get_mock_client
     response = await client.get("/proxy?url=https://streaming-response.com")
     assert response.status_code == 200
     assert response.headers["Content-Type"] == "text/plain"
+    assert response.headers["Cache-Control"] == "max-age=60"
     assert response.content == b"Test content"
+
+
+@pytest.mark.asyncio
+async def should_reject_invalid_resize_parameters(client: AsyncClient):
+    response = await client.get("/proxy?url=https://example.com&w=0&format=gif")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def should_answer_502_for_bodies_past_the_limit(client: AsyncClient, tmp_path):
+    app.dependency_overrides[get_proxy_cache] = lambda: ProxyCache(
+        directory=str(tmp_path), max_size=1 << 20, default_ttl=60, max_body_size=4
+    )
+    response = await client.get("/proxy?url=https://example.com/huge.png")
+    assert response.status_code == 502
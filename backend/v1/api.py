@@ -1,4 +1,6 @@
 from fastapi import APIRouter
+from v1.endpoints.admin import admin_router
+from v1.endpoints.metrics import metrics_router
 from v1.endpoints.news import news_router
 from v1.endpoints.proxy import proxy_router
 
@@ -6,3 +8,5 @@ from v1.endpoints.proxy import proxy_router
 v1_api_router = APIRouter()
 v1_api_router.include_router(news_router)
 v1_api_router.include_router(proxy_router)
+v1_api_router.include_router(admin_router)
+v1_api_router.include_router(metrics_router)
@@ -1,8 +1,47 @@
-from typing import AsyncGenerator
-
 import httpx
+from typing import Optional
+from fastapi import Request
+
+from app.core.admission import AdmissionController
+from app.core.cache.prewarm import ImagePrewarmer
+from app.core.cache.proxy import ProxyCache
+from app.core.config import settings
+from app.core.database.writer import NewsWriter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
+
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        timeout=settings.PROXY_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PROXY_MAX_CONNECTIONS,
+        ),
+        follow_redirects=True,
+    )
+
+
+def get_async_client(request: Request) -> httpx.AsyncClient:
+    """The worker's HTTP client, its connections are reused across requests"""
+    return request.app.state.http_client
+
+
+def get_proxy_cache(request: Request) -> ProxyCache:
+    return request.app.state.proxy_cache
+
+
+def get_prewarmer(request: Request) -> Optional[ImagePrewarmer]:
+    """The worker's image prewarmer, None when it is disabled"""
+    return getattr(request.app.state, "prewarmer", None)
+
+
+def get_news_writer(request: Request) -> NewsWriter:
+    """The worker's write-behind buffer of POST /news/bulk"""
+    return request.app.state.news_writer
 
 
-async def get_async_client() -> AsyncGenerator[httpx.AsyncClient, None]:
-    async with httpx.AsyncClient() as client:
-        yield client
+def get_admission(request: Request) -> Optional[AdmissionController]:
+    """The worker's admission controller, None when it is disabled"""
+    return getattr(request.app.state, "admission", None)
@@ -0,0 +1,94 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.core.admission import AdmissionController, AdmissionStats
+from app.core.cache import CacheStats, QueryCache, get_query_cache
+from app.core.cache.prewarm import ImagePrewarmer, PrewarmStats
+from app.core.cache.proxy import ProxyCache, ProxyCacheStats
+from app.core.config import settings
+from app.core.database import ClickHousePool, PoolStats, get_clickhouse_client
+from app.core.database.writer import IngestStats, NewsWriter
+from app.core.profiler import QueryProfile, QueryProfiler, get_profiler
+from v1.dependencies import (
+    get_admission,
+    get_news_writer,
+    get_prewarmer,
+    get_proxy_cache,
+)
+
+admin_router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@admin_router.get("/cache")
+async def cache_stats(
+    cache: Optional[QueryCache] = Depends(get_query_cache),
+) -> Optional[CacheStats]:
+    """
+    Get the hit, miss and eviction counters of the query cache
+    """
+    return cache.stats() if cache else None
+
+
+@admin_router.get("/clickhouse")
+async def clickhouse_stats(
+    pool: ClickHousePool = Depends(get_clickhouse_client),
+) -> PoolStats:
+    """
+    Get the health, concurrency and error counters of the ClickHouse pool
+    """
+    return pool.stats()
+
+
+@admin_router.get("/proxy")
+async def proxy_cache_stats(
+    cache: ProxyCache = Depends(get_proxy_cache),
+) -> ProxyCacheStats:
+    """
+    Get the hit, miss and coalesced fetch counters of the image proxy cache
+    """
+    return cache.stats()
+
+
+@admin_router.get("/prewarm")
+async def prewarm_stats(
+    prewarmer: Optional[ImagePrewarmer] = Depends(get_prewarmer),
+) -> Optional[PrewarmStats]:
+    """
+    Get the progress and failure counters of the image prewarmer
+    """
+    return prewarmer.stats() if prewarmer else None
+
+
+@admin_router.get("/ingest")
+async def ingest_stats(
+    writer: NewsWriter = Depends(get_news_writer),
+) -> IngestStats:
+    """
+    Get the buffer size, flush and duplicate counters of the bulk ingestion
+    """
+    return writer.stats()
+
+
+@admin_router.get("/admission")
+async def admission_stats(
+    admission: Optional[AdmissionController] = Depends(get_admission),
+) -> Optional[AdmissionStats]:
+    """
+    Get the in-flight, queued and turned away requests, overall and by
+    class of routes
+    """
+    return admission.stats() if admission else None
+
+
+@admin_router.get("/queries/slow")
+async def slow_queries(
+    profiler: QueryProfiler = Depends(get_profiler),
+) -> list[QueryProfile]:
+    """
+    Get the slowest ClickHouse queries since startup, slowest first, with
+    the SQL, parameters and ClickHouse summary of each. The parameters hold
+    what users searched for, the route only exists in DEBUG.
+    """
+    if not settings.DEBUG:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return profiler.slowest()
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Expose the worker's metrics in the Prometheus text format
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
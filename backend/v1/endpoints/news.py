@@ -1,17 +1,68 @@
-from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, Query
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 from app.core.database.repositories.news import NewsRepository
-from app.core.models.news import News
+from app.core.database.writer import NewsWriter
+from app.core.models.news import News, NewsListItem
 from app.core.schemas.filters.news import NewsFilters
 from app.core.schemas import CountResponse
-from app.core.schemas.news import SentimentByDay, SentimentByCountry, SentimentCount
+from app.core.schemas.bulk import (
+    ARROW_MEDIA_TYPES,
+    NDJSON_MEDIA_TYPE,
+    BulkResponse,
+    parse_arrow,
+    parse_ndjson,
+)
+from app.core.schemas.dashboard import DashboardRequest, DashboardResponse
+from app.core.schemas.news import (
+    FacetValue,
+    NewsCursor,
+    NewsPage,
+    SentimentBucket,
+    SentimentByDay,
+    SentimentByCountry,
+    SentimentCount,
+    SeriesInterval,
+)
+from v1.dependencies import get_news_writer
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Longest series a chart gets, months are counted as 30 days
+MAX_SERIES_BUCKETS = 5000
+INTERVAL_SECONDS = {"hour": 3600, "day": 86400, "week": 604800, "month": 2592000}
+COLLAPSE_DESCRIPTION = "Count every story once, near-duplicate copies are collapsed"
 
 news_router = APIRouter(prefix="/news", tags=["News"])
 
 
-@news_router.get("")
+def parse_fields(
+    fields: List[str] = Query(
+        [],
+        description="Only return these News fields",
+        openapi_examples={
+            "title": {"value": "title"},
+            "top_image": {"value": "top_image"},
+        },
+    ),
+) -> List[str]:
+    invalid = [field for field in fields if field not in News.model_fields]
+    if invalid:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown fields: {', '.join(invalid)}"
+        )
+    return fields
+
+
+@news_router.get("", response_class=ORJSONResponse)
 async def get(
     news_repo: NewsRepository = Depends(NewsRepository),
     query: NewsFilters = Depends(NewsFilters.parse),
@@ -19,23 +70,103 @@ async def get(
         10, ge=0, le=1000, description="Limit the number of results", examples=10
     ),
     offset: int = Query(0, ge=0, description="Offset the results", examples=0),
-) -> list[News]:
+    cursor: Optional[str] = Query(
+        None,
+        description="Opaque cursor from X-Next-Cursor or next_cursor of the previous page, replaces offset",
+    ),
+    view: Literal["full", "list"] = Query(
+        "full", description="list returns the compact NewsListItem"
+    ),
+    fields: List[str] = Depends(parse_fields),
+    sort: Literal["publish_date", "relevance"] = Query(
+        "publish_date",
+        description="relevance ranks the best search matches first, it can't be used with a cursor",
+    ),
+    collapse: bool = Query(
+        False,
+        description="Only the first news of every story, stories are collapsed within a page",
+    ),
+    envelope: bool = Query(
+        False,
+        description="Return a NewsPage holding the news and the cursor of the next page",
+    ),
+) -> list[News] | list[NewsListItem] | list[dict[str, Any]] | NewsPage:
     """
-    Get paginated list of news with advanced filtering options
+    Get paginated list of news with advanced filtering options, newest first.
+    When the page is full, the X-Next-Cursor response header holds the cursor
+    of the next page, as does next_cursor of the NewsPage body with envelope.
+    Rows are serialized with orjson as ClickHouse typed them, without
+    building a model per row.
     """
-    news = await news_repo.fetch(limit, offset, query)
-    return news
+    try:
+        news_cursor = NewsCursor.decode(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    relevance = sort == "relevance"
+    if relevance and news_cursor:
+        raise HTTPException(
+            status_code=400, detail="A cursor can't be used with relevance sort"
+        )
+    list_view = view == "list" and not fields
+    if list_view:
+        fields = list(NewsListItem.model_fields)
+    news = await news_repo.fetch(
+        limit,
+        offset,
+        query,
+        news_cursor,
+        fields or None,
+        relevance,
+        validate=False,
+        collapse=collapse,
+    )
+    headers = {}
+    next_cursor = None
+    if news and len(news) == limit and not relevance:
+        next_cursor = NewsCursor(
+            publish_date=news[-1]["publish_date"], id=news[-1]["id"]
+        ).encode()
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    if envelope:
+        return ORJSONResponse(
+            {"items": news, "next_cursor": next_cursor}, headers=headers
+        )
+    return ORJSONResponse(news, headers=headers)
+
+
+@news_router.get("/export", response_class=StreamingResponse)
+async def export(
+    news_repo: NewsRepository = Depends(NewsRepository),
+    query: NewsFilters = Depends(NewsFilters.parse),
+    format: Literal["ndjson", "csv", "parquet"] = Query(
+        "ndjson", description="Export file format"
+    ),
+    fields: List[str] = Depends(parse_fields),
+) -> StreamingResponse:
+    """
+    Export every news matching the filters, streamed as it is read
+    """
+    chunks = await news_repo.export(format, query, fields or None)
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="news.{format}"'},
+    )
 
 
 @news_router.get("/count")
 async def count(
     news_repo: NewsRepository = Depends(NewsRepository),
     query: NewsFilters = Depends(NewsFilters.parse),
+    approximate: bool = Query(
+        False, description="Return a fast estimate, with its error when sampled"
+    ),
+    collapse: bool = Query(False, description=COLLAPSE_DESCRIPTION),
 ) -> CountResponse:
     """
     Get the count of news with advanced filtering options
     """
-    count = await news_repo.fetch_count(query)
+    count = await news_repo.fetch_count(query, approximate, collapse)
     return count
 
 
@@ -44,24 +175,56 @@ async def distinct(
     field: str = Query(
         ..., description="Field to get distinct values", examples="country"
     ),
+    top_n: int = Query(
+        1000, ge=1, le=10000, description="Only the most common values"
+    ),
     news_repo: NewsRepository = Depends(NewsRepository),
     query: NewsFilters = Depends(NewsFilters.parse),
 ) -> list[Optional[str]]:
     """
-    Get distinct values of a field with advanced filtering options
+    Get the most common distinct values of a field with advanced filtering options
     """
-    values = await news_repo.distinct(field, query)
+    if field not in News.model_fields:
+        raise HTTPException(status_code=422, detail=f"Unknown field: {field}")
+    values = await news_repo.distinct(field, query, top_n)
     return values
 
 
+@news_router.get("/facets")
+async def facets(
+    field: List[str] = Query(
+        ..., description="Fields to count values of", examples=["country"]
+    ),
+    top_n: int = Query(20, ge=1, le=1000, description="Values returned per field"),
+    prefix: Optional[str] = Query(
+        None, description="Only values starting with this, ignoring case"
+    ),
+    collapse: bool = Query(False, description=COLLAPSE_DESCRIPTION),
+    news_repo: NewsRepository = Depends(NewsRepository),
+    query: NewsFilters = Depends(NewsFilters.parse),
+) -> dict[str, list[FacetValue]]:
+    """
+    Get the most common values of several fields with their count, array
+    fields count each of their elements
+    """
+    unknown = [name for name in field if name not in News.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return await news_repo.facets(field, query, top_n, prefix, collapse)
+
+
 @news_router.get("/aggregate/sentiment")
 async def sentiment_count(
     news_repo: NewsRepository = Depends(NewsRepository),
+    query: NewsFilters = Depends(NewsFilters.parse),
+    collapse: bool = Query(False, description=COLLAPSE_DESCRIPTION),
 ) -> list[SentimentCount]:
     """
     Get the count of news group by sentiment
     """
-    sentiments_aggregate = await news_repo.sentiments_count()
+    sentiments_aggregate = await news_repo.sentiments_count(query, collapse)
     return sentiments_aggregate
 
 
@@ -77,20 +240,172 @@ async def sentiment_count_by_date(
         default_factory=datetime.now, description="End range of news when published"
     ),
     news_repo: NewsRepository = Depends(NewsRepository),
+    query: NewsFilters = Depends(NewsFilters.parse),
+    collapse: bool = Query(False, description=COLLAPSE_DESCRIPTION),
 ) -> list[SentimentByDay]:
     """
-    Get the count of news group by sentiment and date
+    Get the count of news group by sentiment and date, both ends of the range
+    are inclusive days
     """
-    daily_sentiments = await news_repo.sentiments_count_by_date(_from, to)
+    daily_sentiments = await news_repo.sentiments_count_by_date(
+        _from, to, query, collapse
+    )
     return daily_sentiments
 
 
+@news_router.get("/aggregate/sentiment/series")
+async def sentiment_series(
+    _from: datetime = Query(
+        ...,
+        alias="from",
+        description="Start range of news when published",
+        examples="2025-01-01",
+    ),
+    to: datetime = Query(
+        default_factory=datetime.now, description="End range of news when published"
+    ),
+    interval: SeriesInterval = Query("day", description="Size of each bucket"),
+    news_repo: NewsRepository = Depends(NewsRepository),
+    query: NewsFilters = Depends(NewsFilters.parse),
+    collapse: bool = Query(False, description=COLLAPSE_DESCRIPTION),
+) -> list[SentimentBucket]:
+    """
+    Get the count of news group by sentiment in buckets of one interval,
+    oldest first. Every bucket from the one holding from to the one holding
+    to is returned, buckets without news count zero.
+    """
+    if to < _from:
+        raise HTTPException(status_code=422, detail="to must not be before from")
+    buckets = (to - _from).total_seconds() / INTERVAL_SECONDS[interval]
+    if buckets > MAX_SERIES_BUCKETS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"More than {MAX_SERIES_BUCKETS} buckets, use a longer interval",
+        )
+    return await news_repo.sentiments_series(interval, _from, to, query, collapse)
+
+
 @news_router.get("/aggregate/sentiment/country")
 async def sentiment_count_by_country(
     news_repo: NewsRepository = Depends(NewsRepository),
+    query: NewsFilters = Depends(NewsFilters.parse),
+    collapse: bool = Query(False, description=COLLAPSE_DESCRIPTION),
 ) -> list[SentimentByCountry]:
     """
     Get the count of news group by sentiment and country
     """
-    sentiments_by_country = await news_repo.sentiments_count_by_country()
+    sentiments_by_country = await news_repo.sentiments_count_by_country(
+        query, collapse
+    )
     return sentiments_by_country
+
+
+@news_router.post("/dashboard")
+async def dashboard(
+    request: DashboardRequest,
+    news_repo: NewsRepository = Depends(NewsRepository),
+) -> DashboardResponse:
+    """
+    Get several dashboard panels for the same filters in one request, the
+    panels are queried concurrently. sentiment_by_date defaults to the
+    last 30 days.
+    """
+    filters = request.filters
+    collapse = request.collapse
+    to = request.to or datetime.now()
+    panels = {
+        "news": lambda: news_repo.fetch(
+            request.limit,
+            0,
+            filters,
+            fields=list(NewsListItem.model_fields) if request.view == "list" else None,
+            collapse=collapse,
+        ),
+        "count": lambda: news_repo.fetch_count(filters, collapse=collapse),
+        "facets": lambda: news_repo.facets(
+            request.facet_fields, filters, request.top_n, collapse=collapse
+        ),
+        "sentiment": lambda: news_repo.sentiments_count(filters, collapse),
+        "sentiment_by_date": lambda: news_repo.sentiments_count_by_date(
+            request.from_ or to - timedelta(days=30), to, filters, collapse
+        ),
+        "sentiment_by_country": lambda: news_repo.sentiments_count_by_country(
+            filters, collapse
+        ),
+    }
+    requested = list(dict.fromkeys(request.panels))
+    results = dict(
+        zip(requested, await asyncio.gather(*(panels[panel]() for panel in requested)))
+    )
+    return DashboardResponse.model_validate(results)
+
+
+@news_router.post(
+    "/bulk",
+    status_code=202,
+    responses={200: {"model": BulkResponse}, 503: {"description": "Buffer full"}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                media_type: {"schema": {"type": "string", "format": "binary"}}
+                for media_type in (NDJSON_MEDIA_TYPE, *ARROW_MEDIA_TYPES)
+            },
+        }
+    },
+)
+async def bulk(
+    request: Request,
+    response: Response,
+    wait: bool = Query(
+        False,
+        description="Answer once the news are inserted, or after the wait timeout",
+    ),
+    writer: NewsWriter = Depends(get_news_writer),
+) -> BulkResponse:
+    """
+    Ingest a batch of news, one News per line of NDJSON or one per row of an
+    Arrow IPC stream or file. Every row is validated, then buffered and
+    inserted with other batches. A news sent again replaces the stored one.
+    Answers 202 once buffered, 200 when wait is set and the news are
+    inserted, and 503 with Retry-After while the buffer is full.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if media_type == NDJSON_MEDIA_TYPE:
+        parse = parse_ndjson
+    elif media_type in ARROW_MEDIA_TYPES:
+        parse = parse_arrow
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Send {NDJSON_MEDIA_TYPE} or {' or '.join(ARROW_MEDIA_TYPES)}",
+        )
+    # Validation is CPU bound, it runs off the event loop
+    rows, sizes = await run_in_threadpool(parse, await request.body())
+    if not rows:
+        return BulkResponse(accepted=0)
+    flushed = await writer.put(rows, sizes)
+    if not wait:
+        return BulkResponse(accepted=len(rows))
+    try:
+        await asyncio.wait_for(asyncio.shield(flushed), writer.wait_timeout)
+    except asyncio.TimeoutError:
+        return BulkResponse(accepted=len(rows))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"News were not inserted: {e}")
+    response.status_code = 200
+    return BulkResponse(accepted=len(rows), flushed=True)
+
+
+@news_router.get("/{id}")
+async def get_by_id(
+    id: str,
+    news_repo: NewsRepository = Depends(NewsRepository),
+) -> News:
+    """
+    Get a single news with all of its fields
+    """
+    news = await news_repo.get(id)
+    if news is None:
+        raise HTTPException(status_code=404, detail=f"News {id} not found")
+    return news
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
 import httpx
 
-from v1.dependencies import get_async_client
+from app.core.cache.proxy import BodyTooLarge, ProxyCache
+from app.core.images import ImageFormat
+from v1.dependencies import get_async_client, get_proxy_cache
+
+CACHE_HEADER = "X-Cache"
 
 proxy_router = APIRouter(prefix="/proxy", tags=["Proxy"])
 
@@ -10,19 +15,23 @@ proxy_router = APIRouter(prefix="/proxy", tags=["Proxy"])
 @proxy_router.get("")
 async def proxy(
     url: str = Query(..., examples="https://imageurl.com/image.png"),
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Maximum width"),
+    h: Optional[int] = Query(None, ge=1, le=4096, description="Maximum height"),
+    format: Optional[ImageFormat] = Query(None, description="Output format"),
     client: httpx.AsyncClient = Depends(get_async_client),
+    cache: ProxyCache = Depends(get_proxy_cache),
 ):
     """
-    Proxy an image from a URL
+    Proxy an image from a URL, repeated loads are served from the local cache.
+    With w or h the image is shrunk to fit, keeping its aspect ratio, and with
+    format it is re-encoded
     """
-    response = await client.get(
-        url,
-        headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
-        },
-    )
-    return StreamingResponse(
-        response.aiter_bytes(),
-        media_type=response.headers["Content-Type"],
-        headers=response.headers,
+    try:
+        response = await cache.get(client, url, w, h, format)
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return Response(
+        content=response.body,
+        status_code=response.status_code,
+        headers={**response.headers, CACHE_HEADER: response.cache},
     )